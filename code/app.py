@@ -1,29 +1,17 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from flask_mail import Mail, Message
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_login import LoginManager
+from flask_mail import Mail
 import os
-from datetime import datetime
-import requests
-import json
+import threading
 from dotenv import load_dotenv
+from email_queue import EmailDeliveryQueue
+from metrics import init_metrics
+from profiler import init_profiler
 
 # Charger les variables d'environnement
 load_dotenv()
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///nba_analytics.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Configuration email
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-
 # Configuration Google OAuth
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
@@ -32,22 +20,81 @@ GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 NBA_API_KEY = os.getenv('NBA_API_KEY')
 NBA_API_HOST = 'free-nba.p.rapidapi.com'
 
-db = SQLAlchemy(app)
-mail = Mail(app)
+# Extensions créées sans application, liées par create_app()
+db = SQLAlchemy()
+mail = Mail()
+email_queue = EmailDeliveryQueue(mail=mail)
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    # Snapshot mis en cache : pas de requête SQL à chaque requête authentifiée
+    from identity import identity_cache
+    user = identity_cache.get(int(user_id))
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+def create_app(config=None):
+    """Construit et configure l'application Flask"""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///nba_analytics.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Configuration email
+    app.config['MAIL_SERVER'] = 'smtp.gmail.com'
+    app.config['MAIL_PORT'] = 587
+    app.config['MAIL_USE_TLS'] = True
+    app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
+    app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
+
+    # File d'envoi des emails (thread en arrière-plan, connexion SMTP réutilisée)
+    app.config['MAIL_QUEUE_BATCH_SIZE'] = int(os.getenv('MAIL_QUEUE_BATCH_SIZE', 20))
+    app.config['MAIL_QUEUE_MAX_RETRIES'] = int(os.getenv('MAIL_QUEUE_MAX_RETRIES', 3))
+    app.config['MAIL_QUEUE_RETRY_DELAY'] = float(os.getenv('MAIL_QUEUE_RETRY_DELAY', 2.0))
+
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)
+    mail.init_app(app)
+    email_queue.init_app(app)
+    login_manager.init_app(app)
+
+    # Instrumentation (latences, requêtes SQL, rendu des templates) et route /metrics
+    init_metrics(app)
+    # Profilage à la demande (administrateurs) ; écrit sous instance/profiles
+    init_profiler(app)
+
+    # Importer les modèles et routes
+    import models  # noqa: F401
+    from routes import register_routes
+    register_routes(app)
+
+    return app
+
+
+# Compatibilité : `from app import app` construit l'application au premier accès
+_default_app_lock = threading.RLock()
+
+
+def __getattr__(name):
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _default_app_lock:
+        if 'app' not in globals():
+            globals()['app'] = create_app()
+    return globals()['app']
 
-# Importer les modèles et routes
-from models import User, Team, Player, Game, PlayerPerformance, Notification
-import routes
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-    app.run(debug=True) 
\ No newline at end of file
+    # Passer par le module `app` pour partager les mêmes extensions que models/routes
+    import app as app_module
+    application = app_module.create_app()
+    with application.app_context():
+        app_module.db.create_all()
+    application.run(debug=True)
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""
+Ingestion asynchrone des statistiques (asyncio)
+===============================================
+
+Alternative à BalldontlieService / NBAApiService pour les gros volumes :
+des centaines de requêtes en vol sur un seul thread, au lieu d'un thread
+par requête.
+
+    python async_ingestion.py --seasons 2023 2024 --concurrency 200 --rate 50
+
+- client HTTP/1.1 minimal sur asyncio (bibliothèque standard) avec un pool
+  de connexions keep-alive par hôte ;
+- un sémaphore partagé borne le nombre de requêtes en vol, un seau à jetons
+  partagé borne le débit ; un 429 suspend tous les appels pendant Retry-After ;
+- AsyncBalldontlieService et AsyncNBAApiService exposent les mêmes méthodes
+  publiques que les services synchrones (coroutines) ;
+- les pages reçues passent par une asyncio.Queue bornée vers un unique
+  rédacteur qui insère par lots dans un thread dédié, sans bloquer la boucle.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import current_app
+
+from app import app, db
+from models import Player
+from balldontlie_service import BalldontlieService
+from bulk_loader import BulkLoader, GAME_INSERT, PERFORMANCE_INSERT, flatten
+from caches import current_season, season_bounds, data_version
+from metrics import registry
+from profiler import profiler
+from season_store import ensure_season_schema
+from stats_snapshot import stats_snapshot
+
+
+class HttpError(Exception):
+    """Réponse HTTP en erreur (statut >= 400)"""
+
+    def __init__(self, status, url):
+        super().__init__(f"{status} pour {url}")
+        self.status = status
+
+
+# Erreurs équivalentes à requests.RequestException pour les services asynchrones
+FETCH_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, HttpError, ValueError)
+
+
+class RateLimiter:
+    """Seau à jetons partagé : `rate` requêtes par seconde, rafales de `burst`"""
+
+    def __init__(self, rate=None, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate or 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """Suspend toutes les requêtes (429 + Retry-After)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if not self.rate:
+                    return
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ConnectionPool:
+    """Connexions keep-alive vers un hôte, au plus `limit` ouvertes à la fois"""
+
+    def __init__(self, base_url, limit=100):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.opened = 0
+        self._idle = []
+        self._slots = asyncio.Semaphore(limit)
+
+    async def acquire(self, fresh=False):
+        """Connexion libre du pool, ou nouvelle connexion si `fresh` ou pool vide"""
+        await self._slots.acquire()
+        while self._idle and not fresh:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        try:
+            reader, writer = await asyncio.open_connection(
+                self.host, self.port, ssl=ssl.create_default_context() if self.https else None
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        self.opened += 1
+        return reader, writer
+
+    def release(self, reader, writer, reusable):
+        if reusable:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        self._slots.release()
+
+    def close(self):
+        while self._idle:
+            self._idle.pop()[1].close()
+
+
+class AsyncHttpClient:
+    """GET JSON sur un hôte : sémaphore et limiteur partageables entre clients"""
+
+    def __init__(self, base_url, service, headers=None, semaphore=None, rate_limiter=None,
+                 connections=100, timeout=30, max_retries=3):
+        self.service = service
+        self.headers = {key: value for key, value in (headers or {}).items() if value is not None}
+        self.semaphore = semaphore or asyncio.Semaphore(connections)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.pool = ConnectionPool(base_url, connections)
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    async def _send(self, target, fresh=False):
+        reader, writer = await self.pool.acquire(fresh)
+        reusable = False
+        try:
+            lines = [f"GET {target} HTTP/1.1", f"Host: {self.pool.netloc}",
+                     "Accept: application/json", "Accept-Encoding: identity"]
+            lines += [f"{key}: {value}" for key, value in self.headers.items()]
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                # Connexion keep-alive fermée par le serveur entre-temps
+                raise ConnectionResetError('connexion fermée par le serveur')
+            version, status = status_line.split(None, 2)[:2]
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, _, value = line.decode('latin-1').partition(':')
+                headers[key.strip().lower()] = value.strip()
+
+            keep_alive = version == b'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            if 'content-length' in headers:
+                body = await reader.readexactly(int(headers['content-length']))
+            elif headers.get('transfer-encoding', '').lower() == 'chunked':
+                chunks = []
+                while True:
+                    size = int((await reader.readline()).split(b';')[0], 16)
+                    if not size:
+                        await reader.readline()
+                        break
+                    chunks.append(await reader.readexactly(size))
+                    await reader.readexactly(2)
+                body = b''.join(chunks)
+            else:
+                body = await reader.read()
+                keep_alive = False
+            reusable = keep_alive
+            return int(status), headers, body
+        finally:
+            self.pool.release(reader, writer, reusable)
+
+    async def _request(self, target):
+        """Une requête ; si la connexion du pool était morte, une nouvelle est ouverte"""
+        try:
+            return await self._send(target)
+        except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+            return await self._send(target, fresh=True)
+
+    async def get(self, endpoint, params=None):
+        """GET sur l'API ; en cas de 429, suspend tous les appels pendant Retry-After"""
+        query = urlencode(params or {}, doseq=True)
+        target = f"{self.pool.prefix}/{endpoint}" + (f"?{query}" if query else '')
+        labels = (('service', self.service), ('endpoint', endpoint))
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            start = time.perf_counter()
+            status = 'error'
+            async with self.semaphore:
+                try:
+                    code, headers, body = await asyncio.wait_for(self._request(target), self.timeout)
+                    status = str(code)
+                finally:
+                    registry.observe('http_client_request_duration_seconds', labels, time.perf_counter() - start)
+                    registry.inc('http_client_requests_total', labels + (('status', status),))
+            if code != 429 or attempt == self.max_retries:
+                break
+            self.rate_limiter.pause(min(float(headers.get('retry-after', 2 ** attempt)), 30))
+        if code >= 400:
+            raise HttpError(code, target)
+        return json.loads(body)
+
+    def close(self):
+        self.pool.close()
+
+
+class AsyncBalldontlieService:
+    """Équivalent asynchrone de BalldontlieService (mêmes méthodes, mêmes retours)"""
+
+    def __init__(self, client=None, **client_options):
+        self.client = client or AsyncHttpClient(
+            BalldontlieService.BASE_URL, 'balldontlie', BalldontlieService.headers, **client_options
+        )
+
+    async def get_teams(self):
+        try:
+            return (await self.client.get("teams")).get("data", [])
+        except FETCH_ERRORS as e:
+            print(f"Erreur lors de la récupération des équipes : {e}")
+            return []
+
+    async def get_players(self, page=1, per_page=100):
+        params = {
+            "page": page,
+            "per_page": per_page
+        }
+        try:
+            return await self.client.get("players", params)
+        except FETCH_ERRORS as e:
+            print(f"Erreur lors de la récupération des joueurs : {e}")
+            return {"data": [], "meta": {"total_pages": 1}}
+
+    async def get_player_stats(self, player_id, season=None, page=1, per_page=100):
+        params = {
+            "player_ids[]": player_id,
+            "page": page,
+            "per_page": per_page
+        }
+        if season:
+            params["seasons[]"] = season
+        try:
+            return await self.client.get("stats", params)
+        except FETCH_ERRORS as e:
+            print(f"Erreur lors de la récupération des statistiques : {e}")
+            return {"data": [], "meta": {"total_pages": 1}}
+
+    async def get_games(self, season=None, team_ids=None, page=1, per_page=100):
+        if season is None:
+            season = current_season(datetime.today())
+        start_date, end_date = (d.isoformat() for d in season_bounds(season))
+        params = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "page": page,
+            "per_page": per_page
+        }
+        if team_ids:
+            params["team_ids[]"] = team_ids
+        try:
+            data = await self.client.get("games", params)
+            # Si aucun match trouvé, on essaie la saison précédente
+            if not data.get("data"):
+                print(f"Aucun match trouvé entre {start_date} et {end_date}, tentative avec saison précédente")
+                params["start_date"], params["end_date"] = (d.isoformat() for d in season_bounds(season - 1))
+                data = await self.client.get("games", params)
+            return data
+        except FETCH_ERRORS as e:
+            print(f"Erreur lors de la récupération des matchs : {e}")
+            return {"data": [], "meta": {}}
+
+    def close(self):
+        self.client.close()
+
+
+class AsyncNBAApiService:
+    """Équivalent asynchrone de NBAApiService (mêmes méthodes, mêmes retours)"""
+
+    def __init__(self, client=None, **client_options):
+        self.api_key = os.getenv('NBA_API_KEY')
+        self.api_host = 'free-nba.p.rapidapi.com'
+        self.base_url = os.getenv('NBA_API_BASE_URL', 'https://free-nba.p.rapidapi.com')
+        self.client = client or AsyncHttpClient(
+            self.base_url, 'nba_api',
+            {'X-RapidAPI-Key': self.api_key, 'X-RapidAPI-Host': self.api_host},
+            **client_options
+        )
+
+    async def _make_request(self, endpoint, params=None):
+        """Effectue une requête vers l'API NBA"""
+        try:
+            return await self.client.get(endpoint, params)
+        except HttpError as e:
+            print(f"Erreur API NBA: {e.status}")
+        except FETCH_ERRORS as e:
+            print(f"Erreur API NBA: {e}")
+        return None
+
+    async def _data(self, endpoint, params=None):
+        data = await self._make_request(endpoint, params)
+        if data and 'data' in data:
+            return data['data']
+        return []
+
+    async def get_teams(self):
+        """Récupère la liste des équipes"""
+        return await self._data('teams')
+
+    async def get_players(self, team_id=None):
+        """Récupère la liste des joueurs"""
+        return await self._data('players', {'team_ids': team_id} if team_id else {})
+
+    async def get_games(self, team_id=None, date=None):
+        """Récupère les matchs"""
+        params = {}
+        if team_id:
+            params['team_ids'] = team_id
+        if date:
+            params['dates[]'] = date
+        return await self._data('games', params)
+
+    async def get_player_stats(self, player_id, season=None):
+        """Récupère les statistiques d'un joueur"""
+        params = {'player_ids[]': player_id}
+        if season:
+            params['seasons[]'] = season
+        return await self._data('stats', params)
+
+    def close(self):
+        self.client.close()
+
+
+class StatsWriter:
+    """Insère les feuilles de match reçues, par lots, dans un thread dédié.
+
+    La résolution des équipes, joueurs et matchs est celle de BulkLoader ;
+    les couples (joueur, match) déjà en base sont ignorés par l'index unique
+    (INSERT OR IGNORE), une relance n'insère donc que ce qui manque.
+    """
+
+    def __init__(self):
+        self.app = current_app._get_current_object()
+        self.loader = BulkLoader()
+        self.stats = {'records': 0, 'inserted': 0, 'games': 0, 'skipped': 0, 'batches': 0}
+
+    def write(self, records):
+        games, performances = [], []
+        for record in records:
+            record = flatten(record)
+            self.stats['records'] += 1
+            game_id = record.get('game_id')
+            player_id = self.loader.resolve_player(record, None, None)
+            if game_id is None or player_id is None:
+                self.stats['skipped'] += 1
+                continue
+            if game_id not in self.loader.known_games:
+                game = self.loader.game_row(game_id, record)
+                if game is None:
+                    self.stats['skipped'] += 1
+                    continue
+                games.append(game)
+            performances.append(self.loader.performance_row(player_id, game_id, record))
+
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                if games:
+                    conn.exec_driver_sql(GAME_INSERT, games)
+                inserted = conn.exec_driver_sql(PERFORMANCE_INSERT, performances).rowcount if performances else 0
+            if inserted:
+                self.loader.record_form(performances)
+        self.stats['inserted'] += inserted
+        self.stats['skipped'] += len(performances) - inserted
+        self.stats['games'] += len(games)
+        self.stats['batches'] += 1
+
+
+class AsyncIngestionEngine:
+    """Récupère les statistiques joueurs × saisons et les écrit via une file.
+
+    `concurrency` coroutines tirent les pages à récupérer d'une file de
+    travail (la première page d'un couple joueur/saison ajoute les
+    suivantes) ; les pages reçues vont dans une file bornée lue par le
+    rédacteur, ce qui freine la récupération si l'écriture prend du retard.
+    """
+
+    def __init__(self, concurrency=200, rate=None, burst=None, connections=100,
+                 per_page=100, queue_size=256, batch_size=5000):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.connections = connections
+        self.per_page = per_page
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.stats = {'requests': 0, 'pages': 0, 'records': 0}
+
+    def services(self):
+        """Services asynchrones partageant sémaphore et limiteur de débit"""
+        options = {
+            'semaphore': asyncio.Semaphore(self.concurrency),
+            'rate_limiter': RateLimiter(self.rate, self.burst),
+            'connections': self.connections,
+        }
+        return AsyncBalldontlieService(**options), AsyncNBAApiService(**options)
+
+    async def fetch_players(self, service):
+        """Toutes les pages de joueurs : la première donne le nombre de pages"""
+        first = await service.get_players(page=1, per_page=self.per_page)
+        total_pages = first.get('meta', {}).get('total_pages', 1)
+        pages = await asyncio.gather(*(
+            service.get_players(page=page, per_page=self.per_page) for page in range(2, total_pages + 1)
+        ))
+        return [player for page in (first, *pages) for player in page.get('data', [])]
+
+    async def _fetch_worker(self, service, jobs, pages):
+        while True:
+            player_id, season, page = await jobs.get()
+            try:
+                data = await service.get_player_stats(player_id, season, page=page, per_page=self.per_page)
+                self.stats['requests'] += 1
+                if page == 1:
+                    for next_page in range(2, data.get('meta', {}).get('total_pages', 1) + 1):
+                        jobs.put_nowait((player_id, season, next_page))
+                if data.get('data'):
+                    self.stats['pages'] += 1
+                    self.stats['records'] += len(data['data'])
+                    await pages.put(data['data'])
+            finally:
+                jobs.task_done()
+
+    async def _write_worker(self, writer, pages):
+        """Regroupe les pages disponibles en lots ; None termine l'écriture"""
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingestion-writer') as executor:
+            done = False
+            while not done:
+                records = await pages.get()
+                done = records is None
+                batch = list(records or ())
+                while not done and len(batch) < self.batch_size and not pages.empty():
+                    records = pages.get_nowait()
+                    done = records is None
+                    batch.extend(records or ())
+                if batch:
+                    await loop.run_in_executor(executor, writer.write, batch)
+
+    async def ingest_stats(self, player_ids, seasons, writer=None, service=None):
+        """Récupère et écrit les statistiques de chaque joueur pour chaque saison"""
+        own_service = service is None
+        if own_service:
+            service, _ = self.services()
+        jobs = asyncio.Queue()
+        pages = asyncio.Queue(maxsize=self.queue_size)
+        for player_id in player_ids:
+            for season in seasons:
+                jobs.put_nowait((player_id, season, 1))
+
+        # Sans rédacteur (mesure du seul réseau), les pages sont jetées
+        write_task = asyncio.create_task(self._write_worker(writer, pages) if writer else self._drain(pages))
+        fetchers = [asyncio.create_task(self._fetch_worker(service, jobs, pages))
+                    for _ in range(min(self.concurrency, jobs.qsize()) or 1)]
+        waiting = []
+        try:
+            # Un rédacteur ou un récupérateur qui échoue interrompt l'ingestion :
+            # sinon les récupérateurs resteraient bloqués sur la file pleine
+            waiting.append(asyncio.create_task(jobs.join()))
+            await self._wait_or_fail(waiting[-1], [write_task, *fetchers])
+            waiting.append(asyncio.create_task(pages.put(None)))
+            await self._wait_or_fail(waiting[-1], [write_task])
+            await write_task
+        finally:
+            for task in (*fetchers, *waiting, write_task):
+                task.cancel()
+            await asyncio.gather(*fetchers, *waiting, write_task, return_exceptions=True)
+            if own_service:
+                service.close()
+        return self.stats
+
+    @staticmethod
+    async def _wait_or_fail(awaited, workers):
+        """Attend `awaited` ; relance l'exception d'un worker arrêté avant"""
+        done, _ = await asyncio.wait({awaited, *workers}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task is not awaited and not task.cancelled() and task.exception() is not None:
+                task.result()
+        if awaited not in done:
+            raise RuntimeError("Un worker d'ingestion s'est arrêté avant la fin")
+        return awaited.result()
+
+    @staticmethod
+    async def _drain(pages):
+        while await pages.get() is not None:
+            pass
+
+    def run(self, seasons, player_ids=None):
+        """Point d'entrée synchrone (contexte d'application requis)"""
+        if player_ids is None:
+            player_ids = [player_id for player_id, in db.session.query(Player.id).order_by(Player.id)]
+        writer = StatsWriter()
+        try:
+            asyncio.run(self.ingest_stats(player_ids, seasons, writer))
+        finally:
+            # Même interrompue, l'ingestion a pu écrire des lots : les agrégats
+            # des workers se rechargeront (la forme suit performance_version)
+            # et l'instantané partagé est republié
+            if writer.stats['inserted']:
+                data_version.bump()
+                stats_snapshot.publish()
+        return dict(self.stats, **writer.stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingestion asynchrone des statistiques joueurs')
+    parser.add_argument('--seasons', type=int, nargs='+', help='Saisons (défaut : saison en cours)')
+    parser.add_argument('--concurrency', type=int, default=200, help='Requêtes en vol au maximum')
+    parser.add_argument('--rate', type=float, help='Requêtes par seconde au maximum')
+    parser.add_argument('--connections', type=int, default=100, help='Connexions keep-alive au maximum')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--profile', action='store_true',
+                        help='Enregistre un profil (piles + SQL) sous instance/profiles')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        ensure_season_schema()
+        seasons = args.seasons or [current_season(datetime.today())]
+        engine = AsyncIngestionEngine(concurrency=args.concurrency, rate=args.rate,
+                                      connections=args.connections, batch_size=args.batch_size)
+        start = time.perf_counter()
+        with profiler.profile('async_ingestion', f"saisons {seasons}", enabled=args.profile):
+            stats = engine.run(seasons)
+        elapsed = time.perf_counter() - start
+        print(f"📊 {stats['requests']} requêtes, {stats['inserted']} performances, {stats['games']} matchs, "
+              f"{stats['skipped']} ignorés en {elapsed:.1f} s ({stats['records'] / max(elapsed, 1e-9):,.0f} enr/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
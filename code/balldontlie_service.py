@@ -1,51 +1,79 @@
+import os
+import time
 import requests
 from datetime import datetime
+from metrics import instrumented_get
+from caches import current_season, season_bounds
 class BalldontlieService:
-    BASE_URL = "https://api.balldontlie.io/v1"
-    API_KEY = "fd8d5216-9ce3-45d1-99c7-ffaa3b716871"
+    # Surchargeables par l'environnement (ex. serveur local de rejeu pour les benchmarks)
+    BASE_URL = os.getenv("BALLDONTLIE_BASE_URL", "https://api.balldontlie.io/v1")
+    API_KEY = os.getenv("BALLDONTLIE_API_KEY", "fd8d5216-9ce3-45d1-99c7-ffaa3b716871")
+    MAX_RETRIES = 3
 
     headers = {
         "Authorization": f"Bearer {API_KEY}"
     }
 
+    @staticmethod
+    def _get(endpoint, params=None):
+        """GET sur l'API ; en cas de 429, attend Retry-After puis réessaie"""
+        url = f"{BalldontlieService.BASE_URL}/{endpoint}"
+        for attempt in range(BalldontlieService.MAX_RETRIES + 1):
+            response = instrumented_get(
+                'balldontlie', endpoint, url,
+                headers=BalldontlieService.headers,
+                params=params
+            )
+            if response.status_code != 429 or attempt == BalldontlieService.MAX_RETRIES:
+                break
+            delay = float(response.headers.get("Retry-After", 2 ** attempt))
+            time.sleep(min(delay, 30))
+        response.raise_for_status()
+        return response.json()
+
     @staticmethod
     def get_teams():
         try:
-            response = requests.get(f"{BalldontlieService.BASE_URL}/teams", headers=BalldontlieService.headers)
-            response.raise_for_status()
-            return response.json().get("data", [])
+            return BalldontlieService._get("teams").get("data", [])
         except requests.RequestException as e:
             print(f"Erreur lors de la récupération des équipes : {e}")
             return []
 
     @staticmethod
     def get_players(page=1, per_page=100):
-        url = f"{BalldontlieService.BASE_URL}/players"
-        headers = {
-            "Authorization": f"Bearer {BalldontlieService.API_KEY}"
-        }
         params = {
             "page": page,
             "per_page": per_page
         }
         try:
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()  # ✅ retourne bien tout le JSON (data + meta)
+            return BalldontlieService._get("players", params)  # ✅ retourne bien tout le JSON (data + meta)
         except requests.RequestException as e:
             print(f"Erreur lors de la récupération des joueurs : {e}")
             return {"data": [], "meta": {"total_pages": 1}}
 
-    
+    @staticmethod
+    def get_player_stats(player_id, season=None, page=1, per_page=100):
+        params = {
+            "player_ids[]": player_id,
+            "page": page,
+            "per_page": per_page
+        }
+        if season:
+            params["seasons[]"] = season
+        try:
+            return BalldontlieService._get("stats", params)
+        except requests.RequestException as e:
+            print(f"Erreur lors de la récupération des statistiques : {e}")
+            return {"data": [], "meta": {"total_pages": 1}}
+
+
     @staticmethod
     def get_games(season=None, team_ids=None, page=1, per_page=100):
         if season is None:
-            today = datetime.today()
-            season = today.year if today.month >= 10 else today.year - 1
+            season = current_season(datetime.today())
 
         # Définir les dates de début et fin selon la saison (format YYYY-MM-DD)
-        start_date = f"{season}-10-01"
-        end_date = f"{season + 1}-06-30"
+        start_date, end_date = (d.isoformat() for d in season_bounds(season))
 
         params = {
             "start_date": start_date,
@@ -57,29 +85,16 @@ class BalldontlieService:
             params["team_ids[]"] = team_ids
 
         try:
-            response = requests.get(
-                f"{BalldontlieService.BASE_URL}/games",
-                headers=BalldontlieService.headers,
-                params=params
-            )
-            response.raise_for_status()
-            data = response.json()
+            data = BalldontlieService._get("games", params)
 
             # Si aucun match trouvé, on essaie la saison précédente
             if not data.get("data"):
                 print(f"Aucun match trouvé entre {start_date} et {end_date}, tentative avec saison précédente")
-                start_date = f"{season - 1}-10-01"
-                end_date = f"{season}-06-30"
+                start_date, end_date = (d.isoformat() for d in season_bounds(season - 1))
                 params["start_date"] = start_date
                 params["end_date"] = end_date
 
-                response = requests.get(
-                    f"{BalldontlieService.BASE_URL}/games",
-                    headers=BalldontlieService.headers,
-                    params=params
-                )
-                response.raise_for_status()
-                data = response.json()
+                data = BalldontlieService._get("games", params)
 
             return data
         except requests.RequestException as e:
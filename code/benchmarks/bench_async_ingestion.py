@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark : ingestion asynchrone contre le chemin synchrone
+===========================================================
+
+Démarre benchmarks/standin_server.py dans le processus et récupère les
+statistiques de chaque joueur pour chaque saison (toutes les pages) :
+
+  - sync_sequential : BalldontlieService.get_player_stats, une requête à la fois ;
+  - sync_threads    : idem avec un thread par requête en vol (--threads) ;
+  - async_fetch     : AsyncIngestionEngine, un seul thread (--concurrency) ;
+  - async_ingest    : idem avec écriture en base via la file et le rédacteur.
+
+Exemple :
+    python benchmarks/bench_async_ingestion.py --players 300 --latency-ms 20 --concurrency 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODE_DIR)
+
+from benchmarks.standin_server import StandinState, SyntheticDataset, start_server  # noqa: E402
+from benchmarks.bench_ingestion import measure  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark d'ingestion asynchrone NBA Analytics")
+    parser.add_argument('--teams', type=int, default=30)
+    parser.add_argument('--players', type=int, default=300)
+    parser.add_argument('--games-per-season', type=int, default=400)
+    parser.add_argument('--seasons', default='2023,2024')
+    parser.add_argument('--per-page', type=int, default=25, help='Petites pages : plus de requêtes')
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--threads', type=int, default=32, help='Threads du chemin synchrone parallèle')
+    parser.add_argument('--concurrency', type=int, default=200, help='Requêtes en vol (asyncio)')
+    parser.add_argument('--rate', type=float, help='Requêtes par seconde au maximum (asyncio)')
+    parser.add_argument('--skip-sequential', action='store_true', help='Ne mesure pas le chemin séquentiel')
+    parser.add_argument('--output', help='Écrit les résultats dans ce fichier JSON')
+    args = parser.parse_args()
+
+    seasons = tuple(int(s) for s in args.seasons.split(','))
+    state = StandinState(
+        dataset=SyntheticDataset(teams=args.teams, players=args.players,
+                                 games_per_season=args.games_per_season, seasons=seasons),
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_429=args.rate_429
+    )
+    server, base_url = start_server(state)
+
+    # À positionner avant l'import des services (lus au chargement des modules)
+    workdir = tempfile.mkdtemp(prefix='nba-async-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'ingest.db')
+    os.environ['BALLDONTLIE_BASE_URL'] = base_url
+    os.environ['NBA_API_BASE_URL'] = base_url
+
+    import asyncio
+    from app import app, db
+    from models import Team, Player
+    from balldontlie_service import BalldontlieService
+    from async_ingestion import AsyncIngestionEngine
+
+    app.config['DATA_VERSION_PATH'] = os.path.join(workdir, 'data_version')
+    app.config['PERFORMANCE_VERSION_PATH'] = os.path.join(workdir, 'performance_version')
+
+    jobs = [(player_id, season) for player_id in range(1, args.players + 1) for season in seasons]
+
+    def fetch_sync(job):
+        player_id, season = job
+        rows = 0
+        page = total_pages = 1
+        while page <= total_pages:
+            data = BalldontlieService.get_player_stats(player_id, season, page=page, per_page=args.per_page)
+            total_pages = data.get('meta', {}).get('total_pages', 1)
+            rows += len(data.get('data', []))
+            page += 1
+        return rows
+
+    def sync_sequential():
+        for job in jobs:
+            fetch_sync(job)
+
+    peak_threads = {}
+
+    def sync_threads():
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            list(executor.map(fetch_sync, jobs))
+            peak_threads['sync_threads'] = threading.active_count()
+
+    def engine():
+        return AsyncIngestionEngine(concurrency=args.concurrency, rate=args.rate, per_page=args.per_page)
+
+    def async_fetch():
+        asyncio.run(engine().ingest_stats(range(1, args.players + 1), seasons))
+        peak_threads['async_fetch'] = threading.active_count()
+
+    ingest_stats = {}
+
+    def async_ingest():
+        ingest_stats.update(engine().run(seasons))
+
+    results = {'config': vars(args), 'phases': {}}
+    print(f"🏀 Serveur de substitution : {base_url} ({len(jobs)} couples joueur × saison)")
+    with app.app_context():
+        db.create_all()
+        # Référentiel minimal pour que le rédacteur résolve équipes et joueurs
+        db.session.add_all(Team(id=t['id'], name=t['full_name'], city=t['city'], conference=t['conference'],
+                                division=t['division']) for t in state.dataset.teams)
+        db.session.add_all(Player(id=p['id'], first_name=p['first_name'], last_name=p['last_name'],
+                                  team_id=p['team']['id']) for p in state.dataset.players)
+        db.session.commit()
+
+        phases = [('sync_threads', sync_threads), ('async_fetch', async_fetch), ('async_ingest', async_ingest)]
+        if not args.skip_sequential:
+            phases.insert(0, ('sync_sequential', sync_sequential))
+        for name, func in phases:
+            results['phases'][name] = measure(name, state, func)
+            if name in peak_threads:
+                results['phases'][name]['threads'] = peak_threads[name]
+        results['phases']['async_ingest']['writer'] = ingest_stats
+        print(f"  async_ingest : {ingest_stats.get('inserted', 0)} performances, "
+              f"{ingest_stats.get('games', 0)} matchs insérés en {ingest_stats.get('batches', 0)} lots")
+
+    server.shutdown()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
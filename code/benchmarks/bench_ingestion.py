@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark d'ingestion contre le serveur de substitution balldontlie
+===================================================================
+
+Démarre benchmarks/standin_server.py dans le processus, pointe
+BalldontlieService et NBAApiService dessus, puis mesure de bout en bout
+init_database() et les méthodes de DataSyncService sur une base SQLite
+temporaire : durée, enregistrements reçus par seconde, nombre de requêtes
+HTTP (dont 429) et RSS.
+
+Exemple :
+    python benchmarks/bench_ingestion.py --players 300 --latency-ms 20 --rate-429 0.02
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODE_DIR)
+
+from benchmarks.standin_server import StandinState, SyntheticDataset, start_server  # noqa: E402
+
+
+def current_rss_kb():
+    """RSS courant (Linux) ; retombe sur le pic si /proc est indisponible"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(name, state, func):
+    """Exécute func et retourne ses métriques (le serveur compte requêtes et lignes)"""
+    with state.lock:
+        requests_before = state.request_count
+        throttled_before = state.throttled_count
+        rows_before = state.rows_served
+    rss_before = current_rss_kb()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    with state.lock:
+        requests_made = state.request_count - requests_before
+        throttled = state.throttled_count - throttled_before
+        rows = state.rows_served - rows_before
+
+    result = {
+        'seconds': round(elapsed, 3),
+        'records': rows,
+        'records_per_sec': round(rows / elapsed, 1) if elapsed else None,
+        'http_requests': requests_made,
+        'http_429': throttled,
+        'rss_before_kb': rss_before,
+        'rss_after_kb': current_rss_kb(),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    print(f"  {name:<22} {result['seconds']:>8} s  {result['records']:>7} enr.  "
+          f"{result['records_per_sec'] or 0:>9} enr/s  {result['http_requests']:>5} req "
+          f"({result['http_429']} x 429)  pic RSS {result['peak_rss_kb'] // 1024} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark d'ingestion NBA Analytics")
+    parser.add_argument('--teams', type=int, default=30)
+    parser.add_argument('--players', type=int, default=300)
+    parser.add_argument('--games-per-season', type=int, default=400)
+    parser.add_argument('--latency-ms', type=float, default=5)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--replay', help='Rejoue des pages enregistrées au lieu du jeu synthétique')
+    parser.add_argument('--skip-init', action='store_true', help="Ne mesure pas init_database()")
+    parser.add_argument('--output', help='Écrit les résultats dans ce fichier JSON')
+    args = parser.parse_args()
+
+    dataset = None if args.replay else SyntheticDataset(
+        teams=args.teams, players=args.players, games_per_season=args.games_per_season
+    )
+    state = StandinState(
+        dataset=dataset, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429, replay_dir=args.replay
+    )
+    server, base_url = start_server(state)
+
+    # À positionner avant l'import des services (lus au chargement des modules)
+    workdir = tempfile.mkdtemp(prefix='nba-ingest-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'ingest.db')
+    os.environ['BALLDONTLIE_BASE_URL'] = base_url
+    os.environ['NBA_API_BASE_URL'] = base_url
+
+    from app import app, db
+    from main import init_database
+    from services import DataSyncService
+
+    results = {'config': vars(args), 'phases': {}}
+    print(f"🏀 Serveur de substitution : {base_url}")
+    with app.app_context():
+        db.create_all()
+        if not args.skip_init:
+            results['phases']['init_database'] = measure('init_database', state, init_database)
+
+        sync = DataSyncService()
+        results['phases']['sync_teams'] = measure('sync_teams', state, sync.sync_teams)
+        results['phases']['sync_players'] = measure('sync_players', state, sync.sync_players)
+        results['phases']['sync_games'] = measure('sync_games', state, sync.sync_games)
+
+    server.shutdown()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
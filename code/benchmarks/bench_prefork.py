@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Comparaison gunicorn avec / sans préchargement (preload_app)
+============================================================
+
+Pour chaque mode, démarre gunicorn avec gunicorn.conf.py sur une base
+synthétique, mesure le temps jusqu'à la première réponse HTTP puis la
+mémoire de chaque worker (RSS, PSS et mémoire privée via /proc, Linux).
+
+Exemple :
+    python benchmarks/bench_prefork.py --workers 4 --scale small
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODE_DIR)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_kb(pid):
+    """RSS, PSS et mémoire privée (USS) d'un processus, en KiB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:', 'Private_Clean:', 'Private_Dirty:'):
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'private': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+    }
+
+
+def run_mode(preload, workers, env, warm_requests):
+    port = free_port()
+    env = dict(env, PORT=str(port), HOST='127.0.0.1', GUNICORN_WORKERS=str(workers),
+               GUNICORN_PRELOAD='1' if preload else '0')
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(CODE_DIR, 'gunicorn.conf.py'),
+         '--access-logfile', '/dev/null'],
+        cwd=CODE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}/login'
+    first_response = None
+    try:
+        while time.perf_counter() - start < 120:
+            try:
+                with urllib.request.urlopen(url, timeout=2) as response:
+                    if response.status == 200:
+                        first_response = time.perf_counter() - start
+                        break
+            except OSError:
+                time.sleep(0.02)
+        if first_response is None:
+            raise RuntimeError('gunicorn ne répond pas')
+
+        # Laisser tous les workers démarrer puis leur faire traiter quelques requêtes
+        deadline = time.time() + 30
+        while len(children(proc.pid)) < workers and time.time() < deadline:
+            time.sleep(0.1)
+        time.sleep(1)
+        for _ in range(warm_requests):
+            urllib.request.urlopen(url, timeout=5).read()
+
+        worker_memory = [memory_kb(pid) for pid in children(proc.pid)]
+        result = {
+            'preload': preload,
+            'first_response_s': round(first_response, 3),
+            'master': memory_kb(proc.pid),
+            'workers': len(worker_memory),
+            'avg_worker_rss_kb': sum(m['rss'] for m in worker_memory) // max(len(worker_memory), 1),
+            'avg_worker_pss_kb': sum(m['pss'] for m in worker_memory) // max(len(worker_memory), 1),
+            'avg_worker_private_kb': sum(m['private'] for m in worker_memory) // max(len(worker_memory), 1),
+        }
+        result['total_pss_kb'] = result['master']['pss'] + sum(m['pss'] for m in worker_memory)
+        return result
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparaison gunicorn preload / sans preload')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--scale', choices=['tiny', 'small', 'full'], default='small')
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='nba-prefork-')
+    database_url = 'sqlite:///' + os.path.join(workdir, 'prefork.db')
+    os.environ['DATABASE_URL'] = database_url
+
+    from app import app
+    from benchmarks import datagen
+    with app.app_context():
+        datagen.generate(**datagen.SCALES[args.scale])
+
+    env = dict(os.environ, DATABASE_URL=database_url)
+    results = []
+    for preload in (False, True):
+        result = run_mode(preload, args.workers, env, args.requests)
+        results.append(result)
+        print(f"  preload={str(preload):<5} 1re réponse {result['first_response_s']:>6} s  "
+              f"worker RSS {result['avg_worker_rss_kb'] // 1024:>4} MiB  "
+              f"PSS {result['avg_worker_pss_kb'] // 1024:>4} MiB  "
+              f"privée {result['avg_worker_private_kb'] // 1024:>4} MiB  "
+              f"PSS total {result['total_pss_kb'] // 1024:>4} MiB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Benchmark des routes principales sur données synthétiques
+=========================================================
+
+Génère une base SQLite temporaire (benchmarks/datagen.py), puis appelle les
+vraies routes via le client de test Flask en étant connecté. Pour chaque
+route : latence p50/p95, nombre de requêtes SQL et pic mémoire (tracemalloc).
+
+Exemples :
+    python benchmarks/bench_routes.py --scale small --save-baseline
+    python benchmarks/bench_routes.py --scale small --tolerance 0.25
+
+Le code de sortie vaut 1 si une route régresse au-delà de la tolérance
+par rapport à la baseline JSON, 2 si la baseline est absente.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODE_DIR)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_routes.json')
+
+ROUTES = [
+    '/dashboard',
+    '/players',
+    '/players?team_id=1',
+    '/team/1',
+    '/player/1',
+    '/api/players',
+    '/api/games',
+    '/notifications',
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_benchmark(scale, iterations, warmup, routes, workdir):
+    from app import app, db
+    import routes as _routes  # noqa: F401  (enregistre les routes)
+    from sqlalchemy import event
+    from benchmarks import datagen
+
+    # Fichiers partagés (version, instantané, profils) isolés dans le répertoire temporaire
+    app.config.update(
+        DATA_VERSION_PATH=os.path.join(workdir, 'data_version'),
+        USER_VERSION_PATH=os.path.join(workdir, 'user_version'),
+        PERFORMANCE_VERSION_PATH=os.path.join(workdir, 'performance_version'),
+        STATS_SNAPSHOT_PATH=os.path.join(workdir, 'stats_snapshot.json'),
+        PROFILE_DIR=os.path.join(workdir, 'profiles'),
+        MAIL_DEAD_LETTER_PATH=os.path.join(workdir, 'mail_dead_letters.jsonl'),
+    )
+
+    with app.app_context():
+        print(f"⏳ Génération des données ({scale})...")
+        counts = datagen.generate(**datagen.SCALES[scale])
+
+        query_count = [0]
+
+        def _count(*args):
+            query_count[0] += 1
+        event.listen(db.engine, 'before_cursor_execute', _count)
+
+    client = app.test_client()
+    response = client.post('/login', data={
+        'email': 'bench-admin@example.com',
+        'password': datagen.BENCH_PASSWORD,
+    })
+    if response.status_code != 302:
+        raise RuntimeError('Connexion du compte de benchmark impossible')
+
+    results = {}
+    for route in routes:
+        for _ in range(warmup):
+            client.get(route)
+
+        timings, queries, statuses = [], [], set()
+        tracemalloc.start()
+        for _ in range(iterations):
+            query_count[0] = 0
+            start = time.perf_counter()
+            response = client.get(route)
+            timings.append((time.perf_counter() - start) * 1000)
+            queries.append(query_count[0])
+            statuses.add(response.status_code)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[route] = {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'queries': max(queries),
+            'peak_kb': round(peak / 1024, 1),
+            'status': sorted(statuses),
+        }
+        print(f"  {route:<22} p50={results[route]['p50_ms']:>8} ms  "
+              f"p95={results[route]['p95_ms']:>8} ms  "
+              f"sql={results[route]['queries']:>4}  "
+              f"mem={results[route]['peak_kb']:>9} KiB  status={results[route]['status']}")
+
+    return {'scale': scale, 'counts': counts, 'iterations': iterations, 'routes': results}
+
+
+def compare(current, baseline, tolerance, min_delta_ms=5.0):
+    """Retourne la liste des régressions par rapport à la baseline"""
+    regressions = []
+    for route, old in baseline.get('routes', {}).items():
+        new = current['routes'].get(route)
+        if new is None:
+            continue
+        # Seuil relatif + écart absolu minimal pour ignorer le bruit sur les routes rapides
+        if (new['p95_ms'] > old['p95_ms'] * (1 + tolerance)
+                and new['p95_ms'] - old['p95_ms'] > min_delta_ms):
+            regressions.append(f"{route}: p95 {old['p95_ms']} → {new['p95_ms']} ms")
+        if new['queries'] > old['queries']:
+            regressions.append(f"{route}: requêtes SQL {old['queries']} → {new['queries']}")
+        if new['peak_kb'] > old['peak_kb'] * (1 + tolerance):
+            regressions.append(f"{route}: mémoire {old['peak_kb']} → {new['peak_kb']} KiB")
+        if new['status'] != old['status']:
+            regressions.append(f"{route}: statut {old['status']} → {new['status']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark des routes NBA Analytics')
+    parser.add_argument('--scale', choices=['tiny', 'small', 'full'], default='small')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--route', action='append', help='Route à mesurer (répétable)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Régression relative tolérée sur p95 et mémoire (0.25 = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                        help='Écart absolu minimal sur p95 avant de signaler une régression')
+    parser.add_argument('--output', help='Écrit aussi les résultats dans ce fichier JSON')
+    args = parser.parse_args()
+
+    # Base temporaire : ne jamais toucher instance/nba_analytics.db
+    workdir = tempfile.mkdtemp(prefix='nba-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ.setdefault('NOTIFICATION_RETENTION_HOURS', '0')
+
+    current = run_benchmark(args.scale, args.iterations, args.warmup, args.route or ROUTES, workdir)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"💾 Baseline enregistrée dans {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"❌ Baseline introuvable : {args.baseline}")
+        print("   La générer sur la machine de référence avec --save-baseline")
+        return 2
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('scale') != current['scale']:
+        print(f"⚠️  Baseline générée à l'échelle {baseline.get('scale')}, comparaison ignorée")
+        return 0
+
+    regressions = compare(current, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print("❌ Régressions détectées :")
+        for line in regressions:
+            print(f"   - {line}")
+        return 1
+    print("✅ Aucune régression")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
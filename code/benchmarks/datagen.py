@@ -0,0 +1,179 @@
+"""
+Générateur de données synthétiques déterministe pour les benchmarks.
+
+Remplit les modèles (équipes, joueurs, matchs, performances, notifications)
+à l'échelle voulue avec une graine fixe : deux exécutions avec les mêmes
+paramètres produisent exactement la même base.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from app import db
+from models import User, Team, Player, Game, PlayerPerformance, Notification, user_team_association
+
+
+SCALES = {
+    'tiny': {'teams': 30, 'players': 450, 'games': 300, 'performances': 6000, 'notifications': 2000, 'users': 20},
+    'small': {'teams': 30, 'players': 1500, 'games': 1200, 'performances': 40000, 'notifications': 10000, 'users': 50},
+    'full': {'teams': 30, 'players': 5000, 'games': 5000, 'performances': 200000, 'notifications': 50000, 'users': 200},
+}
+
+CONFERENCES = {
+    'East': ['Atlantic', 'Central', 'Southeast'],
+    'West': ['Northwest', 'Pacific', 'Southwest'],
+}
+POSITIONS = ['G', 'F', 'C', 'G-F', 'F-C']
+BENCH_PASSWORD = 'bench-password'
+
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _bulk_insert(model_or_table, rows, chunk_size=5000):
+    table = getattr(model_or_table, '__table__', model_or_table)
+    for chunk in _chunks(rows, chunk_size):
+        db.session.execute(table.insert(), chunk)
+    db.session.commit()
+
+
+def generate(teams=30, players=5000, games=5000, performances=200000,
+             notifications=50000, users=200, seed=42, seasons=4, current_season=None):
+    """Crée toutes les tables puis insère les données synthétiques.
+
+    Les matchs couvrent les `seasons` dernières saisons jusqu'à la saison
+    courante incluse, pour que les vues « saison en cours » aient des données.
+    """
+    rng = random.Random(seed)
+    if current_season is None:
+        today = datetime.utcnow()
+        current_season = today.year if today.month >= 10 else today.year - 1
+    first_season = current_season - seasons + 1
+    now = datetime(current_season, 10, 1)
+    db.drop_all()
+    db.create_all()
+
+    # Utilisateurs (le premier est admin ; mot de passe commun connu du benchmark)
+    admin = User(email='bench-admin@example.com', name='Bench Admin', role='admin')
+    admin.set_password(BENCH_PASSWORD)
+    db.session.add(admin)
+    db.session.commit()
+    _bulk_insert(User, [{
+        'email': f'user{i}@example.com',
+        'name': f'Utilisateur {i}',
+        'role': 'manager' if i % 5 == 0 else 'user',
+        'password_hash': admin.password_hash,
+        'is_active': True,
+        'created_at': now,
+    } for i in range(1, users)])
+
+    team_rows = []
+    for i in range(1, teams + 1):
+        conference = 'East' if i % 2 else 'West'
+        team_rows.append({
+            'id': i,
+            'name': f'Team {i}',
+            'city': f'City {i}',
+            'conference': conference,
+            'division': CONFERENCES[conference][i % 3],
+            'logo_url': None,
+            'created_at': now,
+        })
+    _bulk_insert(Team, team_rows)
+
+    _bulk_insert(user_team_association, [
+        {'user_id': user_id, 'team_id': (user_id % teams) + 1}
+        for user_id in range(1, users + 1) if user_id % 5 == 0
+    ])
+
+    _bulk_insert(Player, [{
+        'id': i,
+        'first_name': f'Prenom{i}',
+        'last_name': f'Nom{i}',
+        'position': rng.choice(POSITIONS),
+        'height_feet': rng.randint(5, 7),
+        'height_inches': rng.randint(0, 11),
+        'weight_pounds': rng.randint(170, 290),
+        'team_id': rng.randint(1, teams),
+        'points_per_game': round(rng.uniform(0, 32), 1),
+        'assists_per_game': round(rng.uniform(0, 11), 1),
+        'rebounds_per_game': round(rng.uniform(0, 14), 1),
+        'minutes_per_game': round(rng.uniform(5, 38), 1),
+        'created_at': now,
+    } for i in range(1, players + 1)])
+
+    game_rows = []
+    for i in range(1, games + 1):
+        season = first_season + (i - 1) * seasons // games
+        home = rng.randint(1, teams)
+        visitor = rng.randint(1, teams - 1)
+        if visitor >= home:
+            visitor += 1
+        game_rows.append({
+            'id': i,
+            'date': datetime(season, 10, 20) + timedelta(days=rng.randint(0, 180), hours=rng.randint(0, 5)),
+            'season': season,
+            'period': 4,
+            'status': 'Final',
+            'home_team_id': home,
+            'visitor_team_id': visitor,
+            'home_team_score': rng.randint(85, 140),
+            'visitor_team_score': rng.randint(85, 140),
+            'created_at': now,
+        })
+    _bulk_insert(Game, game_rows)
+
+    perf_rows = []
+    pairs = set()  # (joueur, match) unique, comme en production
+    for i in range(1, performances + 1):
+        fga = rng.randint(0, 25)
+        tpa = rng.randint(0, min(fga, 12))
+        fta = rng.randint(0, 12)
+        game_id = rng.randint(1, games)
+        player_id = rng.randint(1, players)
+        while (player_id, game_id) in pairs:
+            player_id, game_id = rng.randint(1, players), rng.randint(1, games)
+        pairs.add((player_id, game_id))
+        perf_rows.append({
+            'id': i,
+            'player_id': player_id,
+            'game_id': game_id,
+            'points': rng.randint(0, 45),
+            'assists': rng.randint(0, 15),
+            'rebounds': rng.randint(0, 18),
+            'minutes': rng.randint(0, 44),
+            'field_goals_made': rng.randint(0, fga),
+            'field_goals_attempted': fga,
+            'three_points_made': rng.randint(0, tpa),
+            'three_points_attempted': tpa,
+            'free_throws_made': rng.randint(0, fta),
+            'free_throws_attempted': fta,
+            'season': game_rows[game_id - 1]['season'],
+            'created_at': now - timedelta(minutes=performances - i),
+        })
+        if len(perf_rows) >= 20000:
+            _bulk_insert(PlayerPerformance, perf_rows)
+            perf_rows = []
+    _bulk_insert(PlayerPerformance, perf_rows)
+
+    types = ['info', 'success', 'warning', 'error', 'push']
+    notif_rows = []
+    for i in range(1, notifications + 1):
+        notif_rows.append({
+            'id': i,
+            # Le compte admin concentre un historique volumineux
+            'user_id': 1 if i % 4 == 0 else rng.randint(1, users),
+            'title': 'Synchronisation terminée' if i % 3 == 0 else f'Notification {i}',
+            'message': 'Message synthétique de benchmark',
+            'type': rng.choice(types),
+            'is_read': rng.random() < 0.7,
+            'created_at': now - timedelta(minutes=i * 7),
+        })
+    _bulk_insert(Notification, notif_rows)
+
+    return {
+        'teams': teams, 'players': players, 'games': games,
+        'performances': performances, 'notifications': notifications, 'users': users,
+    }
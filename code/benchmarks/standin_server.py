@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Serveur local de substitution pour l'API balldontlie
+====================================================
+
+Sert /teams, /players, /games et /stats (préfixe /v1 optionnel) avec la même
+forme de réponse que l'API réelle : {"data": [...], "meta": {...}} et une
+pagination page/per_page (total_pages, current_page, next_page, total_count).
+
+Trois sources de données :
+  - synthétique (par défaut) : génération déterministe à partir d'une graine ;
+  - --replay DIR : rejoue des pages enregistrées ;
+  - --record DIR --upstream URL : relaie vers l'API réelle et enregistre.
+
+Latence (--latency-ms, --jitter-ms) et erreurs 429 (--rate-429) sont
+injectables pour reproduire les limites de débit.
+
+Exemple :
+    python benchmarks/standin_server.py --port 8765 --players 600 --latency-ms 40
+    BALLDONTLIE_BASE_URL=http://127.0.0.1:8765/v1 python main.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import requests
+
+DIVISIONS = [
+    ('East', 'Atlantic'), ('East', 'Central'), ('East', 'Southeast'),
+    ('West', 'Northwest'), ('West', 'Pacific'), ('West', 'Southwest'),
+]
+POSITIONS = ['G', 'F', 'C', 'G-F', 'F-C']
+
+
+class SyntheticDataset:
+    """Jeu de données déterministe au format balldontlie"""
+
+    def __init__(self, teams=30, players=600, games_per_season=600, seasons=(2023, 2024),
+                 stats_per_game=16, seed=7):
+        rng = random.Random(seed)
+        self.teams = []
+        for i in range(1, teams + 1):
+            conference, division = DIVISIONS[(i - 1) % len(DIVISIONS)]
+            self.teams.append({
+                'id': i,
+                'abbreviation': f'T{i:02d}',
+                'city': f'City {i}',
+                'conference': conference,
+                'division': division,
+                'full_name': f'City {i} Team {i}',
+                'name': f'Team {i}',
+            })
+
+        self.players = []
+        for i in range(1, players + 1):
+            team = self.teams[(i - 1) % teams]
+            self.players.append({
+                'id': i,
+                'first_name': f'Prenom{i}',
+                'last_name': f'Nom{i}',
+                'position': rng.choice(POSITIONS),
+                'height_feet': rng.randint(5, 7),
+                'height_inches': rng.randint(0, 11),
+                'weight_pounds': rng.randint(170, 290),
+                'team': team,
+            })
+
+        self.games = []
+        self.stats = []
+        game_id = 1
+        stat_id = 1
+        roster = {}
+        for player in self.players:
+            roster.setdefault(player['team']['id'], []).append(player)
+        for season in seasons:
+            for _ in range(games_per_season):
+                home, visitor = rng.sample(self.teams, 2)
+                date = datetime(season, 10, 22) + timedelta(days=rng.randint(0, 170))
+                game = {
+                    'id': game_id,
+                    'date': date.strftime('%Y-%m-%d'),
+                    'season': season,
+                    'status': 'Final',
+                    'period': 4,
+                    'time': 'Final',
+                    'postseason': False,
+                    'home_team_score': rng.randint(88, 140),
+                    'visitor_team_score': rng.randint(88, 140),
+                    'home_team': home,
+                    'visitor_team': visitor,
+                }
+                self.games.append(game)
+                lineup = roster.get(home['id'], [])[:stats_per_game // 2] + \
+                    roster.get(visitor['id'], [])[:stats_per_game // 2]
+                for player in lineup:
+                    fga = rng.randint(0, 24)
+                    fg3a = rng.randint(0, min(fga, 11))
+                    fta = rng.randint(0, 10)
+                    self.stats.append({
+                        'id': stat_id,
+                        'min': f"{rng.randint(0, 44)}:{rng.randint(0, 59):02d}",
+                        'pts': rng.randint(0, 45),
+                        'ast': rng.randint(0, 14),
+                        'reb': rng.randint(0, 17),
+                        'stl': rng.randint(0, 5),
+                        'blk': rng.randint(0, 5),
+                        'fgm': rng.randint(0, fga), 'fga': fga,
+                        'fg3m': rng.randint(0, fg3a), 'fg3a': fg3a,
+                        'ftm': rng.randint(0, fta), 'fta': fta,
+                        'player': {k: v for k, v in player.items() if k != 'team'} | {'team_id': player['team']['id']},
+                        'team': player['team'],
+                        'game': {k: v for k, v in game.items() if k not in ('home_team', 'visitor_team')}
+                        | {'home_team_id': home['id'], 'visitor_team_id': visitor['id']},
+                    })
+                    stat_id += 1
+                game_id += 1
+
+        # Index pour les filtres les plus fréquents
+        self.stats_by_player = {}
+        for stat in self.stats:
+            self.stats_by_player.setdefault(stat['player']['id'], []).append(stat)
+
+    def query(self, resource, params):
+        """Filtre une ressource selon les paramètres de l'API"""
+        def values(name):
+            return params.get(name, []) + params.get(f'{name}[]', [])
+
+        if resource == 'teams':
+            return self.teams
+        if resource == 'players':
+            rows = self.players
+            team_ids = {int(v) for v in values('team_ids')}
+            if team_ids:
+                rows = [p for p in rows if p['team']['id'] in team_ids]
+            search = (params.get('search') or [''])[0].lower()
+            if search:
+                rows = [p for p in rows if search in f"{p['first_name']} {p['last_name']}".lower()]
+            return rows
+        if resource == 'games':
+            rows = self.games
+            seasons = {int(v) for v in values('seasons')}
+            if seasons:
+                rows = [g for g in rows if g['season'] in seasons]
+            team_ids = {int(v) for v in values('team_ids')}
+            if team_ids:
+                rows = [g for g in rows if g['home_team']['id'] in team_ids or g['visitor_team']['id'] in team_ids]
+            dates = set(values('dates'))
+            if dates:
+                rows = [g for g in rows if g['date'] in dates]
+            if params.get('start_date'):
+                rows = [g for g in rows if g['date'] >= params['start_date'][0]]
+            if params.get('end_date'):
+                rows = [g for g in rows if g['date'] <= params['end_date'][0]]
+            return rows
+        if resource == 'stats':
+            player_ids = [int(v) for v in values('player_ids')]
+            if player_ids:
+                rows = [s for pid in player_ids for s in self.stats_by_player.get(pid, [])]
+            else:
+                rows = self.stats
+            seasons = {int(v) for v in values('seasons')}
+            if seasons:
+                rows = [s for s in rows if s['game']['season'] in seasons]
+            game_ids = {int(v) for v in values('game_ids')}
+            if game_ids:
+                rows = [s for s in rows if s['game']['id'] in game_ids]
+            return rows
+        return None
+
+
+def paginate(rows, params):
+    per_page = max(1, min(int((params.get('per_page') or [25])[0]), 100))
+    page = max(1, int((params.get('page') or [1])[0]))
+    total_pages = max(1, -(-len(rows) // per_page))
+    start = (page - 1) * per_page
+    return {
+        'data': rows[start:start + per_page],
+        'meta': {
+            'total_pages': total_pages,
+            'current_page': page,
+            'next_page': page + 1 if page < total_pages else None,
+            'per_page': per_page,
+            'total_count': len(rows),
+            'next_cursor': rows[start + per_page]['id'] if start + per_page < len(rows) else None,
+        },
+    }
+
+
+class StandinState:
+    """Configuration et compteurs partagés entre les threads du serveur"""
+
+    def __init__(self, dataset=None, latency_ms=0, jitter_ms=0, rate_429=0.0,
+                 replay_dir=None, record_dir=None, upstream=None, api_key=None, seed=7):
+        self.dataset = dataset
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.replay_dir = replay_dir
+        self.record_dir = record_dir
+        self.upstream = upstream
+        self.api_key = api_key
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.throttled_count = 0
+        self.rows_served = 0
+
+    def recording_path(self, directory, resource, query):
+        key = hashlib.sha1(query.encode()).hexdigest()[:16]
+        return os.path.join(directory, resource, f'{key}.json')
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server_version = 'BalldontlieStandin/1.0'
+    # Connexions keep-alive : chaque réponse porte un Content-Length
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split('/') if p]
+        if parts and parts[0] == 'v1':
+            parts = parts[1:]
+        resource = parts[0] if parts else ''
+        params = parse_qs(parsed.query)
+        query = urlencode(sorted((k, v) for k, vs in params.items() for v in vs))
+
+        with state.lock:
+            state.request_count += 1
+            throttle = state.rate_429 and state.rng.random() < state.rate_429
+            delay = state.latency_ms + (state.rng.uniform(0, state.jitter_ms) if state.jitter_ms else 0)
+            if throttle:
+                state.throttled_count += 1
+        if delay:
+            time.sleep(delay / 1000)
+        if throttle:
+            return self._send_json(429, {'error': 'Too Many Requests'}, {'Retry-After': '0'})
+
+        if state.record_dir:
+            return self._record(state, resource, parsed, query)
+        if state.replay_dir:
+            path = state.recording_path(state.replay_dir, resource, query)
+            if not os.path.exists(path):
+                return self._send_json(404, {'error': f'Aucun enregistrement pour {resource}?{query}'})
+            with open(path) as f:
+                payload = json.load(f)
+            with state.lock:
+                state.rows_served += len(payload.get('data', []))
+            return self._send_json(200, payload)
+
+        rows = state.dataset.query(resource, params)
+        if rows is None:
+            return self._send_json(404, {'error': 'Not Found'})
+        # Comme l'API réelle, /teams n'est pas paginé
+        payload = {'data': rows} if resource == 'teams' else paginate(rows, params)
+        with state.lock:
+            state.rows_served += len(payload['data'])
+        self._send_json(200, payload)
+
+    def _record(self, state, resource, parsed, query):
+        upstream = f"{state.upstream.rstrip('/')}/{resource}"
+        headers = {'Authorization': f'Bearer {state.api_key}'} if state.api_key else {}
+        response = requests.get(upstream, params=parse_qs(parsed.query), headers=headers)
+        if response.status_code == 200:
+            path = state.recording_path(state.record_dir, resource, query)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(response.text)
+        self.send_response(response.status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response.content)))
+        self.end_headers()
+        self.wfile.write(response.content)
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # File d'attente de listen() : les clients asynchrones ouvrent des
+    # centaines de connexions d'un coup (5 par défaut)
+    request_queue_size = 1024
+
+
+def start_server(state, host='127.0.0.1', port=0):
+    """Démarre le serveur dans un thread ; retourne (serveur, url de base /v1)"""
+    server = StandinServer((host, port), StandinHandler)
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, name='balldontlie-standin', daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serveur de substitution balldontlie')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--teams', type=int, default=30)
+    parser.add_argument('--players', type=int, default=600)
+    parser.add_argument('--games-per-season', type=int, default=600)
+    parser.add_argument('--seasons', default='2023,2024')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Probabilité de répondre 429')
+    parser.add_argument('--replay', help='Répertoire de pages enregistrées à rejouer')
+    parser.add_argument('--record', help='Répertoire où enregistrer les pages relayées')
+    parser.add_argument('--upstream', default='https://api.balldontlie.io/v1')
+    args = parser.parse_args()
+
+    dataset = None
+    if not (args.replay or args.record):
+        dataset = SyntheticDataset(
+            teams=args.teams, players=args.players, games_per_season=args.games_per_season,
+            seasons=tuple(int(s) for s in args.seasons.split(',')), seed=args.seed
+        )
+    state = StandinState(
+        dataset=dataset, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429, replay_dir=args.replay, record_dir=args.record,
+        upstream=args.upstream, api_key=os.getenv('BALLDONTLIE_API_KEY'), seed=args.seed
+    )
+    server, url = start_server(state, args.host, args.port)
+    print(f"🏀 Serveur de substitution sur {url} (Ctrl+C pour arrêter)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Chargeur de masse des feuilles de match historiques
+===================================================
+
+Importe des fichiers CSV ou NDJSON (éventuellement .gz) contenant une ligne
+par joueur et par match dans les tables Game et PlayerPerformance.
+
+    python bulk_loader.py dumps/2018.csv.gz dumps/2019.ndjson --chunk-size 50000
+
+- lecture en flux : la mémoire reste constante quelle que soit la taille ;
+- équipes et joueurs résolus via des dictionnaires en mémoire (id, nom) ;
+- insertions par gros lots, index secondaires supprimés pendant le
+  chargement puis recréés à la fin ;
+- reprise : le nombre d'enregistrements traités est sauvegardé dans la
+  même transaction que chaque lot (table bulk_load_checkpoint), une
+  relance reprend exactement après le dernier lot validé ;
+- idempotent : une feuille (joueur, match) déjà en base est ignorée
+  (index unique), y compris après --restart ou avec des fichiers qui se
+  recouvrent.
+
+Colonnes reconnues (format plat ou format imbriqué de l'API /stats) :
+game_id, date, season, home_team, visitor_team, home_team_score,
+visitor_team_score, player_id ou player (nom), team, pts, ast, reb, min,
+fgm, fga, fg3m, fg3a, ftm, fta.
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect
+
+from app import app, db
+from models import Team, Player, Game, PlayerPerformance, BulkLoadCheckpoint
+from caches import data_version, performance_version
+from form_tracker import form_tracker
+from profiler import profiler
+from season_store import ensure_season_schema
+from stats_snapshot import stats_snapshot
+
+
+GAME_INSERT = (
+    'INSERT OR IGNORE INTO game (id, date, season, period, status, home_team_id, '
+    'visitor_team_id, home_team_score, visitor_team_score, created_at) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+)
+# Index unique (player_id, game_id) : une feuille déjà chargée est ignorée
+PERFORMANCE_INSERT = (
+    'INSERT OR IGNORE INTO player_performance (player_id, game_id, points, assists, rebounds, '
+    'minutes, field_goals_made, field_goals_attempted, three_points_made, '
+    'three_points_attempted, free_throws_made, free_throws_attempted, season, created_at) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+)
+# Positions de points, rebonds, passes et minutes (form_tracker.FORM_STATS)
+# dans une ligne de BulkLoader.performance_row
+FORM_COLUMNS = (2, 4, 3, 5)
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def iter_records(path):
+    """Itère les enregistrements du fichier sans le charger en mémoire"""
+    name = path[:-3] if path.endswith('.gz') else path
+    with open_text(path) as f:
+        if name.endswith(('.ndjson', '.jsonl', '.json')):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield flatten(json.loads(line))
+        else:
+            yield from csv.DictReader(f)
+
+
+def flatten(record):
+    """Aplatit le format imbriqué de l'API (/stats) vers le format plat"""
+    game = record.get('game')
+    if isinstance(game, dict):
+        record = dict(record)
+        record['game_id'] = game.get('id')
+        record.setdefault('date', game.get('date'))
+        record.setdefault('season', game.get('season'))
+        record.setdefault('status', game.get('status'))
+        record.setdefault('home_team', game.get('home_team_id') or (game.get('home_team') or {}).get('id'))
+        record.setdefault('visitor_team', game.get('visitor_team_id') or (game.get('visitor_team') or {}).get('id'))
+        record.setdefault('home_team_score', game.get('home_team_score'))
+        record.setdefault('visitor_team_score', game.get('visitor_team_score'))
+    player = record.get('player')
+    if isinstance(player, dict):
+        record['player_id'] = player.get('id')
+        record['player'] = f"{player.get('first_name', '')} {player.get('last_name', '')}".strip()
+    team = record.get('team')
+    if isinstance(team, dict):
+        record['team'] = team.get('id')
+    return record
+
+
+def to_int(value, default=0):
+    if value in (None, ''):
+        return default
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_minutes(value):
+    """'34:12' -> 34 ; '34.5' -> 34"""
+    if value in (None, ''):
+        return 0
+    if isinstance(value, str) and ':' in value:
+        return to_int(value.split(':')[0])
+    return to_int(value)
+
+
+def parse_date(value):
+    value = str(value).replace('Z', '')
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value[:10], '%Y-%m-%d')
+
+
+class BulkLoader:
+    """Charge un ou plusieurs fichiers dans Game et PlayerPerformance"""
+
+    TABLES = (Game.__table__, PlayerPerformance.__table__)
+
+    def __init__(self, chunk_size=50000, create_missing_players=False, progress_every=5):
+        self.chunk_size = chunk_size
+        self.create_missing_players = create_missing_players
+        self.progress_every = progress_every
+        self.stats = {'records': 0, 'inserted': 0, 'games': 0, 'skipped': 0, 'players_created': 0}
+
+        # Dictionnaires de résolution en mémoire
+        self.team_ids = {}
+        for team in db.session.query(Team.id, Team.name, Team.city):
+            self.team_ids[str(team.id)] = team.id
+            self.team_ids[team.name.lower()] = team.id
+            if team.city and team.name.lower().startswith(team.city.lower()):
+                self.team_ids[team.name[len(team.city):].strip().lower()] = team.id
+        self.player_ids = {}
+        for player in db.session.query(Player.id, Player.first_name, Player.last_name):
+            self.player_ids[str(player.id)] = player.id
+            self.player_ids[f"{player.first_name} {player.last_name}".lower()] = player.id
+        self.known_games, self.game_dates = {}, {}
+        for game_id, season, game_date in db.session.query(Game.id, Game.season, Game.date):
+            self.known_games[game_id] = season
+            self.game_dates[game_id] = game_date
+
+    # --- Index et paramètres SQLite -----------------------------------
+
+    def _secondary_indexes(self):
+        inspector = inspect(db.engine)
+        for table in self.TABLES:
+            for index in inspector.get_indexes(table.name):
+                if not index.get('unique'):
+                    yield index['name']
+
+    def defer_indexes(self):
+        """Supprime les index secondaires : ils seront reconstruits en une passe"""
+        dropped = list(self._secondary_indexes())
+        with db.engine.begin() as conn:
+            for name in dropped:
+                conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')
+        return dropped
+
+    def restore_indexes(self):
+        with db.engine.begin() as conn:
+            for table in self.TABLES:
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
+
+    def tune_connection(self, conn):
+        if db.engine.dialect.name == 'sqlite':
+            conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+            conn.exec_driver_sql('PRAGMA synchronous=NORMAL')
+            conn.exec_driver_sql('PRAGMA cache_size=-200000')
+            conn.exec_driver_sql('PRAGMA temp_store=MEMORY')
+
+    # --- Résolution ---------------------------------------------------
+
+    def resolve_team(self, value):
+        if value in (None, ''):
+            return None
+        return self.team_ids.get(str(value).strip().lower()) or self.team_ids.get(str(to_int(value, None)))
+
+    def resolve_player(self, record, team_id, new_players):
+        key = str(record.get('player_id') or '').strip()
+        player_id = self.player_ids.get(key) if key else None
+        if player_id is None and record.get('player'):
+            player_id = self.player_ids.get(str(record['player']).strip().lower())
+        if player_id is None and self.create_missing_players and key and team_id:
+            first, _, last = str(record.get('player') or f'Joueur {key}').partition(' ')
+            player_id = to_int(key)
+            new_players.append((player_id, first, last or first, team_id, datetime.utcnow()))
+            self.player_ids[key] = player_id
+            self.stats['players_created'] += 1
+        return player_id
+
+    # --- Lignes à insérer ---------------------------------------------
+
+    def game_row(self, game_id, record):
+        """Ligne de la table game pour un match encore inconnu (None sans date)"""
+        date = record.get('date')
+        if not date:
+            return None
+        game_date = parse_date(date)
+        season = to_int(record.get('season'), None)
+        if season is None:
+            season = game_date.year if game_date.month >= 10 else game_date.year - 1
+        self.known_games[game_id] = season
+        self.game_dates[game_id] = game_date
+        return (
+            game_id, game_date, season,
+            to_int(record.get('period'), 4), record.get('status') or 'Final',
+            self.resolve_team(record.get('home_team')), self.resolve_team(record.get('visitor_team')),
+            to_int(record.get('home_team_score'), None),
+            to_int(record.get('visitor_team_score'), None),
+            datetime.utcnow(),
+        )
+
+    def performance_row(self, player_id, game_id, record):
+        return (
+            player_id, game_id,
+            to_int(record.get('pts')), to_int(record.get('ast')), to_int(record.get('reb')),
+            parse_minutes(record.get('min')),
+            to_int(record.get('fgm')), to_int(record.get('fga')),
+            to_int(record.get('fg3m')), to_int(record.get('fg3a')),
+            to_int(record.get('ftm')), to_int(record.get('fta')),
+            self.known_games[game_id], datetime.utcnow(),
+        )
+
+    def record_form(self, performances):
+        """Applique des feuilles validées à la forme des joueurs de ce processus"""
+        form_tracker.apply(
+            ((row[0], row[1], self.game_dates.get(row[1]), tuple(row[i] for i in FORM_COLUMNS))
+             for row in performances),
+            version=performance_version.bump()
+        )
+
+    # --- Chargement ---------------------------------------------------
+
+    def load_file(self, path):
+        source = os.path.abspath(path)
+        checkpoint = db.session.get(BulkLoadCheckpoint, source)
+        if checkpoint and checkpoint.completed:
+            print(f"⏭️  {path} déjà chargé ({checkpoint.inserted} lignes)")
+            return
+        resume_at = checkpoint.records if checkpoint else 0
+        inserted_total = checkpoint.inserted if checkpoint else 0
+        db.session.remove()
+        if resume_at:
+            print(f"↩️  Reprise de {path} après {resume_at} enregistrements")
+
+        games, performances, new_players = [], [], []
+        position = 0
+        chunks = 0
+        start = time.perf_counter()
+
+        for record in iter_records(path):
+            position += 1
+            if position <= resume_at:
+                continue
+            self.stats['records'] += 1
+
+            game_id = to_int(record.get('game_id'), None)
+            if game_id is None:
+                self.stats['skipped'] += 1
+                continue
+            if game_id not in self.known_games:
+                game = self.game_row(game_id, record)
+                if game is None:
+                    self.stats['skipped'] += 1
+                    continue
+                games.append(game)
+
+            team_id = self.resolve_team(record.get('team'))
+            player_id = self.resolve_player(record, team_id, new_players)
+            if player_id is None:
+                self.stats['skipped'] += 1
+                continue
+
+            performances.append(self.performance_row(player_id, game_id, record))
+
+            if len(performances) >= self.chunk_size:
+                inserted_total += self._flush(source, position, inserted_total, games, performances, new_players)
+                games, performances, new_players = [], [], []
+                chunks += 1
+                if chunks % self.progress_every == 0:
+                    elapsed = time.perf_counter() - start
+                    print(f"   {path}: {position} enr., {self.stats['inserted'] / elapsed:,.0f} lignes/s")
+
+        inserted_total += self._flush(source, position, inserted_total, games, performances,
+                                      new_players, completed=True)
+        elapsed = time.perf_counter() - start
+        print(f"✅ {path}: {position - resume_at} enregistrements en {elapsed:.1f} s")
+
+    def _flush(self, source, position, inserted_total, games, performances, new_players, completed=False):
+        """Insère un lot et met à jour le point de reprise dans la même transaction"""
+        with db.engine.begin() as conn:
+            self.tune_connection(conn)
+            if new_players:
+                conn.exec_driver_sql(
+                    'INSERT OR IGNORE INTO player (id, first_name, last_name, team_id, created_at) '
+                    'VALUES (?, ?, ?, ?, ?)', new_players)
+            if games:
+                conn.exec_driver_sql(GAME_INSERT, games)
+            inserted = conn.exec_driver_sql(PERFORMANCE_INSERT, performances).rowcount if performances else 0
+            conn.exec_driver_sql(
+                'INSERT OR REPLACE INTO bulk_load_checkpoint (source, records, inserted, completed, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (source, position, inserted_total + inserted, completed, datetime.utcnow()))
+        if inserted:
+            self.record_form(performances)
+        self.stats['inserted'] += inserted
+        self.stats['skipped'] += len(performances) - inserted
+        self.stats['games'] += len(games)
+        return inserted
+
+    def run(self, paths, defer_indexes=True):
+        dropped = self.defer_indexes() if defer_indexes else []
+        try:
+            for path in paths:
+                self.load_file(path)
+        finally:
+            if dropped:
+                print(f"🔧 Reconstruction de {len(dropped)} index...")
+            self.restore_indexes()
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chargement de masse des feuilles de match')
+    parser.add_argument('paths', nargs='+', help='Fichiers CSV / NDJSON (.gz accepté)')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--create-missing-players', action='store_true',
+                        help='Crée les joueurs inconnus (id et équipe requis)')
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help='Ne supprime pas les index pendant le chargement')
+    parser.add_argument('--restart', action='store_true',
+                        help='Ignore les points de reprise existants')
+    parser.add_argument('--profile', action='store_true',
+                        help='Enregistre un profil (piles + SQL) sous instance/profiles')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        # Base antérieure aux saisons : colonne player_performance.season et index
+        ensure_season_schema()
+        if args.restart:
+            BulkLoadCheckpoint.query.filter(
+                BulkLoadCheckpoint.source.in_([os.path.abspath(p) for p in args.paths])
+            ).delete(synchronize_session=False)
+            db.session.commit()
+        start = time.perf_counter()
+        loader = BulkLoader(chunk_size=args.chunk_size, create_missing_players=args.create_missing_players)
+        with profiler.profile('bulk_loader', ' '.join(args.paths), enabled=args.profile):
+            stats = loader.run(args.paths, defer_indexes=not args.keep_indexes)
+        elapsed = time.perf_counter() - start
+        if stats['inserted']:
+            # Agrégats des workers (la forme suit performance_version) ;
+            # l'instantané partagé est republié avec les nouvelles saisons
+            data_version.bump()
+            stats_snapshot.publish()
+        print(f"📊 {stats['inserted']} performances, {stats['games']} matchs, "
+              f"{stats['players_created']} joueurs créés, {stats['skipped']} ignorés "
+              f"en {elapsed:.1f} s ({stats['inserted'] / max(elapsed, 1e-9):,.0f} lignes/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+import fcntl
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime
+from types import MappingProxyType
+
+from flask import current_app
+
+from app import db
+from models import Team, Player, Game
+
+
+# Instantanés immuables : pas liés à une session SQLAlchemy, partageables
+# entre threads (et entre workers gunicorn après un fork, en copy-on-write)
+TeamRef = namedtuple('TeamRef', 'id name city conference division logo_url')
+LeaderRef = namedtuple('LeaderRef', 'player_id first_name last_name team_id value')
+SeasonInfo = namedtuple('SeasonInfo', 'season start end first_game last_game games')
+
+
+class DataVersion:
+    """Version des données synchronisées, partagée entre processus.
+
+    Le numéro est stocké dans un petit fichier (instance/data_version) :
+    bump() l'incrémente après une synchronisation, current() le relit au
+    plus toutes les `check_interval` secondes (un stat, sans requête SQL).
+    """
+
+    def __init__(self, path=None, check_interval=1.0, config_key='DATA_VERSION_PATH', filename='data_version'):
+        self._path = path
+        self.check_interval = check_interval
+        self.config_key = config_key
+        self.filename = filename
+        self._value = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self._path or current_app.config.get(self.config_key) or \
+            os.path.join(current_app.instance_path, self.filename)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def current(self):
+        now = time.monotonic()
+        if self._value is not None and now - self._checked_at < self.check_interval:
+            return self._value
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if self._value is None or mtime != self._mtime:
+                self._value, self._mtime = self._read(), mtime
+            self._checked_at = now
+            return self._value
+
+    def bump(self):
+        """Incrémente la version ; les caches de tous les workers se rechargeront.
+
+        La lecture-incrément-écriture se fait sous un verrou fichier
+        (fcntl.flock sur `<path>.lock`, le fichier de version étant remplacé
+        à chaque écriture) : deux workers qui incrémentent en même temps
+        obtiennent N+1 puis N+2, jamais deux fois N+1.
+        """
+        path = self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock, open(f'{path}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                value = self._read() + 1
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w') as f:
+                    f.write(str(value))
+                os.replace(tmp_path, path)
+                self._value, self._mtime = value, os.stat(path).st_mtime_ns
+                self._checked_at = time.monotonic()
+                return value
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+data_version = DataVersion()
+# Version des feuilles de match : incrémentée en plus de data_version par les
+# seules écritures de PlayerPerformance (chargements, ingestion, archivage).
+# La forme des joueurs ne se recharge pas quand une synchronisation ou un
+# ajout de joueur n'a touché qu'équipes, joueurs et matchs.
+performance_version = DataVersion(config_key='PERFORMANCE_VERSION_PATH', filename='performance_version')
+
+
+class ReadMostlyCache:
+    """Cache processus pour les données rarement modifiées.
+
+    Chaque entrée est calculée par un loader enregistré sous un nom, au
+    premier accès ou lors de warm(). invalidate() force le rechargement.
+    Avec une source de version (DataVersion), toutes les entrées sont
+    rechargées quand une synchronisation a changé la version.
+    """
+
+    def __init__(self, version=None):
+        self._loaders = {}
+        self._values = {}
+        self._lock = threading.RLock()
+        self._version = version
+        self._loaded_version = None
+
+    def register(self, loader, name=None):
+        """Enregistre un loader (utilisable comme décorateur)"""
+        self._loaders[name or loader.__name__] = loader
+        return loader
+
+    def _check_version(self):
+        version = self._version.current()
+        if version != self._loaded_version:
+            with self._lock:
+                if version != self._loaded_version:
+                    self._values.clear()
+                    self._loaded_version = version
+
+    def get(self, name):
+        if self._version is not None:
+            self._check_version()
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._values:
+                self._values[name] = self._loaders[name]()
+            return self._values[name]
+
+    def warm(self, names=None):
+        """Charge toutes les entrées (ou celles demandées)"""
+        for name in names or list(self._loaders):
+            self.get(name)
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._values.clear()
+            else:
+                self._values.pop(name, None)
+
+
+reference_cache = ReadMostlyCache(version=data_version)
+
+
+def current_season(today=None):
+    """Saison NBA en cours (une saison commence en octobre).
+
+    Seule source de la règle de saison : routes, services et archives
+    passent tous par cette fonction.
+    """
+    today = today or datetime.utcnow()
+    return today.year if today.month >= 10 else today.year - 1
+
+
+def season_bounds(season):
+    """Dates de début et de fin d'une saison (1er octobre - 30 juin)"""
+    return date(season, 10, 1), date(season + 1, 6, 30)
+
+
+@reference_cache.register
+def teams():
+    rows = Team.query.order_by(Team.name).all()
+    return tuple(
+        TeamRef(t.id, t.name, t.city, t.conference, t.division, t.logo_url) for t in rows
+    )
+
+
+@reference_cache.register
+def teams_by_id():
+    return MappingProxyType({team.id: team for team in reference_cache.get('teams')})
+
+
+@reference_cache.register
+def team_groups():
+    """Équipes regroupées par conférence puis division : {conférence: {division: (TeamRef, ...)}}"""
+    groups = {}
+    for team in reference_cache.get('teams'):
+        divisions = groups.setdefault(team.conference or '', {})
+        divisions.setdefault(team.division or '', []).append(team)
+    return MappingProxyType({
+        conference: MappingProxyType({division: tuple(members) for division, members in sorted(divisions.items())})
+        for conference, divisions in sorted(groups.items())
+    })
+
+
+@reference_cache.register
+def seasons():
+    """Saisons présentes en base, avec leurs bornes théoriques et réelles"""
+    rows = (
+        db.session.query(Game.season, db.func.min(Game.date), db.func.max(Game.date), db.func.count(Game.id))
+        .filter(Game.season.isnot(None))
+        .group_by(Game.season)
+        .order_by(Game.season)
+        .all()
+    )
+    return tuple(SeasonInfo(row[0], *season_bounds(row[0]), *row[1:]) for row in rows)
+
+
+@reference_cache.register
+def leaderboards(limit=10):
+    """Meilleurs joueurs par points, passes et rebonds par match"""
+    boards = {}
+    for key, column in (('points', Player.points_per_game),
+                        ('assists', Player.assists_per_game),
+                        ('rebounds', Player.rebounds_per_game)):
+        rows = (
+            db.session.query(Player.id, Player.first_name, Player.last_name, Player.team_id, column)
+            .order_by(column.desc())
+            .limit(limit)
+            .all()
+        )
+        boards[key] = tuple(LeaderRef(*row) for row in rows)
+    return boards
+
+
+def warm_caches(app):
+    """Précharge les caches de référence puis ferme les connexions SQL.
+
+    Appelé dans le processus maître gunicorn (preload_app) avant le fork :
+    les workers héritent des données déjà chargées sans les recharger, et
+    aucune connexion SQLite ouverte ne traverse le fork.
+    """
+    with app.app_context():
+        try:
+            reference_cache.warm()
+        except Exception as e:
+            # Base pas encore initialisée : les caches se chargeront au premier accès
+            reference_cache.invalidate()
+            print(f"Préchargement des caches impossible: {e}")
+        db.session.remove()
+        db.engine.dispose()
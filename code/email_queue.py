@@ -0,0 +1,222 @@
+import json
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+from flask_mail import Message
+
+
+@dataclass
+class EmailJob:
+    """Un email en attente d'envoi"""
+    recipient: str
+    subject: str
+    body: str
+    attempts: int = 0
+    ready_at: float = field(default_factory=time.monotonic)
+    last_error: str = None
+
+
+class EmailDeliveryQueue:
+    """File d'envoi d'emails en arrière-plan.
+
+    Un seul thread consomme la file, regroupe les messages par lots et
+    réutilise la même connexion SMTP tant que la file n'est pas vide.
+    Les échecs sont réessayés avec un délai croissant, puis placés dans
+    la liste des lettres mortes (dead_letters), journalisés et ajoutés au
+    fichier JSON lines MAIL_DEAD_LETTER_PATH (instance/mail_dead_letters.jsonl
+    par défaut) pour que l'exploitation puisse les consulter ou les renvoyer.
+    """
+
+    def __init__(self, app=None, mail=None, batch_size=20, idle_timeout=5.0,
+                 max_retries=3, retry_delay=2.0, max_dead_letters=500):
+        self.app = None
+        self.mail = mail
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_dead_letters = max_dead_letters
+        self.dead_letter_path = None
+
+        self.dead_letters = []
+        self.sent_count = 0
+
+        self._queue = queue.Queue()
+        self._retries = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._connection = None
+        self._outstanding = 0
+        self._last_activity = time.monotonic()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Lie la file à l'application (configuration MAIL_QUEUE_*)"""
+        self.app = app
+        self.batch_size = app.config.get('MAIL_QUEUE_BATCH_SIZE', self.batch_size)
+        self.max_retries = app.config.get('MAIL_QUEUE_MAX_RETRIES', self.max_retries)
+        self.retry_delay = app.config.get('MAIL_QUEUE_RETRY_DELAY', self.retry_delay)
+        self.dead_letter_path = app.config.get('MAIL_DEAD_LETTER_PATH') or \
+            os.path.join(app.instance_path, 'mail_dead_letters.jsonl')
+
+    # --- API publique -------------------------------------------------
+
+    def enqueue(self, recipient, subject, body):
+        """Ajoute un email à la file et démarre le thread si nécessaire"""
+        self._ensure_started()
+        with self._lock:
+            self._outstanding += 1
+        self._queue.put(EmailJob(recipient=recipient, subject=subject, body=body))
+
+    def enqueue_many(self, recipients, subject, body):
+        """Ajoute le même email pour plusieurs destinataires"""
+        count = 0
+        for recipient in recipients:
+            if recipient:
+                self.enqueue(recipient, subject, body)
+                count += 1
+        return count
+
+    def pending(self):
+        """Nombre d'emails pas encore envoyés ni abandonnés"""
+        with self._lock:
+            return self._outstanding
+
+    def join(self, timeout=None):
+        """Attend que la file soit vide (utile pour les scripts et les tests)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self):
+        """Arrête le thread après avoir vidé les messages prêts"""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._stopping.clear()
+
+    # --- Thread d'envoi -----------------------------------------------
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='email-delivery', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        with self.app.app_context():
+            while not (self._stopping.is_set() and not self.pending()):
+                batch = self._next_batch()
+                if batch:
+                    self._deliver(batch)
+                elif (self._connection is not None
+                      and time.monotonic() - self._last_activity > self.idle_timeout):
+                    self._close_connection()
+            self._close_connection()
+
+    def _next_batch(self):
+        """Récupère jusqu'à batch_size emails prêts à partir"""
+        batch = []
+        now = time.monotonic()
+
+        with self._lock:
+            ready = [job for job in self._retries if job.ready_at <= now]
+            self._retries = [job for job in self._retries if job.ready_at > now]
+        batch.extend(ready[:self.batch_size])
+        if len(ready) > self.batch_size:
+            with self._lock:
+                self._retries.extend(ready[self.batch_size:])
+
+        try:
+            if not batch:
+                batch.append(self._queue.get(timeout=0.5))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _open_connection(self):
+        if self._connection is None:
+            connection = self.mail.connect()
+            self._connection = connection.__enter__()
+        return self._connection
+
+    def _close_connection(self):
+        if self._connection is not None:
+            try:
+                self._connection.__exit__(None, None, None)
+            except Exception as e:
+                print(f"Erreur fermeture SMTP: {e}")
+            self._connection = None
+
+    def _deliver(self, batch):
+        sender = self.app.config.get('MAIL_DEFAULT_SENDER') or self.app.config.get('MAIL_USERNAME')
+        for job in batch:
+            try:
+                connection = self._open_connection()
+                connection.send(Message(
+                    subject=job.subject,
+                    recipients=[job.recipient],
+                    body=job.body,
+                    sender=sender
+                ))
+                with self._lock:
+                    self.sent_count += 1
+                    self._outstanding -= 1
+            except Exception as e:
+                # La connexion peut être dans un état incohérent : on la recrée
+                self._close_connection()
+                self._retry_or_dead_letter(job, e)
+        self._last_activity = time.monotonic()
+
+    def _retry_or_dead_letter(self, job, error):
+        job.attempts += 1
+        job.last_error = str(error)
+        if job.attempts >= self.max_retries:
+            self.app.logger.error("Email abandonné pour %s après %d tentatives: %s",
+                                  job.recipient, job.attempts, error)
+            self._persist_dead_letter(job)
+            with self._lock:
+                self.dead_letters.append(job)
+                self._outstanding -= 1
+                del self.dead_letters[:-self.max_dead_letters]
+            return
+        job.ready_at = time.monotonic() + self.retry_delay * (2 ** (job.attempts - 1))
+        with self._lock:
+            self._retries.append(job)
+
+    def _persist_dead_letter(self, job):
+        """Ajoute la lettre morte au fichier JSON lines (une ligne par email)"""
+        if not self.dead_letter_path:
+            return
+        entry = dict(asdict(job), failed_at=datetime.utcnow().isoformat())
+        entry.pop('ready_at')
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path), exist_ok=True)
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except OSError as e:
+            self.app.logger.error("Impossible d'enregistrer la lettre morte: %s", e)
+
+    def load_dead_letters(self, limit=100):
+        """Dernières lettres mortes enregistrées (fichier partagé par tous les workers)"""
+        try:
+            with open(self.dead_letter_path, encoding='utf-8') as f:
+                lines = f.readlines()[-limit:]
+        except (OSError, TypeError):
+            return []
+        return [json.loads(line) for line in lines if line.strip()]
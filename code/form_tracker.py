@@ -0,0 +1,259 @@
+import heapq
+import threading
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import db
+from caches import performance_version
+from models import Game, PlayerPerformance
+
+
+# Statistiques suivies (colonnes de PlayerPerformance) et fenêtres glissantes
+FORM_STATS = ('points', 'rebounds', 'assists', 'minutes')
+WINDOWS = (5, 10, 20)
+HISTORY = max(WINDOWS)
+
+
+class PlayerForm:
+    """État glissant d'un joueur : tampon circulaire des HISTORY derniers matchs.
+
+    Les sommes de chaque fenêtre sont tenues à jour à l'ajout d'un match
+    (on ajoute la nouvelle valeur et on retire celle qui sort de la
+    fenêtre), la moyenne exponentielle aussi : chaque ajout est en O(1).
+    """
+
+    __slots__ = ('values', 'game_ids', 'head', 'count', 'sums', 'ewma', 'last_date', 'last_game_id')
+
+    def __init__(self):
+        self.values = [None] * HISTORY
+        self.game_ids = [None] * HISTORY
+        self.head = 0
+        self.count = 0
+        self.sums = [[0.0] * len(FORM_STATS) for _ in WINDOWS]
+        self.ewma = None
+        self.last_date = None
+        self.last_game_id = None
+
+    def push(self, game_id, game_date, row, alpha):
+        for sums, window in zip(self.sums, WINDOWS):
+            if self.count >= window:
+                leaving = self.values[(self.head - window) % HISTORY]
+                for i, value in enumerate(row):
+                    sums[i] += value - leaving[i]
+            else:
+                for i, value in enumerate(row):
+                    sums[i] += value
+        self.values[self.head] = row
+        self.game_ids[self.head] = game_id
+        self.head = (self.head + 1) % HISTORY
+        self.count += 1
+        if self.ewma is None:
+            self.ewma = list(row)
+        else:
+            self.ewma = [alpha * value + (1 - alpha) * previous for value, previous in zip(row, self.ewma)]
+        self.last_date = game_date
+        self.last_game_id = game_id
+
+    def accepts(self, game_id, game_date):
+        """Vrai si le match peut être ajouté en fin de série (ordre chronologique, pas de doublon)"""
+        if self.last_date is None:
+            return True
+        if game_id in self.game_ids:
+            return False
+        return (game_date, game_id) > (self.last_date, self.last_game_id)
+
+    def averages(self, window):
+        index = WINDOWS.index(window)
+        games = min(self.count, window)
+        if not games:
+            return None
+        return {stat: round(total / games, 2) for stat, total in zip(FORM_STATS, self.sums[index])}
+
+    def to_dict(self):
+        return {
+            'games': self.count,
+            'last_game_date': self.last_date.isoformat() if self.last_date else None,
+            'windows': {
+                f'last_{window}': dict(self.averages(window) or {}, games=min(self.count, window))
+                for window in WINDOWS
+            },
+            'ewma': {stat: round(value, 2) for stat, value in zip(FORM_STATS, self.ewma or ())},
+        }
+
+
+class FormTracker:
+    """Forme récente des joueurs (moyennes sur 5/10/20 matchs et moyenne exponentielle).
+
+    Les matchs sont pris dans l'ordre de Game.date. L'état est chargé une
+    fois depuis la base (les `history` derniers matchs de chaque joueur,
+    via une fonction de fenêtre SQL), puis chaque nouvelle performance
+    insérée par ce processus est appliquée en O(1) après le commit. Une
+    performance antérieure au dernier match connu (rattrapage d'historique)
+    marque le joueur, recalculé seul à la lecture suivante. Les chargements
+    faits par d'autres processus sont repris quand la version des
+    performances (caches.performance_version) change ; les autres
+    écritures (synchronisation, ajout de joueur) ne rechargent rien.
+    """
+
+    def __init__(self, span=10, history=60):
+        self.alpha = 2.0 / (span + 1)
+        self.history = max(history, HISTORY)
+        self._forms = None
+        self._version = None
+        self._stale = set()
+        self._lock = threading.RLock()
+
+    def _query(self, player_ids=None):
+        rank = db.func.row_number().over(
+            partition_by=PlayerPerformance.player_id,
+            order_by=(Game.date.desc(), Game.id.desc())
+        ).label('rank')
+        inner = (
+            select(PlayerPerformance.player_id, PlayerPerformance.game_id, Game.date,
+                   *(getattr(PlayerPerformance, stat) for stat in FORM_STATS), rank)
+            .join(Game, PlayerPerformance.game_id == Game.id)
+        )
+        if player_ids is not None:
+            inner = inner.where(PlayerPerformance.player_id.in_(player_ids))
+        recent = inner.subquery()
+        return db.session.execute(
+            select(recent).where(recent.c.rank <= self.history)
+            .order_by(recent.c.player_id, recent.c.date, recent.c.game_id)
+        )
+
+    def _build(self, rows):
+        forms = {}
+        for player_id, game_id, game_date, *values in rows:
+            form = forms.get(player_id)
+            if form is None:
+                form = forms[player_id] = PlayerForm()
+            form.push(game_id, game_date, tuple(float(v or 0) for v in values[:len(FORM_STATS)]), self.alpha)
+        return forms
+
+    def load(self):
+        """(Re)charge l'état de tous les joueurs depuis la base"""
+        version = performance_version.current()
+        forms = self._build(self._query())
+        with self._lock:
+            self._forms, self._version = forms, version
+            self._stale.clear()
+        return len(forms)
+
+    def _ensure_loaded(self):
+        if self._forms is None or self._version != performance_version.current():
+            self.load()
+        elif self._stale:
+            with self._lock:
+                stale, self._stale = self._stale, set()
+            rebuilt = self._build(self._query(sorted(stale)))
+            with self._lock:
+                for player_id in stale:
+                    if player_id in rebuilt:
+                        self._forms[player_id] = rebuilt[player_id]
+                    else:
+                        self._forms.pop(player_id, None)
+        return self._forms
+
+    def record(self, player_id, game_id, game_date, values):
+        """Applique une nouvelle feuille de match ; sans effet tant que rien n'est chargé"""
+        if self._forms is None or game_date is None:
+            return
+        with self._lock:
+            form = self._forms.get(player_id)
+            if form is None:
+                form = self._forms[player_id] = PlayerForm()
+            if game_id in form.game_ids:
+                # Déjà connue (feuille ignorée par INSERT OR IGNORE)
+                return
+            if player_id not in self._stale and form.accepts(game_id, game_date):
+                form.push(game_id, game_date, tuple(float(v or 0) for v in values), self.alpha)
+            else:
+                # Appelé après le commit : pas de requête possible ici
+                self._stale.add(player_id)
+
+    def apply(self, items, version=None):
+        """Applique un lot de feuilles de match validé par ce processus.
+
+        `version` est la version des performances après l'écriture : si
+        l'état chargé n'était pas à la version précédente, une autre écriture
+        a eu lieu entre-temps et l'état sera rechargé entièrement.
+        """
+        if self._forms is None:
+            return
+        if version is not None and self._version != version - 1:
+            with self._lock:
+                self._forms = None
+            return
+        for item in items:
+            self.record(*item)
+        if version is not None:
+            with self._lock:
+                self._version = version
+
+    # --- Lecture ------------------------------------------------------
+
+    def form(self, player_id):
+        forms = self._ensure_loaded()
+        with self._lock:
+            form = forms.get(player_id)
+            return form.to_dict() if form else None
+
+    def hot_cold(self, stat='points', limit=10, min_games=10, short=5, long=20):
+        """Joueurs en forme / en méforme : écart entre moyennes courte et longue"""
+        if stat not in FORM_STATS:
+            raise ValueError(f"Statistique inconnue: {stat}")
+        forms = self._ensure_loaded()
+        column = FORM_STATS.index(stat)
+        short_index, long_index = WINDOWS.index(short), WINDOWS.index(long)
+        with self._lock:
+            deltas = [
+                (form.sums[short_index][column] / short - form.sums[long_index][column] / min(form.count, long),
+                 player_id,
+                 form.sums[short_index][column] / short)
+                for player_id, form in forms.items()
+                if form.count >= max(min_games, short)
+            ]
+        as_dict = lambda item: {'player_id': item[1], 'recent': round(item[2], 2), 'delta': round(item[0], 2)}
+        return {
+            'hot': [as_dict(item) for item in heapq.nlargest(limit, deltas) if item[0] > 0],
+            'cold': [as_dict(item) for item in heapq.nsmallest(limit, deltas) if item[0] < 0],
+        }
+
+
+form_tracker = FormTracker()
+
+
+# Les performances insérées via l'ORM sont appliquées après le commit :
+# after_insert les note sans requête, after_flush lit les dates de match
+# de tout le flush en une seule requête
+@event.listens_for(PlayerPerformance, 'after_insert')
+def _collect_performance(mapper, connection, target):
+    inserted = Session.object_session(target).info.setdefault('form_inserted', [])
+    inserted.append((target.player_id, target.game_id, tuple(getattr(target, stat) for stat in FORM_STATS)))
+
+
+@event.listens_for(Session, 'after_flush')
+def _resolve_game_dates(session, flush_context):
+    inserted = session.info.pop('form_inserted', None)
+    if not inserted:
+        return
+    game_ids = {game_id for _, game_id, _ in inserted}
+    dates = dict(session.connection().execute(select(Game.id, Game.date).where(Game.id.in_(game_ids))).all())
+    session.info.setdefault('form_pending', []).extend(
+        (player_id, game_id, dates.get(game_id), values) for player_id, game_id, values in inserted
+    )
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_performances(session):
+    pending = session.info.pop('form_pending', None)
+    if pending:
+        # Les autres workers rechargeront ; celui-ci applique le lot en place
+        form_tracker.apply(pending, version=performance_version.bump())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_performances(session):
+    session.info.pop('form_inserted', None)
+    session.info.pop('form_pending', None)
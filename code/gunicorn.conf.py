@@ -0,0 +1,53 @@
+"""
+Configuration gunicorn pour NBA Analytics
+=========================================
+
+L'application est préchargée dans le maître (preload_app) : import des
+modules, construction de l'application et chargement des caches de
+référence (équipes, saison, classements) ne se font qu'une fois, puis
+les workers partagent ces pages mémoire en copy-on-write.
+
+Les métriques de /metrics sont par worker (voir metrics.py).
+
+Variables d'environnement : PORT, GUNICORN_WORKERS, GUNICORN_PRELOAD (1/0),
+NOTIFICATION_RETENTION_HOURS (0 pour désactiver la rétention).
+"""
+
+import gc
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'wsgi:app'
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+timeout = 60
+accesslog = '-'
+
+
+def when_ready(server):
+    # Appelé dans le maître après le préchargement, avant le premier fork :
+    # geler le GC évite qu'une collecte ne réécrive (et ne duplique) les
+    # pages des objets hérités par les workers.
+    if server.cfg.preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import db
+    from wsgi import app
+    # Chaque worker ouvre ses propres connexions SQLite
+    if server.cfg.preload_app:
+        with app.app_context():
+            db.engine.dispose()
+
+    # Rétention des notifications : démarrée dans chaque worker, exécutée
+    # par un seul (verrou fichier), repris par un autre s'il meurt
+    retention_hours = float(os.getenv('NOTIFICATION_RETENTION_HOURS', 24))
+    if retention_hours > 0:
+        from notification_retention import NotificationRetentionJob
+        NotificationRetentionJob(
+            app, interval_hours=retention_hours,
+            lock_path=os.path.join(app.instance_path, 'notification_retention.lock')
+        ).start()
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from itertools import chain
+
+from flask import has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.security import check_password_hash
+
+from app import db
+from models import User
+from caches import DataVersion
+
+
+class UserSnapshot(UserMixin):
+    """Copie légère et immuable d'un utilisateur, utilisée comme current_user.
+
+    Elle évite de recharger la ligne User à chaque requête. Pour modifier
+    l'utilisateur, charger le modèle via get_model().
+    """
+
+    __slots__ = ('id', 'email', 'name', 'role', '_active')
+
+    def __init__(self, user):
+        object.__setattr__(self, 'id', user.id)
+        object.__setattr__(self, 'email', user.email)
+        object.__setattr__(self, 'name', user.name)
+        object.__setattr__(self, 'role', user.role)
+        object.__setattr__(self, '_active', bool(user.is_active))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("UserSnapshot est en lecture seule, utiliser get_model()")
+
+    @property
+    def is_active(self):
+        return self._active
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def get_model(self):
+        """Retourne la ligne User correspondante (pour les écritures)"""
+        return db.session.get(User, self.id)
+
+
+class IdentityCache:
+    """Cache processus des UserSnapshot avec durée de vie (TTL).
+
+    Chaque entrée porte la version des utilisateurs (fichier partagé
+    instance/user_version) lue avant le chargement de la ligne. Toute
+    modification ou suppression d'un User incrémente cette version après le
+    commit : les entrées de tous les workers deviennent obsolètes au plus
+    tard une seconde après (intervalle de relecture de la version), y compris
+    un instantané relu pendant la transaction.
+    """
+
+    def __init__(self, ttl=300, max_entries=10000, version=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = version
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        version = self.version.current() if self.version is not None else None
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry and entry[1] > now and entry[2] == version:
+            return entry[0]
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            self.invalidate(user_id)
+            return None
+
+        snapshot = UserSnapshot(user)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[user_id] = (snapshot, now + self.ttl, version)
+        return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class PasswordVerifier:
+    """Vérifie les mots de passe dans un pool borné de threads.
+
+    Le hachage (scrypt/pbkdf2) relâche le GIL : limiter le nombre de
+    vérifications simultanées évite qu'une vague de connexions monopolise
+    le CPU au détriment des autres requêtes.
+    """
+
+    class Busy(Exception):
+        """Trop de vérifications en attente"""
+
+    def __init__(self, max_workers=2, max_pending=32, timeout=10):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-check')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def verify(self, password_hash, password):
+        if not password_hash or password is None:
+            return False
+        if not self._slots.acquire(blocking=False):
+            raise PasswordVerifier.Busy()
+        try:
+            future = self._executor.submit(check_password_hash, password_hash, password)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Le créneau n'est rendu qu'une fois le hachage terminé, même après
+        # un dépassement du délai : max_pending borne vraiment la file
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordVerifier.Busy()
+
+
+# Version des utilisateurs partagée entre workers (distincte de data_version
+# pour ne pas recharger les caches de référence à chaque modification de profil)
+user_version = DataVersion(config_key='USER_VERSION_PATH', filename='user_version')
+identity_cache = IdentityCache(ttl=int(os.getenv('IDENTITY_CACHE_TTL', 300)), version=user_version)
+password_verifier = PasswordVerifier(
+    max_workers=int(os.getenv('PASSWORD_CHECK_WORKERS', 2)),
+    max_pending=int(os.getenv('PASSWORD_CHECK_MAX_PENDING', 32))
+)
+
+
+# Utilisateurs modifiés ou supprimés : relevés au flush, invalidés après le commit
+@event.listens_for(Session, 'after_flush')
+def _collect_users(session, flush_context):
+    user_ids = {obj.id for obj in chain(session.dirty, session.deleted) if isinstance(obj, User)}
+    if user_ids:
+        session.info.setdefault('identity_changed', set()).update(user_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_users(session):
+    user_ids = session.info.pop('identity_changed', None)
+    if not user_ids:
+        return
+    for user_id in user_ids:
+        identity_cache.invalidate(user_id)
+    if has_app_context():
+        user_version.bump()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_users(session):
+    session.info.pop('identity_changed', None)
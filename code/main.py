@@ -17,6 +17,9 @@ from app import app, db
 from models import User, Team, Player, Game, PlayerPerformance, Notification
 from services import NBAApiService, NotificationService, DataSyncService
 from balldontlie_service import BalldontlieService
+from notification_retention import NotificationRetentionJob
+from season_store import ensure_season_schema
+from caches import current_season
 from datetime import datetime
 
 
@@ -42,6 +45,7 @@ def init_database():
     """Initialise la base de données avec les équipes NBA réelles depuis balldontlie.io"""
     print("🔧 Initialisation de la base de données...")
     db.create_all()
+    ensure_season_schema()
     create_admin_user()
 
     print("📊 Synchronisation des équipes NBA depuis balldontlie.io...")
@@ -150,20 +154,7 @@ def init_database():
 
 def get_current_nba_season():
     """Retourne automatiquement la saison NBA en cours."""
-    today = datetime.now()
-    year = today.year
-    month = today.month
-
-    if month >= 10:  # Octobre, novembre, décembre
-        return year
-    elif month <= 6:  # Janvier à juin
-        return year - 1
-    else:
-        return year - 1  # Été : on garde la dernière saison finie
-
-# Exemple d'utilisation :
-season = get_current_nba_season()
-print(f"Saison NBA détectée : {season}")
+    return current_season(datetime.now())
 
 
 def main():
@@ -180,6 +171,11 @@ def main():
     with app.app_context():
         init_database()
 
+    # Purge/compaction périodique des notifications (0 pour désactiver)
+    retention_hours = float(os.getenv('NOTIFICATION_RETENTION_HOURS', 24))
+    if retention_hours > 0:
+        NotificationRetentionJob(app, interval_hours=retention_hours).start()
+
     host = os.getenv('HOST', '0.0.0.0')
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV') == 'development'
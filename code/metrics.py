@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+import requests
+from flask import Response, abort, g, has_request_context, jsonify, request
+from flask import template_rendered, before_render_template
+from flask_login import current_user, login_required
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Histogramme cumulatif au format Prometheus"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Stockage en mémoire des métriques du processus"""
+
+    def __init__(self, slow_log_size=50):
+        self._lock = threading.Lock()
+        self.histograms = defaultdict(Histogram)
+        self.counters = defaultdict(float)
+        self.slow_requests = deque(maxlen=slow_log_size)
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            self.histograms[(name, labels)].observe(value)
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self.counters[(name, labels)] += value
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.slow_requests.clear()
+
+    def render(self):
+        """Sérialise les métriques au format texte Prometheus"""
+        lines = []
+        with self._lock:
+            seen = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} counter")
+                    seen.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for (name, labels), hist in sorted(self.histograms.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} histogram")
+                    seen.add(name)
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {hist.total}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {hist.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {hist.total}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+registry = MetricsRegistry()
+
+
+def instrumented_get(service, endpoint, url, **kwargs):
+    """requests.get chronométré : latence et statut par service externe"""
+    start = time.perf_counter()
+    status = 'error'
+    try:
+        response = requests.get(url, **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        labels = (('service', service), ('endpoint', endpoint))
+        registry.observe('http_client_request_duration_seconds', labels, elapsed)
+        registry.inc('http_client_requests_total', labels + (('status', status),))
+        if has_request_context() and 'metrics_http' in g:
+            g.metrics_http.append((service, endpoint, elapsed))
+
+
+# --- Hooks SQLAlchemy ---------------------------------------------------
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    registry.observe('db_query_duration_seconds', (), elapsed)
+    if has_request_context() and 'metrics_queries' in g:
+        g.metrics_queries.append((statement, elapsed))
+
+
+# --- Hooks Flask --------------------------------------------------------
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context():
+        g.metrics_template_start = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    if has_request_context() and 'metrics_template_start' in g:
+        elapsed = time.perf_counter() - g.pop('metrics_template_start')
+        registry.observe('template_render_duration_seconds', (('template', template.name),), elapsed)
+
+
+def init_metrics(app):
+    """Installe l'instrumentation et la route /metrics sur l'application"""
+    app.config.setdefault('SLOW_REQUEST_MS', float(os.getenv('SLOW_REQUEST_MS', 500)))
+    app.config.setdefault('METRICS_TOKEN', os.getenv('METRICS_TOKEN'))
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = []
+        g.metrics_http = []
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unknown'
+        queries = g.get('metrics_queries', [])
+
+        labels = (('endpoint', endpoint), ('method', request.method))
+        registry.observe('http_request_duration_seconds', labels, elapsed)
+        registry.inc('http_requests_total', labels + (('status', str(response.status_code)),))
+        registry.inc('db_queries_total', (('endpoint', endpoint),), len(queries))
+        registry.inc('db_query_seconds_total', (('endpoint', endpoint),), sum(t for _, t in queries))
+
+        if elapsed * 1000 >= app.config['SLOW_REQUEST_MS']:
+            entry = {
+                'path': request.full_path,
+                'endpoint': endpoint,
+                'duration_ms': round(elapsed * 1000, 1),
+                'queries': [(sql, round(t * 1000, 2)) for sql, t in queries],
+                'http': g.get('metrics_http', []),
+            }
+            registry.slow_requests.append(entry)
+            app.logger.warning(
+                "Requête lente %s : %s ms, %d requêtes SQL\n%s", entry['path'], entry['duration_ms'],
+                len(queries), '\n'.join(f"  {ms:>8} ms  {' '.join(sql.split())}" for sql, ms in entry['queries'])
+            )
+        return response
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.route('/admin/slow_requests')
+    @login_required
+    def slow_requests():
+        """Dernières requêtes lentes de ce worker, avec leurs requêtes SQL (administrateurs)"""
+        if not current_user.is_admin:
+            abort(403)
+        return jsonify(list(reversed(registry.slow_requests)))
+
+    @app.route('/metrics')
+    def metrics():
+        """Métriques au format texte Prometheus.
+
+        Les compteurs sont propres au processus : derrière gunicorn, chaque
+        collecte tombe sur un worker au hasard et ne voit que ses valeurs,
+        les séries font donc des sauts d'une collecte à l'autre. Pour des
+        compteurs exacts, collecter une instance à un seul worker
+        (GUNICORN_WORKERS=1) ; la ligne nba_metrics_process indique quel
+        processus a répondu.
+        """
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f"Bearer {token}":
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        body = registry.render() + f'# TYPE nba_metrics_process gauge\nnba_metrics_process{{pid="{os.getpid()}"}} 1\n'
+        return Response(body, mimetype='text/plain; version=0.0.4')
+
+    return registry
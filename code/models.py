@@ -117,6 +117,14 @@ class Game(db.Model):
 
     performances = db.relationship('PlayerPerformance', backref='game', lazy=True, cascade='all, delete-orphan')
 
+    # Partitionnement par saison : les lectures « saison en cours » n'utilisent
+    # que la tranche de l'index correspondant à cette saison
+    __table_args__ = (
+        db.Index('ix_game_season_date', 'season', 'date'),
+        db.Index('ix_game_season_home', 'season', 'home_team_id'),
+        db.Index('ix_game_season_visitor', 'season', 'visitor_team_id'),
+    )
+
 # Modèle performance de joueur (hérite de Statistics)
 class PlayerPerformance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -132,7 +140,16 @@ class PlayerPerformance(db.Model):
     three_points_attempted = db.Column(db.Integer, default=0)
     free_throws_made = db.Column(db.Integer, default=0)
     free_throws_attempted = db.Column(db.Integer, default=0)
+    # Copie de Game.season (dénormalisée) pour partitionner les performances
+    season = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_performance_season_player', 'season', 'player_id'),
+        # Une seule feuille de match par joueur et par match : les chargements
+        # (INSERT OR IGNORE) peuvent être rejoués sans doublon
+        db.Index('ix_performance_player_game', 'player_id', 'game_id', unique=True),
+    )
     
     def get_statistics(self):
         """Retourne un objet Statistics basé sur cette performance"""
@@ -152,6 +169,44 @@ class Notification(db.Model):
     type = db.Column(db.String(20), default='info')  # info, warning, success, error
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Index pour l'historique d'un utilisateur et pour la purge par type/âge
+    __table_args__ = (
+        db.Index('ix_notification_user_created', 'user_id', 'created_at'),
+        db.Index('ix_notification_type_created', 'type', 'created_at'),
+    )
     
     def mark_as_read(self):
-        self.is_read = True 
\ No newline at end of file
+        self.is_read = True 
+
+
+# Point de reprise du chargeur de masse (bulk_loader.py), mis à jour dans la
+# même transaction que les lignes insérées
+class BulkLoadCheckpoint(db.Model):
+    source = db.Column(db.String(500), primary_key=True)
+    records = db.Column(db.Integer, default=0)
+    inserted = db.Column(db.Integer, default=0)
+    completed = db.Column(db.Boolean, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# Journal des changements détectés par la synchronisation (DataSyncService) :
+# une ligne par changement, rattachée aux équipes concernées pour cibler
+# les notifications des gestionnaires
+class SyncChange(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    sync_id = db.Column(db.String(32), nullable=False)
+    entity = db.Column(db.String(20), nullable=False)  # team, player, game
+    entity_id = db.Column(db.Integer, nullable=False)
+    change_type = db.Column(db.String(20), nullable=False)  # new_player, trade, stat_jump, final_score
+    field = db.Column(db.String(50))
+    old_value = db.Column(db.String(100))
+    new_value = db.Column(db.String(100))
+    team_id = db.Column(db.Integer)
+    other_team_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_sync_change_sync', 'sync_id'),
+        db.Index('ix_sync_change_entity', 'entity', 'entity_id', 'created_at'),
+    )
@@ -0,0 +1,246 @@
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from models import Notification
+
+
+# Politiques par défaut, surchargeables via app.config['NOTIFICATION_RETENTION'].
+#   read_max_age_days   : supprime les notifications lues plus anciennes
+#   unread_max_age_days : supprime aussi les non lues au-delà de cet âge (None = jamais)
+#   digest_titles       : titres répétitifs regroupés en une seule ligne de synthèse
+#   digest_after_days   : âge minimal avant regroupement
+# Seuls les titres sans contenu propre sont regroupés : le détail des
+# changements d'équipe ('Changements sur vos équipes') serait perdu.
+# Plus rien n'émet 'Synchronisation terminée' depuis le journal des
+# changements (DataSyncService) : ce regroupement ne concerne que les
+# anciennes lignes encore en base.
+DEFAULT_RETENTION_POLICIES = {
+    'info': {
+        'read_max_age_days': 30,
+        'unread_max_age_days': 180,
+        'digest_titles': ['Synchronisation terminée'],
+        'digest_after_days': 1,
+    },
+    'success': {'read_max_age_days': 30, 'unread_max_age_days': 180},
+    'push': {'read_max_age_days': 14, 'unread_max_age_days': 90},
+    'warning': {'read_max_age_days': 90, 'unread_max_age_days': None},
+    'error': {'read_max_age_days': 90, 'unread_max_age_days': None},
+}
+
+
+class NotificationRetentionService:
+    """Purge, compaction et archivage des notifications.
+
+    Les suppressions se font par petits lots (une transaction courte par lot)
+    afin de ne jamais bloquer longtemps l'écriture sur SQLite. Chaque ligne
+    supprimée est d'abord écrite dans une archive NDJSON sous instance/.
+    """
+
+    def __init__(self, policies=None, chunk_size=500, pause=0.05, archive_dir=None):
+        self.policies = policies or current_app.config.get('NOTIFICATION_RETENTION', DEFAULT_RETENTION_POLICIES)
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.archive_dir = archive_dir or os.path.join(current_app.instance_path, 'archive')
+
+    # --- Archivage ----------------------------------------------------
+
+    def _archive_path(self):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        return os.path.join(
+            self.archive_dir, f"notifications-{datetime.utcnow():%Y-%m}.ndjson"
+        )
+
+    def _archive(self, rows):
+        with open(self._archive_path(), 'a', encoding='utf-8') as f:
+            for n in rows:
+                f.write(json.dumps({
+                    'id': n.id,
+                    'user_id': n.user_id,
+                    'title': n.title,
+                    'message': n.message,
+                    'type': n.type,
+                    'is_read': n.is_read,
+                    'created_at': n.created_at.isoformat() if n.created_at else None,
+                    'archived_at': datetime.utcnow().isoformat(),
+                }, ensure_ascii=False) + '\n')
+
+    def _delete_in_chunks(self, query):
+        """Archive puis supprime les lignes de la requête, un lot à la fois"""
+        removed = 0
+        while True:
+            rows = query.order_by(Notification.id).limit(self.chunk_size).all()
+            if not rows:
+                break
+            self._archive(rows)
+            ids = [n.id for n in rows]
+            Notification.query.filter(Notification.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            removed += len(ids)
+            if len(rows) < self.chunk_size:
+                break
+            time.sleep(self.pause)
+        return removed
+
+    # --- Politiques ---------------------------------------------------
+
+    def purge_expired(self, now=None):
+        """Supprime les notifications expirées selon la politique de leur type"""
+        now = now or datetime.utcnow()
+        removed = 0
+        for notification_type, policy in self.policies.items():
+            read_days = policy.get('read_max_age_days')
+            if read_days is not None:
+                removed += self._delete_in_chunks(Notification.query.filter(
+                    Notification.type == notification_type,
+                    Notification.is_read.is_(True),
+                    Notification.created_at < now - timedelta(days=read_days)
+                ))
+            unread_days = policy.get('unread_max_age_days')
+            if unread_days is not None:
+                removed += self._delete_in_chunks(Notification.query.filter(
+                    Notification.type == notification_type,
+                    Notification.created_at < now - timedelta(days=unread_days)
+                ))
+        return removed
+
+    DIGEST_MESSAGE = re.compile(r'^(\d+) notifications regroupées entre le (\S+) et le (\S+)\.$')
+
+    def compact_digests(self, now=None):
+        """Regroupe les notifications répétitives d'un utilisateur en une seule ligne.
+
+        Les nouvelles lignes sont fusionnées dans la synthèse existante de
+        l'utilisateur pour ce titre : un passage répété n'en crée pas d'autre.
+        """
+        now = now or datetime.utcnow()
+        created = 0
+        for notification_type, policy in self.policies.items():
+            cutoff = now - timedelta(days=policy.get('digest_after_days', 1))
+            for title in policy.get('digest_titles', []):
+                digest_title = f"{title} (résumé)"
+                groups = (
+                    db.session.query(
+                        Notification.user_id,
+                        db.func.count(Notification.id),
+                        db.func.min(Notification.created_at),
+                        db.func.max(Notification.created_at),
+                        db.func.min(db.cast(Notification.is_read, db.Integer)),
+                    )
+                    .filter(Notification.type == notification_type,
+                            Notification.title == title,
+                            Notification.created_at < cutoff)
+                    .group_by(Notification.user_id)
+                    .all()
+                )
+                digests = {
+                    digest.user_id: digest for digest in Notification.query.filter(
+                        Notification.type == notification_type,
+                        Notification.title == digest_title,
+                        Notification.user_id.in_([group[0] for group in groups])
+                    ).order_by(Notification.created_at)
+                } if groups else {}
+                for user_id, count, first, last, all_read in groups:
+                    digest = digests.get(user_id)
+                    if digest is None and count < 2:
+                        continue
+                    self._delete_in_chunks(Notification.query.filter(
+                        Notification.user_id == user_id,
+                        Notification.type == notification_type,
+                        Notification.title == title,
+                        Notification.created_at < cutoff
+                    ))
+                    first_label = f"{first:%d/%m/%Y}"
+                    if digest is None:
+                        digest = Notification(user_id=user_id, title=digest_title, type=notification_type,
+                                              is_read=bool(all_read), created_at=last)
+                        db.session.add(digest)
+                        created += 1
+                    else:
+                        match = self.DIGEST_MESSAGE.match(digest.message or '')
+                        if match:
+                            count += int(match.group(1))
+                            first_label = match.group(2)
+                        else:
+                            count += 1
+                        digest.is_read = bool(digest.is_read and all_read)
+                        digest.created_at = max(digest.created_at or last, last)
+                    digest.message = (f"{count} notifications regroupées entre le "
+                                      f"{first_label} et le {digest.created_at:%d/%m/%Y}.")
+                    db.session.commit()
+        return created
+
+    def run(self):
+        """Exécute un passage complet : compaction puis purge"""
+        digests = self.compact_digests()
+        removed = self.purge_expired()
+        print(f"🧹 Rétention notifications: {digests} synthèses, {removed} supprimées")
+        return {'digests': digests, 'removed': removed}
+
+
+class NotificationRetentionJob:
+    """Lance périodiquement NotificationRetentionService dans un thread.
+
+    Avec `lock_path` (workers gunicorn), chaque processus démarre le job mais
+    seul celui qui obtient le verrou fichier l'exécute ; les autres réessaient
+    toutes les `lock_retry` secondes et prennent le relais si ce worker meurt.
+    """
+
+    def __init__(self, app, interval_hours=24, lock_path=None, lock_retry=60, **service_kwargs):
+        self.app = app
+        self.interval = interval_hours * 3600
+        self.lock_path = lock_path
+        self.lock_retry = lock_retry
+        self.service_kwargs = service_kwargs
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='notification-retention', daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _acquire_lock(self):
+        """Verrou exclusif non bloquant, conservé tant que le processus vit"""
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        if self.lock_path:
+            while not self._acquire_lock():
+                if self._stop.wait(self.lock_retry):
+                    return
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    NotificationRetentionService(**self.service_kwargs).run()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Erreur rétention notifications: {e}")
+            self._stop.wait(self.interval)
@@ -0,0 +1,249 @@
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app, g, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class Profile:
+    """Profil en cours d'un thread : piles échantillonnées et requêtes SQL"""
+
+    def __init__(self, name, label, thread_id, directory, max_queries):
+        self.id = f"{datetime.utcnow():%Y%m%d-%H%M%S}-{re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')[:40]}" \
+                  f"-{secrets.token_hex(2)}"
+        self.name = name
+        self.label = label
+        self.thread_id = thread_id
+        self.directory = directory
+        self.max_queries = max_queries
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.stacks = Counter()
+        self.samples = 0
+        self.queries = []
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self._query_starts = []
+
+    def add_query(self, statement, elapsed):
+        self.query_count += 1
+        self.query_seconds += elapsed
+        if len(self.queries) < self.max_queries:
+            self.queries.append((statement, elapsed))
+
+
+class SamplingProfiler:
+    """Profileur par échantillonnage, activé à la demande.
+
+    start() enregistre le thread courant ; tant qu'au moins un profil est
+    actif, un thread échantillonneur relève sa pile toutes les `interval`
+    secondes (sys._current_frames) et les requêtes SQL de ce thread sont
+    chronométrées. stop() écrit les piles au format « collapsed stacks »
+    (flamegraph.pl, speedscope) et un fichier JSON de métadonnées et de SQL.
+
+    Sans profil actif, aucun thread ne tourne et les hooks SQL s'arrêtent au
+    premier test.
+    """
+
+    def __init__(self, directory=None, interval=0.005, keep=50, max_queries=2000):
+        self._directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.max_queries = max_queries
+        self._active = {}
+        self._labels = {}
+        self._lock = threading.Lock()
+        self._sampler = None
+
+    @property
+    def directory(self):
+        return self._directory or current_app.config.get('PROFILE_DIR') or \
+            os.path.join(current_app.instance_path, 'profiles')
+
+    # --- Démarrage / arrêt --------------------------------------------
+
+    def start(self, name, label=None):
+        """Profile le thread courant ; None s'il est déjà profilé"""
+        thread_id = threading.get_ident()
+        profile = Profile(name, label or name, thread_id, self.directory, self.max_queries)
+        with self._lock:
+            if thread_id in self._active:
+                return None
+            self._active[thread_id] = profile
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+                self._sampler.start()
+        return profile
+
+    def stop(self, profile):
+        """Termine le profil et l'écrit ; retourne le chemin du fichier de piles"""
+        with self._lock:
+            self._active.pop(profile.thread_id, None)
+        duration = time.perf_counter() - profile.start
+        os.makedirs(profile.directory, exist_ok=True)
+        stacks_path = os.path.join(profile.directory, f'{profile.id}.folded')
+        with open(stacks_path, 'w') as f:
+            for stack, count in profile.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        meta = {
+            'id': profile.id,
+            'name': profile.name,
+            'label': profile.label,
+            'started_at': profile.started_at.isoformat(),
+            'duration_ms': round(duration * 1000, 1),
+            'interval_ms': self.interval * 1000,
+            'samples': profile.samples,
+            'query_count': profile.query_count,
+            'query_ms': round(profile.query_seconds * 1000, 1),
+            'queries': [{'sql': sql, 'ms': round(t * 1000, 2)} for sql, t in profile.queries],
+        }
+        with open(os.path.join(profile.directory, f'{profile.id}.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+        self._prune(profile.directory)
+        return stacks_path
+
+    @contextmanager
+    def profile(self, name, label=None, enabled=True):
+        """Profile le bloc (tâche de synchronisation, chargement en ligne de commande)"""
+        profile = self.start(name, label) if enabled else None
+        try:
+            yield profile
+        finally:
+            if profile is not None:
+                path = self.stop(profile)
+                print(f"🔬 Profil {profile.id} : {profile.samples} échantillons, "
+                      f"{profile.query_count} requêtes SQL -> {path}")
+
+    # --- Échantillonnage ----------------------------------------------
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _run(self):
+        while True:
+            # Sous le verrou : stop() ne lit les piles qu'une fois le profil retiré
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                frames = sys._current_frames()
+                for profile in self._active.values():
+                    frame = frames.get(profile.thread_id)
+                    stack = []
+                    while frame is not None:
+                        stack.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    if stack:
+                        profile.stacks[';'.join(reversed(stack))] += 1
+                        profile.samples += 1
+                del frames, frame
+            time.sleep(self.interval)
+
+    # --- Fichiers -----------------------------------------------------
+
+    def _prune(self, directory):
+        """Ne conserve que les `keep` profils les plus récents"""
+        metas = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+        for name in metas[:-self.keep] if self.keep else ():
+            for suffix in ('.json', '.folded'):
+                try:
+                    os.remove(os.path.join(directory, name[:-5] + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list_profiles(self, limit=50):
+        """Métadonnées des profils enregistrés, du plus récent au plus ancien"""
+        directory = self.directory
+        try:
+            names = sorted((name for name in os.listdir(directory) if name.endswith('.json')), reverse=True)
+        except FileNotFoundError:
+            return []
+        profiles = []
+        for name in names[:limit]:
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            meta.pop('queries', None)
+            profiles.append(meta)
+        return profiles
+
+    def load(self, profile_id):
+        """Métadonnées complètes (avec le SQL) d'un profil, ou None"""
+        if not re.fullmatch(r'[A-Za-z0-9_-]+', profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f'{profile_id}.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+profiler = SamplingProfiler()
+
+
+# --- Hooks SQLAlchemy ---------------------------------------------------
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not profiler._active:
+        return
+    profile = profiler._active.get(threading.get_ident())
+    if profile is not None:
+        profile._query_starts.append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not profiler._active:
+        return
+    profile = profiler._active.get(threading.get_ident())
+    if profile is not None and profile._query_starts:
+        profile.add_query(statement, time.perf_counter() - profile._query_starts.pop())
+
+
+# --- Hooks Flask --------------------------------------------------------
+
+def init_profiler(app):
+    """Profilage à la demande des requêtes : en-tête X-Profile ou ?_profile=1, administrateurs seulement"""
+    app.config.setdefault('PROFILE_DIR', os.getenv('PROFILE_DIR'))
+    app.config.setdefault('PROFILE_SYNC_JOBS', os.getenv('PROFILE_SYNC_JOBS', '0') == '1')
+    profiler.interval = float(os.getenv('PROFILE_INTERVAL_MS', profiler.interval * 1000)) / 1000
+
+    @app.before_request
+    def _start_profile():
+        if not (request.headers.get('X-Profile') or request.args.get('_profile')):
+            return
+        if current_user.is_authenticated and current_user.is_admin:
+            g.profile = profiler.start(f'{request.method} {request.path}', request.full_path)
+
+    @app.after_request
+    def _stop_profile(response):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profiler.stop(profile)
+            response.headers['X-Profile-Id'] = profile.id
+        return response
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        # Requête interrompue par une exception : le profil est quand même écrit
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profiler.stop(profile)
+
+    return profiler
@@ -1,35 +1,52 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+from flask import render_template, request, redirect, url_for, flash, jsonify, abort, current_app, send_from_directory
 from flask_login import login_user, logout_user, login_required, current_user
-from app import app, db
-from models import User, Team, Player, Game, PlayerPerformance, Notification
+from app import db
+from models import User, Player, Game, PlayerPerformance
 from services import NBAApiService, NotificationService, DataSyncService
-from werkzeug.security import generate_password_hash, check_password_hash
-import os
-from datetime import datetime, timedelta
-import requests
-from flask import render_template
-from flask_login import login_required
-from app import app
-from balldontlie_service import BalldontlieService
+from datetime import datetime
+from sqlalchemy.orm import contains_eager, joinedload
+from identity import UserSnapshot, PasswordVerifier, password_verifier
+from caches import reference_cache, data_version
+from season_store import season_store
+from similarity import similarity_index
+from stats_snapshot import stats_snapshot, compare_from_db
+from form_tracker import form_tracker, FORM_STATS
+from team_analytics import team_analytics
+from profiler import profiler
+
+# Les routes sont déclarées ici puis enregistrées par create_app()
+_routes = []
+
+def route(rule, **options):
+    """Équivalent différé de @app.route"""
+    def decorator(view_func):
+        _routes.append((rule, view_func, options))
+        return view_func
+    return decorator
+
+def register_routes(app):
+    """Enregistre toutes les routes du module sur l'application"""
+    for rule, view_func, options in _routes:
+        app.add_url_rule(rule, view_func=view_func, **options)
 
 # Services
 nba_api = NBAApiService()
 notification_service = NotificationService()
 data_sync = DataSyncService()
 
-@app.route('/test')
+@route('/test')
 def test():
     """Route de test pour vérifier le rendu des templates"""
     return render_template('test.html')
 
-@app.route('/')
+@route('/')
 def index():
     """Page d'accueil"""
     if current_user.is_authenticated:
         return redirect(url_for('dashboard'))
     return render_template('index.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     """Page de connexion"""
     if current_user.is_authenticated:
@@ -41,8 +58,14 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if user and user.check_password(password):
-            login_user(user)
+        try:
+            valid = user is not None and password_verifier.verify(user.password_hash, password)
+        except PasswordVerifier.Busy:
+            flash('Serveur très sollicité, veuillez réessayer dans un instant.', 'error')
+            return render_template('login.html'), 503
+
+        if valid:
+            login_user(UserSnapshot(user))
             flash('Connexion réussie!', 'success')
             return redirect(url_for('dashboard'))
         else:
@@ -50,7 +73,7 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@route('/register', methods=['GET', 'POST'])
 def register():
     """Page d'inscription"""
     if current_user.is_authenticated:
@@ -76,7 +99,7 @@ def register():
     
     return render_template('register.html')
 
-@app.route('/logout')
+@route('/logout')
 @login_required
 def logout():
     """Déconnexion"""
@@ -84,12 +107,12 @@ def logout():
     flash('Vous avez été déconnecté.', 'info')
     return redirect(url_for('index'))
 
-@app.route('/dashboard')
+@route('/dashboard')
 @login_required
 def dashboard():
     """Tableau de bord principal"""
     # Statistiques pour le dashboard
-    total_teams = Team.query.count()
+    total_teams = len(reference_cache.get('teams'))
     total_players = Player.query.count()
     recent_games = Game.query.order_by(Game.date.desc()).limit(10).all()
     
@@ -105,37 +128,50 @@ def dashboard():
                          unread_notifications=unread_notifications)
 
 
-@app.route('/teams')
+@route('/teams')
 @login_required
 def teams():
-    teams = Team.query.all()
+    teams = reference_cache.get('teams')
     return render_template('teams.html', teams=teams)
 
 
-@app.route('/team/<int:team_id>')
+@route('/team/<int:team_id>')
 @login_required
 def team_detail(team_id):
     """Détails d'une équipe"""
-    team = Team.query.get_or_404(team_id)
-    players = Player.query.filter_by(team_id=team_id).all()
-    games = Game.query.filter(
-        (Game.home_team_id == team_id) | (Game.home_team_id== team_id)
-    ).order_by(Game.date.desc()).limit(10).all()
+    team = reference_cache.get('teams_by_id').get(team_id)
+    if team is None:
+        abort(404)
+    # Effectif et agrégats lus dans le magasin précalculé
+    players = team_analytics.roster(team_id)
+    summary = team_analytics.team_summary(team_id)
+    recent_games = (
+        Game.query
+        .options(joinedload(Game.home_team), joinedload(Game.visitor_team))
+        .filter((Game.home_team_id == team_id) | (Game.visitor_team_id == team_id))
+        .order_by(Game.date.desc())
+        .limit(10)
+        .all()
+    )
     
-    return render_template('team_detail.html', team=team, players=players, games=games)
+    return render_template('team_detail.html', team=team, players=players, summary=summary,
+                           recent_games=recent_games)
 
-@app.route('/players')
+@route('/players')
 @login_required
 def players():
     """Liste des joueurs, option de filtrage par équipe"""
     team_id = request.args.get('team_id', type=int)
     
-    if team_id:
+    # Servi depuis l'instantané partagé quand il existe, sans requête SQL
+    snapshot = stats_snapshot.current()
+    if snapshot is not None:
+        players = snapshot.players(team_id)
+    elif team_id:
         players = Player.query.filter_by(team_id=team_id).all()
     else:
         players = Player.query.all()
-    
-    teams = Team.query.all()
+    teams = reference_cache.get('teams')
     
     return render_template(
         'players.html',
@@ -144,16 +180,27 @@ def players():
         selected_team=team_id
     )
 
-@app.route('/player/<int:player_id>')
+@route('/player/<int:player_id>')
 @login_required
 def player_detail(player_id):
     """Détails d'un joueur"""
     player = Player.query.get_or_404(player_id)
-    performances = PlayerPerformance.query.filter_by(player_id=player_id).order_by(PlayerPerformance.created_at.desc()).limit(10).all()
+    # Derniers matchs dans l'ordre des dates de match (pas de l'insertion)
+    recent_games = (
+        PlayerPerformance.query
+        .join(Game, PlayerPerformance.game_id == Game.id)
+        .options(contains_eager(PlayerPerformance.game).joinedload(Game.home_team),
+                 contains_eager(PlayerPerformance.game).joinedload(Game.visitor_team))
+        .filter(PlayerPerformance.player_id == player_id)
+        .order_by(Game.date.desc())
+        .limit(10)
+        .all()
+    )
     
-    return render_template('player_detail.html', player=player, performances=performances)
+    return render_template('player_detail.html', player=player, recent_games=recent_games,
+                           form=form_tracker.form(player_id))
 
-@app.route('/games')
+@route('/games')
 @login_required
 def games():
     # On récupère simplement les matchs les plus récents
@@ -168,29 +215,35 @@ def get_recent_games(limit=20):
 
 
 
-@app.route('/add_player', methods=['GET', 'POST'])
+@route('/add_player', methods=['GET', 'POST'])
 @login_required
 def add_player():
     """Ajouter un nouveau joueur"""
+    teams = reference_cache.get('teams')
     if request.method == 'POST':
-        name = request.form.get('name')
+        name = (request.form.get('name') or '').strip()
         position = request.form.get('position')
-        team_id = request.form.get('team_id')
-        jersey_number = request.form.get('jersey_number')
+        team_id = request.form.get('team_id', type=int)
         
-        if not name or not team_id:
+        if not name or team_id not in reference_cache.get('teams_by_id'):
             flash('Tous les champs obligatoires doivent être remplis.', 'error')
-            return render_template('add_player.html', teams=Team.query.all())
+            return render_template('add_player.html', teams=teams)
         
+        first_name, _, last_name = name.partition(' ')
         player = Player(
-            name=name,
+            first_name=first_name,
+            last_name=last_name or first_name,
             position=position,
-            team_id=team_id,
-            jersey_number=jersey_number
+            team_id=team_id
         )
         
         db.session.add(player)
         db.session.commit()
+        # Les caches des autres workers se rechargeront ; l'instantané est
+        # republié en arrière-plan, hors de la requête
+        version = data_version.bump()
+        stats_snapshot.publish_later()
+        team_analytics.refresh([player.id], version=version)
         
         # Créer une notification
         NotificationService.create_notification(
@@ -203,47 +256,76 @@ def add_player():
         flash('Joueur ajouté avec succès!', 'success')
         return redirect(url_for('players'))
     
-    return render_template('add_player.html', teams=Team.query.all())
+    return render_template('add_player.html', teams=teams)
 
-@app.route('/sync_data')
+@route('/sync_data')
 @login_required
 def sync_data():
     """Synchroniser les données avec l'API NBA"""
     try:
-        teams_synced = data_sync.sync_teams()
-        players_synced = data_sync.sync_players()
-        games_synced = data_sync.sync_games()
+        with profiler.profile('sync_all', enabled=current_app.config['PROFILE_SYNC_JOBS']):
+            result = data_sync.sync_all()
         
-        flash(f'Synchronisation terminée: {teams_synced} équipes, {players_synced} joueurs, {games_synced} matchs', 'success')
-        
-        # Notification
-        NotificationService.create_notification(
-            current_user.id,
-            'Synchronisation terminée',
-            f'Données synchronisées: {teams_synced} équipes, {players_synced} joueurs, {games_synced} matchs',
-            'info'
+        # Rien n'a changé : pas d'écriture, caches et instantané conservés
+        if result['written']:
+            version = data_version.bump()
+            team_analytics.refresh(result['written_ids']['players'], result['written_ids']['games'],
+                                   version=version)
+            # La synchronisation n'écrit pas de performances : seuls les joueurs écrits changent
+            similarity_index.refresh(result['written_ids']['players'], version=version)
+            stats_snapshot.publish()
+        # Les gestionnaires des équipes concernées sont notifiés par sync_all()
+        flash(
+            f"Synchronisation terminée: {result['teams']} équipes, {result['players']} joueurs, "
+            f"{result['games']} matchs, {result['changes']} changements "
+            f"({result['notified']} gestionnaires notifiés)",
+            'success'
         )
         
     except Exception as e:
+        # Données, journal et notifications sont validés ensemble : rien n'est écrit
+        db.session.rollback()
         flash(f'Erreur lors de la synchronisation: {str(e)}', 'error')
     
     return redirect(url_for('dashboard'))
 
-@app.route('/notifications')
+@route('/admin/profiles')
+@login_required
+def admin_profiles():
+    """Profils enregistrés (requêtes avec X-Profile / ?_profile=1, synchronisations)"""
+    if not current_user.is_admin:
+        abort(403)
+    return render_template('admin_profiles.html', profiles=profiler.list_profiles())
+
+@route('/admin/profiles/<profile_id>')
+@login_required
+def admin_profile(profile_id):
+    """Métadonnées et requêtes SQL d'un profil ; ?format=folded pour les piles"""
+    if not current_user.is_admin:
+        abort(403)
+    profile = profiler.load(profile_id)
+    if profile is None:
+        abort(404)
+    if request.args.get('format') == 'folded':
+        return send_from_directory(profiler.directory, f'{profile_id}.folded',
+                                   mimetype='text/plain', as_attachment=True)
+    return jsonify(profile)
+
+@route('/notifications')
 @login_required
 def notifications():
     """Page des notifications"""
     notifications = NotificationService.get_user_notifications(current_user.id)
     return render_template('notifications.html', notifications=notifications)
 
-@app.route('/notifications/mark_read/<int:notification_id>')
+@route('/notifications/mark_read/<int:notification_id>')
 @login_required
 def mark_notification_read(notification_id):
     """Marquer une notification comme lue"""
     NotificationService.mark_notification_as_read(notification_id)
     return jsonify({'success': True})
 
-@app.route('/api/notifications/unread')
+@route('/api/notifications/unread')
 @login_required
 def api_unread_notifications():
     """API pour récupérer les notifications non lues"""
@@ -256,20 +338,22 @@ def api_unread_notifications():
         'created_at': n.created_at.isoformat()
     } for n in notifications])
 
-@app.route('/profile')
+@route('/profile')
 @login_required
 def profile():
     """Profil utilisateur"""
     return render_template('profile.html', user=current_user)
 
-@app.route('/profile/edit', methods=['GET', 'POST'])
+@route('/profile/edit', methods=['GET', 'POST'])
 @login_required
 def edit_profile():
     """Modifier le profil"""
     if request.method == 'POST':
-        current_user.name = request.form.get('name')
-        current_user.email = request.form.get('email')
+        user = current_user.get_model()
+        user.name = request.form.get('name')
+        user.email = request.form.get('email')
         
+        # Le commit invalide le snapshot en cache (voir identity.py)
         db.session.commit()
         flash('Profil mis à jour avec succès!', 'success')
         return redirect(url_for('profile'))
@@ -277,32 +361,52 @@ def edit_profile():
     return render_template('edit_profile.html', user=current_user)
 
 # Routes API pour les données
-# @app.route('/api/teams')
-# @login_required
-# def api_teams():
-#     """API pour récupérer les équipes"""
-#     teams = Team.query.all()
-#     return jsonify([{
-#         'id': team.id,
-#         'name': team.name,
-#         'city': team.city,
-#         'conference': team.conference,
-#         'division': team.division
-#     } for team in teams])
-
-@app.route('/api/players')
+@route('/api/teams')
+@login_required
+def api_teams():
+    """API des équipes, regroupées par conférence et division"""
+    groups = reference_cache.get('team_groups')
+    return jsonify({
+        conference or 'Sans conférence': {
+            division or 'Sans division': [team._asdict() for team in teams]
+            for division, teams in divisions.items()
+        }
+        for conference, divisions in groups.items()
+    })
+
+
+@route('/api/seasons')
+@login_required
+def api_seasons():
+    """API des saisons disponibles et de leurs bornes"""
+    return jsonify([
+        {
+            'season': info.season,
+            'start': info.start.isoformat(),
+            'end': info.end.isoformat(),
+            'first_game': info.first_game.isoformat() if info.first_game else None,
+            'last_game': info.last_game.isoformat() if info.last_game else None,
+            'games': info.games
+        }
+        for info in reference_cache.get('seasons')
+    ])
+
+@route('/api/players')
 @login_required
 def api_players():
     """API pour récupérer les joueurs"""
     team_id = request.args.get('team_id', type=int)
-    if team_id:
+    snapshot = stats_snapshot.current()
+    if snapshot is not None:
+        players = snapshot.players(team_id)
+    elif team_id:
         players = Player.query.filter_by(team_id=team_id).all()
     else:
         players = Player.query.all()
     
     return jsonify([{
         'id': player.id,
-        'name': player.name,
+        'name': f"{player.first_name} {player.last_name}",
         'position': player.position,
         'team_id': player.team_id,
         'points_per_game': player.points_per_game,
@@ -311,23 +415,143 @@ def api_players():
     } for player in players])
 
 
-@app.route('/api/games')
+@route('/api/leaders')
+@login_required
+def api_leaders():
+    """API des meilleurs joueurs (points, passes, rebonds par match)"""
+    snapshot = stats_snapshot.current()
+    boards = snapshot.leaders() if snapshot is not None else reference_cache.get('leaderboards')
+    return jsonify({
+        category: [leader._asdict() for leader in leaders]
+        for category, leaders in boards.items()
+    })
+
+
+@route('/api/players/compare')
+@login_required
+def api_compare_players():
+    """API de comparaison de joueurs : ?ids=1,2,3"""
+    try:
+        player_ids = [int(pid) for pid in request.args.get('ids', '').split(',') if pid.strip()][:10]
+    except ValueError:
+        return jsonify({'error': 'Paramètre ids invalide'}), 400
+    if len(player_ids) < 2:
+        return jsonify({'error': 'Au moins deux joueurs sont nécessaires'}), 400
+
+    snapshot = stats_snapshot.current()
+    compared = snapshot.compare(player_ids) if snapshot is not None else compare_from_db(player_ids)
+
+    return jsonify([
+        {
+            'id': player.id,
+            'name': f"{player.first_name} {player.last_name}",
+            'position': player.position,
+            'team': player.team.name if player.team else None,
+            'games': player.games,
+            'points_per_game': player.points_per_game,
+            'assists_per_game': player.assists_per_game,
+            'rebounds_per_game': player.rebounds_per_game,
+            'minutes_per_game': player.minutes_per_game,
+            'fg_pct': round(player.fg_pct, 3),
+            'fg3_pct': round(player.fg3_pct, 3),
+            'ft_pct': round(player.ft_pct, 3),
+            'league_rank': ranks
+        }
+        for player, ranks in compared
+    ])
+
+
+@route('/api/player/<int:player_id>/form')
+@login_required
+def api_player_form(player_id):
+    """API de la forme récente d'un joueur (moyennes glissantes et exponentielle)"""
+    form = form_tracker.form(player_id)
+    if form is None:
+        return jsonify({'error': 'Aucun match pour ce joueur'}), 404
+    return jsonify(dict(form, player_id=player_id))
+
+
+@route('/api/players/hot_cold')
+@login_required
+def api_hot_cold_players():
+    """API des joueurs en forme / en méforme (moyenne des 5 derniers matchs vs 20)"""
+    stat = request.args.get('stat', 'points')
+    if stat not in FORM_STATS:
+        return jsonify({'error': f"stat doit être parmi {', '.join(FORM_STATS)}"}), 400
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    result = form_tracker.hot_cold(stat, limit=limit)
+
+    teams = reference_cache.get('teams_by_id')
+    ids = [item['player_id'] for items in result.values() for item in items]
+    players = {p.id: p for p in Player.query.filter(Player.id.in_(ids)).all()} if ids else {}
+    for items in result.values():
+        for item in items:
+            player = players.get(item['player_id'])
+            if player:
+                team = teams.get(player.team_id)
+                item['name'] = f"{player.first_name} {player.last_name}"
+                item['team'] = team.name if team else None
+    return jsonify(dict(result, stat=stat))
+
+
+@route('/api/player/<int:player_id>/similar')
+@login_required
+def api_similar_players(player_id):
+    """API des joueurs au profil statistique le plus proche"""
+    player = Player.query.get_or_404(player_id)
+    k = min(max(request.args.get('k', 10, type=int), 1), 50)
+    approximate = request.args.get('approx', '0') == '1'
+    neighbours = similarity_index.similar(player.id, k=k, approximate=approximate)
+
+    players = {
+        p.id: p for p in Player.query.options(joinedload(Player.team))
+        .filter(Player.id.in_([pid for pid, _ in neighbours])).all()
+    }
+    return jsonify({
+        'player_id': player.id,
+        'similar': [
+            {
+                'id': pid,
+                'name': f"{players[pid].first_name} {players[pid].last_name}",
+                'position': players[pid].position,
+                'team': players[pid].team.name if players[pid].team else None,
+                'distance': round(distance, 4)
+            }
+            for pid, distance in neighbours if pid in players
+        ]
+    })
+
+
+@route('/api/teams/<int:team_id>/summary')
+@login_required
+def api_team_summary(team_id):
+    """API des agrégats d'une équipe (effectif, statistiques par poste)"""
+    if team_id not in reference_cache.get('teams_by_id'):
+        return jsonify({'error': 'Équipe introuvable'}), 404
+    return jsonify(team_analytics.team_summary(team_id))
+
+
+@route('/api/matchup/<int:team_a>/<int:team_b>')
+@login_required
+def api_matchup(team_a, team_b):
+    """API des confrontations directes entre deux équipes"""
+    teams = reference_cache.get('teams_by_id')
+    if team_a not in teams or team_b not in teams or team_a == team_b:
+        return jsonify({'error': 'Équipes invalides'}), 404
+    result = team_analytics.matchup(team_a, team_b)
+    result['team_a_name'], result['team_b_name'] = teams[team_a].name, teams[team_b].name
+    return jsonify(result)
+
+
+@route('/api/games')
 @login_required
 def api_games():
     """API pour récupérer les matchs récents"""
     
-    # Détection automatique de la saison en cours
-    today = datetime.utcnow()
-    season_start = datetime(today.year if today.month >= 10 else today.year - 1, 10, 1)
-
-    # On prend uniquement les matchs depuis le début de la saison
-    games = (
-        Game.query
-        .filter(Game.date >= season_start)
-        .order_by(Game.date.desc())
-        .limit(20)
-        .all()
-    )
+    # Saison en cours par défaut (partition chaude) ; ?season=AAAA pour une
+    # saison passée, éventuellement lue dans son archive
+    season = request.args.get('season', type=int)
+    games = season_store.games(season=season, limit=20)
 
     return jsonify([
         {
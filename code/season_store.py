@@ -0,0 +1,277 @@
+import os
+import threading
+
+from flask import current_app
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session, contains_eager, joinedload
+
+from app import db
+from caches import current_season, data_version, performance_version
+from models import Team, Player, Game, PlayerPerformance, Notification
+from stats_snapshot import stats_snapshot
+
+
+def ensure_season_schema():
+    """Ajoute la colonne PlayerPerformance.season et les index manquants sur une base existante.
+
+    Les tables absentes (base neuve) sont d'abord créées ; db.create_all()
+    ne modifie pas les tables déjà créées : cette fonction complète ensuite
+    le schéma puis renseigne les saisons manquantes.
+    """
+    db.create_all()
+    inspector = inspect(db.engine)
+    columns = {c['name'] for c in inspector.get_columns('player_performance')}
+    indexes = {index['name']: index for index in inspector.get_indexes('player_performance')}
+    with db.engine.begin() as conn:
+        if 'season' not in columns:
+            conn.exec_driver_sql('ALTER TABLE player_performance ADD COLUMN season INTEGER')
+        # (player_id, game_id) devenu unique : doublons des anciens chargements
+        # supprimés (la première ligne est conservée) avant de créer l'index
+        player_game = indexes.get('ix_performance_player_game')
+        if player_game is None or not player_game.get('unique'):
+            conn.exec_driver_sql(
+                'DELETE FROM player_performance WHERE id NOT IN '
+                '(SELECT MIN(id) FROM player_performance GROUP BY player_id, game_id)'
+            )
+            conn.exec_driver_sql('DROP INDEX IF EXISTS ix_performance_player_game')
+        # Saison déduite de la date pour les matchs qui n'en ont pas
+        conn.exec_driver_sql(
+            "UPDATE game SET season = CASE WHEN CAST(strftime('%m', date) AS INTEGER) >= 10 "
+            "THEN CAST(strftime('%Y', date) AS INTEGER) "
+            "ELSE CAST(strftime('%Y', date) AS INTEGER) - 1 END "
+            "WHERE season IS NULL"
+        )
+        conn.exec_driver_sql(
+            'UPDATE player_performance SET season = '
+            '(SELECT game.season FROM game WHERE game.id = player_performance.game_id) '
+            'WHERE season IS NULL'
+        )
+        # Index ajoutés aux modèles après coup : create_all ne les crée pas
+        # sur des tables existantes (purge des notifications par lots comprise)
+        for table in (Game.__table__, PlayerPerformance.__table__, Notification.__table__):
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+class SeasonStore:
+    """Point d'accès aux matchs et performances, routé par saison.
+
+    La saison en cours et les saisons récentes sont lues dans la base
+    principale (partition « chaude », filtrée par les index (season, ...)).
+    Les saisons compactées par archive_season() vivent dans un fichier
+    SQLite en lecture seule, instance/archive/season_<année>.db, qui
+    contient aussi une copie des équipes et joueurs pour que les relations
+    des modèles fonctionnent.
+
+    Limite : seuls games() et performances() consultent les archives. Le
+    suivi de forme (derniers matchs), TeamAnalytics (confrontations) et
+    l'instantané de stats_snapshot (adresse en carrière, tableau des
+    saisons) ne lisent que la base principale : une saison archivée en
+    sort, comme si elle n'avait pas été jouée.
+    """
+
+    def __init__(self, archive_dir=None):
+        self._archive_dir = archive_dir
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    @property
+    def archive_dir(self):
+        return self._archive_dir or os.path.join(current_app.instance_path, 'archive')
+
+    def archive_path(self, season):
+        return os.path.join(self.archive_dir, f'season_{season}.db')
+
+    def is_archived(self, season):
+        return season is not None and os.path.exists(self.archive_path(season))
+
+    def archived_seasons(self):
+        if not os.path.isdir(self.archive_dir):
+            return []
+        return sorted(
+            int(name[len('season_'):-len('.db')])
+            for name in os.listdir(self.archive_dir)
+            if name.startswith('season_') and name.endswith('.db')
+        )
+
+    # --- Lecture ------------------------------------------------------
+
+    def _archive_engine(self, season):
+        path = self.archive_path(season)
+        with self._lock:
+            engine = self._engines.get(path)
+            if engine is None:
+                engine = create_engine(f'sqlite:///file:{path}?mode=ro&uri=true')
+                self._engines[path] = engine
+            return engine
+
+    def session_for(self, season):
+        """Session à utiliser pour une saison (principale ou archive)"""
+        if self.is_archived(season):
+            return Session(bind=self._archive_engine(season))
+        return db.session
+
+    def _fetch(self, season, query):
+        # Les sessions d'archive sont fermées après lecture : les relations
+        # utiles sont donc chargées d'avance (joinedload)
+        if query.session is db.session:
+            return query.all()
+        try:
+            return query.all()
+        finally:
+            query.session.close()
+
+    def games(self, season=None, team_id=None, limit=None):
+        season = current_season() if season is None else season
+        query = (
+            self.session_for(season).query(Game)
+            .options(joinedload(Game.home_team), joinedload(Game.visitor_team))
+            .filter(Game.season == season)
+        )
+        if team_id:
+            query = query.filter((Game.home_team_id == team_id) | (Game.visitor_team_id == team_id))
+        query = query.order_by(Game.date.desc())
+        if limit:
+            query = query.limit(limit)
+        return self._fetch(season, query)
+
+    def performances(self, player_id, season=None, limit=None):
+        season = current_season() if season is None else season
+        query = (
+            self.session_for(season).query(PlayerPerformance)
+            .join(Game, PlayerPerformance.game_id == Game.id)
+            .options(contains_eager(PlayerPerformance.game))
+            .filter(PlayerPerformance.season == season, PlayerPerformance.player_id == player_id)
+            .order_by(Game.date.desc())
+        )
+        if limit:
+            query = query.limit(limit)
+        return self._fetch(season, query)
+
+    # --- Compaction ---------------------------------------------------
+
+    def archive_season(self, season):
+        """Déplace une saison terminée vers un fichier SQLite en lecture seule.
+
+        L'archive est copiée, compactée, synchronisée sur disque puis mise en
+        place (os.replace) avant toute suppression dans la base principale :
+        une interruption laisse au pire les lignes en double, jamais perdues.
+        Relancer la commande termine alors la purge.
+        """
+        if season >= current_season():
+            raise ValueError("La saison en cours ne peut pas être archivée")
+        path = self.archive_path(season)
+        if os.path.exists(path):
+            return self._resume_purge(season, path)
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+        tmp_path = path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        archive_engine = create_engine(f'sqlite:///{tmp_path}')
+        db.metadata.create_all(archive_engine, tables=[
+            Team.__table__, Player.__table__, Game.__table__, PlayerPerformance.__table__
+        ])
+        archive_engine.dispose()
+
+        game_cols = ', '.join(c.name for c in Game.__table__.columns)
+        perf_cols = ', '.join(c.name for c in PlayerPerformance.__table__.columns)
+        team_cols = ', '.join(c.name for c in Team.__table__.columns)
+        player_cols = ', '.join(c.name for c in Player.__table__.columns)
+
+        # 1. Copie vers le fichier temporaire (la base principale n'est pas modifiée)
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql(f"ATTACH DATABASE '{tmp_path}' AS archive")
+            conn.commit()
+            try:
+                with conn.begin():
+                    conn.exec_driver_sql(f'INSERT INTO archive.team ({team_cols}) SELECT {team_cols} FROM team')
+                    conn.exec_driver_sql(f'INSERT INTO archive.player ({player_cols}) SELECT {player_cols} FROM player')
+                    conn.execute(text(
+                        f'INSERT INTO archive.game ({game_cols}) SELECT {game_cols} FROM game WHERE season = :s'
+                    ), {'s': season})
+                    conn.execute(text(
+                        f'INSERT INTO archive.player_performance ({perf_cols}) '
+                        f'SELECT {perf_cols} FROM player_performance WHERE season = :s'
+                    ), {'s': season})
+            finally:
+                conn.exec_driver_sql('DETACH DATABASE archive')
+                conn.commit()
+
+        # 2. Compaction, fsync puis mise en place de l'archive en lecture seule
+        archive_engine = create_engine(f'sqlite:///{tmp_path}')
+        with archive_engine.connect() as conn:
+            conn.exec_driver_sql('VACUUM')
+            moved_games = conn.exec_driver_sql('SELECT COUNT(*) FROM game').scalar()
+            moved_perfs = conn.exec_driver_sql('SELECT COUNT(*) FROM player_performance').scalar()
+        archive_engine.dispose()
+        _fsync(tmp_path)
+        os.replace(tmp_path, path)
+        os.chmod(path, 0o444)
+        _fsync(self.archive_dir)
+
+        # 3. Seulement maintenant : purge de la partition chaude
+        try:
+            self._purge(season, moved_games, moved_perfs)
+        except RuntimeError:
+            # Archive incomplète : la retirer pour que la saison reste lue en base
+            os.remove(path)
+            raise
+        print(f"📦 Saison {season} archivée : {moved_games} matchs, {moved_perfs} performances")
+        return {'games': moved_games, 'performances': moved_perfs}
+
+    def _resume_purge(self, season, path):
+        """Archive déjà en place : termine une purge interrompue, sinon refuse"""
+        with db.engine.connect() as conn:
+            remaining = conn.execute(text('SELECT COUNT(*) FROM game WHERE season = :s'), {'s': season}).scalar()
+        if not remaining:
+            raise ValueError(f"La saison {season} est déjà archivée")
+        with self._archive_engine(season).connect() as conn:
+            archived_games = conn.exec_driver_sql('SELECT COUNT(*) FROM game').scalar()
+            archived_perfs = conn.exec_driver_sql('SELECT COUNT(*) FROM player_performance').scalar()
+        self._purge(season, archived_games, archived_perfs)
+        print(f"📦 Saison {season} : purge de la base principale terminée")
+        return {'games': archived_games, 'performances': archived_perfs}
+
+    @staticmethod
+    def _purge(season, archived_games, archived_perfs):
+        """Supprime la saison de la base principale si elle correspond à l'archive"""
+        with db.engine.begin() as conn:
+            games = conn.execute(text('SELECT COUNT(*) FROM game WHERE season = :s'), {'s': season}).scalar()
+            perfs = conn.execute(
+                text('SELECT COUNT(*) FROM player_performance WHERE season = :s'), {'s': season}).scalar()
+            if (games, perfs) != (archived_games, archived_perfs):
+                raise RuntimeError(
+                    f"Saison {season} modifiée pendant l'archivage ({games}/{perfs} lignes en base, "
+                    f"{archived_games}/{archived_perfs} archivées) : base principale conservée"
+                )
+            conn.execute(text('DELETE FROM player_performance WHERE season = :s'), {'s': season})
+            conn.execute(text('DELETE FROM game WHERE season = :s'), {'s': season})
+        # Les workers rechargent forme, agrégats d'équipe et similarité ;
+        # l'instantané partagé est republié sans la saison archivée
+        data_version.bump()
+        performance_version.bump()
+        stats_snapshot.publish()
+
+
+def _fsync(path):
+    """Force l'écriture sur disque d'un fichier ou d'un répertoire"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+season_store = SeasonStore()
+
+
+if __name__ == '__main__':
+    # python season_store.py 2019 2020 : archive les saisons indiquées
+    import sys
+    from app import app
+
+    with app.app_context():
+        ensure_season_schema()
+        for arg in sys.argv[1:]:
+            season_store.archive_season(int(arg))
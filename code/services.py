@@ -1,9 +1,12 @@
-import requests
-import json
+import time
+import uuid
 from datetime import datetime
-from app import app, db, mail
-from models import Team, Player, Game, PlayerPerformance, Notification, User
+from flask import current_app
+from app import db, mail, email_queue
+from models import Team, Player, Game, Notification, User, SyncChange, user_team_association
 from flask_mail import Message
+from metrics import instrumented_get
+from team_analytics import is_final
 import os
 
 class NBAApiService:
@@ -12,7 +15,8 @@ class NBAApiService:
     def __init__(self):
         self.api_key = os.getenv('NBA_API_KEY')
         self.api_host = 'free-nba.p.rapidapi.com'
-        self.base_url = 'https://free-nba.p.rapidapi.com'
+        self.base_url = os.getenv('NBA_API_BASE_URL', 'https://free-nba.p.rapidapi.com')
+        self.max_retries = 3
         
     def _make_request(self, endpoint, params=None):
         """Effectue une requête vers l'API NBA"""
@@ -22,7 +26,12 @@ class NBAApiService:
         }
         
         url = f"{self.base_url}/{endpoint}"
-        response = requests.get(url, headers=headers, params=params)
+        for attempt in range(self.max_retries + 1):
+            response = instrumented_get('nba_api', endpoint, url, headers=headers, params=params)
+            if response.status_code != 429 or attempt == self.max_retries:
+                break
+            # Limite de débit atteinte : on respecte Retry-After
+            time.sleep(min(float(response.headers.get('Retry-After', 2 ** attempt)), 30))
         
         if response.status_code == 200:
             return response.json()
@@ -88,6 +97,118 @@ class NotificationService:
         db.session.commit()
         return notification
     
+    @staticmethod
+    def create_notifications_bulk(user_ids, title, message, notification_type='info'):
+        """Crée la même notification pour plusieurs utilisateurs en une seule transaction"""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return 0
+
+        now = datetime.utcnow()
+        db.session.execute(
+            db.insert(Notification),
+            [{
+                'user_id': user_id,
+                'title': title,
+                'message': message,
+                'type': notification_type,
+                'is_read': False,
+                'created_at': now
+            } for user_id in user_ids]
+        )
+        db.session.commit()
+        return len(user_ids)
+
+    @staticmethod
+    def notify_users(recipients, title, message, notification_type='info', send_email=False):
+        """Notifie une liste de (user_id, email) ; les emails partent via la file d'envoi"""
+        recipients = list(recipients)
+        count = NotificationService.create_notifications_bulk(
+            [user_id for user_id, _ in recipients], title, message, notification_type
+        )
+        if send_email:
+            email_queue.enqueue_many({email for _, email in recipients}, title, message)
+        return count
+
+    @staticmethod
+    def notify_team_managers(team_ids, title, message, notification_type='info', send_email=False):
+        """Notifie les gestionnaires actifs des équipes données"""
+        if isinstance(team_ids, int):
+            team_ids = [team_ids]
+        recipients = (
+            db.session.query(User.id, User.email)
+            .join(user_team_association, user_team_association.c.user_id == User.id)
+            .filter(user_team_association.c.team_id.in_(list(team_ids)))
+            .filter(User.is_active.is_(True))
+            .distinct()
+            .all()
+        )
+        return NotificationService.notify_users(
+            recipients, title, message, notification_type, send_email
+        )
+
+    @staticmethod
+    def notify_team_changes(lines_by_team, title, notification_type='info', send_email=False, max_lines=20):
+        """Notifie chaque gestionnaire des changements de ses équipes, en un seul lot.
+
+        lines_by_team : {team_id: [ligne de message, ...]}. Chaque gestionnaire
+        reçoit une seule notification regroupant les lignes de toutes ses équipes.
+        """
+        if not lines_by_team:
+            return 0
+        managers = {}
+        rows = (
+            db.session.query(User.id, User.email, user_team_association.c.team_id)
+            .join(user_team_association, user_team_association.c.user_id == User.id)
+            .filter(user_team_association.c.team_id.in_(list(lines_by_team)))
+            .filter(User.is_active.is_(True))
+            .order_by(User.id, user_team_association.c.team_id)
+            .all()
+        )
+        for user_id, email, team_id in rows:
+            manager = managers.setdefault(user_id, {'email': email, 'lines': []})
+            manager['lines'].extend(lines_by_team[team_id])
+        if not managers:
+            return 0
+
+        now = datetime.utcnow()
+        notifications = []
+        for user_id, manager in managers.items():
+            lines = list(dict.fromkeys(manager['lines']))
+            message = '\n'.join(lines[:max_lines])
+            if len(lines) > max_lines:
+                message += f"\n… et {len(lines) - max_lines} autres changements"
+            manager['message'] = message
+            notifications.append({
+                'user_id': user_id,
+                'title': title,
+                'message': message,
+                'type': notification_type,
+                'is_read': False,
+                'created_at': now
+            })
+        db.session.execute(db.insert(Notification), notifications)
+        db.session.commit()
+        if send_email:
+            for manager in managers.values():
+                if manager['email']:
+                    email_queue.enqueue(manager['email'], title, manager['message'])
+        return len(notifications)
+
+    @staticmethod
+    def notify_all_users(title, message, notification_type='info', send_email=False):
+        """Notifie tous les utilisateurs actifs"""
+        recipients = db.session.query(User.id, User.email).filter(User.is_active.is_(True)).all()
+        return NotificationService.notify_users(
+            recipients, title, message, notification_type, send_email
+        )
+
+    @staticmethod
+    def queue_email_notification(user_email, subject, body):
+        """Place un email dans la file d'envoi en arrière-plan (non bloquant)"""
+        email_queue.enqueue(user_email, subject, body)
+        return True
+
     @staticmethod
     def send_email_notification(user_email, subject, body):
         """Envoie une notification par email"""
@@ -96,7 +217,7 @@ class NotificationService:
                 subject=subject,
                 recipients=[user_email],
                 body=body,
-                sender=app.config['MAIL_USERNAME']
+                sender=current_app.config['MAIL_USERNAME']
             )
             mail.send(msg)
             return True
@@ -117,12 +238,15 @@ class NotificationService:
         return notification
     
     @staticmethod
-    def get_user_notifications(user_id, unread_only=False):
+    def get_user_notifications(user_id, unread_only=False, limit=None):
         """Récupère les notifications d'un utilisateur"""
         query = Notification.query.filter_by(user_id=user_id)
         if unread_only:
             query = query.filter_by(is_read=False)
-        return query.order_by(Notification.created_at.desc()).all()
+        query = query.order_by(Notification.created_at.desc())
+        if limit:
+            query = query.limit(limit)
+        return query.all()
     
     @staticmethod
     def mark_notification_as_read(notification_id):
@@ -135,94 +259,302 @@ class NotificationService:
         return False
 
 class DataSyncService:
-    """Service pour synchroniser les données avec l'API NBA"""
+    """Service pour synchroniser les données avec l'API NBA.
+
+    Chaque synchronisation charge en une requête les lignes existantes,
+    les compare aux données de l'API et n'écrit que les différences
+    (insertions et mises à jour groupées). Les changements utiles aux
+    gestionnaires (nouveaux joueurs, transferts, hausses ou baisses de
+    statistiques, scores finaux) sont enregistrés dans SyncChange puis
+    notifiés en un seul lot aux gestionnaires des équipes concernées.
+    Une synchronisation sans changement n'écrit rien.
+    """
+
+    # Écart minimal (par match) pour signaler une évolution de statistique
+    STAT_JUMP_THRESHOLDS = {
+        'points_per_game': 5.0,
+        'assists_per_game': 3.0,
+        'rebounds_per_game': 3.0,
+        'minutes_per_game': 8.0,
+    }
+    # Clés possibles des moyennes dans les données joueur de l'API
+    STAT_KEYS = {
+        'points_per_game': ('points_per_game', 'pts'),
+        'assists_per_game': ('assists_per_game', 'ast'),
+        'rebounds_per_game': ('rebounds_per_game', 'reb'),
+        'minutes_per_game': ('minutes_per_game', 'min'),
+    }
+    STAT_LABELS = {
+        'points_per_game': 'points/match',
+        'assists_per_game': 'passes/match',
+        'rebounds_per_game': 'rebonds/match',
+        'minutes_per_game': 'minutes/match',
+    }
+    NOTIFICATION_TITLE = 'Changements sur vos équipes'
     
     def __init__(self):
         self.nba_api = NBAApiService()
     
+    # --- Points d'entrée ----------------------------------------------
+
+    def sync_all(self, send_email=False):
+        """Synchronise équipes, joueurs et matchs puis notifie en un seul lot"""
+        changes = []
+        result = {'written': 0, 'written_ids': {}}
+        for name, step in (('teams', self._sync_teams), ('players', self._sync_players),
+                           ('games', self._sync_games)):
+            result[name], written_ids = step(changes)
+            result['written_ids'][name] = written_ids
+            result['written'] += len(written_ids)
+        result.update(self.record_changes(changes, send_email=send_email))
+        return result
+
     def sync_teams(self):
         """Synchronise les équipes avec l'API"""
+        changes = []
+        count, _ = self._sync_teams(changes)
+        self.record_changes(changes)
+        return count
+    
+    def sync_players(self, team_id=None):
+        """Synchronise les joueurs avec l'API"""
+        changes = []
+        count, _ = self._sync_players(changes, team_id)
+        self.record_changes(changes)
+        return count
+    
+    def sync_games(self, team_id=None):
+        """Synchronise les matchs avec l'API"""
+        changes = []
+        count, _ = self._sync_games(changes, team_id)
+        self.record_changes(changes)
+        return count
+
+    # --- Journal et notifications -------------------------------------
+
+    @staticmethod
+    def _change(entity, entity_id, change_type, message, team_id=None, other_team_id=None,
+                field=None, old_value=None, new_value=None):
+        return {
+            'entity': entity,
+            'entity_id': entity_id,
+            'change_type': change_type,
+            'field': field,
+            'old_value': None if old_value is None else str(old_value)[:100],
+            'new_value': None if new_value is None else str(new_value)[:100],
+            'team_id': team_id,
+            'other_team_id': other_team_id,
+            'message': message,
+        }
+
+    def record_changes(self, changes, send_email=False):
+        """Enregistre les changements dans le journal, notifie les gestionnaires et valide.
+
+        Les écritures de _apply sont encore dans la transaction en cours :
+        données, journal et notifications sont validés ensemble, ou pas du tout.
+        """
+        if not changes:
+            db.session.commit()
+            return {'changes': 0, 'notified': 0, 'sync_id': None}
+
+        sync_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        db.session.execute(db.insert(SyncChange), [
+            dict({k: v for k, v in change.items() if k != 'message'}, sync_id=sync_id, created_at=now)
+            for change in changes
+        ])
+
+        lines_by_team = {}
+        for change in changes:
+            for team_id in (change['team_id'], change['other_team_id']):
+                if team_id is not None:
+                    lines_by_team.setdefault(team_id, []).append(change['message'])
+        notified = NotificationService.notify_team_changes(
+            lines_by_team, self.NOTIFICATION_TITLE, send_email=send_email
+        )
+        db.session.commit()
+        return {'changes': len(changes), 'notified': notified, 'sync_id': sync_id}
+
+    @staticmethod
+    def _apply(model, inserts, updates):
+        """Exécute les insertions et mises à jour groupées ; rien si les listes sont vides.
+
+        La validation est faite par record_changes(). Retourne les
+        identifiants des lignes écrites.
+        """
+        if inserts:
+            db.session.execute(db.insert(model), inserts)
+        if updates:
+            db.session.execute(db.update(model), updates)
+        return [row['id'] for row in inserts + updates]
+
+    @staticmethod
+    def _team_names():
+        return dict(db.session.query(Team.id, Team.name).all())
+
+    # --- Équipes ------------------------------------------------------
+
+    def _sync_teams(self, changes):
         teams_data = self.nba_api.get_teams()
-        synced_count = 0
+        existing = {
+            row.id: row._asdict() for row in db.session.query(
+                Team.id, Team.name, Team.city, Team.conference, Team.division
+            )
+        }
+        inserts, updates = [], []
         
         for team_data in teams_data:
-            team = Team.query.filter_by(name=team_data.get('name')).first()
-            
-            if not team:
-                team = Team(
-                    name=team_data.get('name'),
-                    city=team_data.get('city'),
-                    conference=team_data.get('conference'),
-                    division=team_data.get('division')
-                )
-                db.session.add(team)
-                synced_count += 1
-            else:
-                # Mise à jour des données existantes
-                team.city = team_data.get('city')
-                team.conference = team_data.get('conference')
-                team.division = team_data.get('division')
+            values = {
+                'id': team_data.get('id'),
+                'name': team_data.get('full_name') or team_data.get('name'),
+                'city': team_data.get('city'),
+                'conference': team_data.get('conference'),
+                'division': team_data.get('division'),
+            }
+            current = existing.get(values['id'])
+            if current is None:
+                inserts.append(dict(values, created_at=datetime.utcnow()))
+                existing[values['id']] = values
+            elif any(current[k] != v for k, v in values.items() if v is not None):
+                updates.append({k: v for k, v in values.items() if v is not None})
         
-        db.session.commit()
-        return synced_count
-    
-    def sync_players(self, team_id=None):
-        """Synchronise les joueurs avec l'API"""
+        return len(inserts), self._apply(Team, inserts, updates)
+
+    # --- Joueurs ------------------------------------------------------
+
+    def _stat_values(self, player_data):
+        stats = {}
+        for field, keys in self.STAT_KEYS.items():
+            for key in keys:
+                value = player_data.get(key)
+                if value in (None, ''):
+                    continue
+                try:
+                    if isinstance(value, str) and ':' in value:
+                        minutes, seconds = value.split(':', 1)
+                        value = int(minutes) + int(seconds) / 60
+                    stats[field] = round(float(value), 1)
+                except ValueError:
+                    pass
+                break
+        return stats
+
+    def _sync_players(self, changes, team_id=None):
         players_data = self.nba_api.get_players(team_id)
-        synced_count = 0
+        team_names = self._team_names()
+        columns = ('first_name', 'last_name', 'position', 'height_feet', 'height_inches',
+                   'weight_pounds', 'team_id') + tuple(self.STAT_KEYS)
+        existing = {
+            row[0]: dict(zip(columns, row[1:])) for row in db.session.query(
+                Player.id, *(getattr(Player, c) for c in columns)
+            )
+        }
+        inserts, updates = [], []
         
         for player_data in players_data:
-            player = Player.query.filter_by(name=player_data.get('name')).first()
+            player_id = player_data.get('id')
+            new_team_id = (player_data.get('team') or {}).get('id')
+            if new_team_id not in team_names:
+                continue
+            name = f"{player_data.get('first_name')} {player_data.get('last_name')}"
+            values = {
+                'first_name': player_data.get('first_name'),
+                'last_name': player_data.get('last_name'),
+                'position': player_data.get('position'),
+                'height_feet': player_data.get('height_feet'),
+                'height_inches': player_data.get('height_inches'),
+                'weight_pounds': player_data.get('weight_pounds'),
+                'team_id': new_team_id,
+            }
+            values.update(self._stat_values(player_data))
+            current = existing.get(player_id)
             
-            if not player:
-                # Trouver l'équipe
-                team = None
-                if player_data.get('team'):
-                    team = Team.query.filter_by(name=player_data['team'].get('name')).first()
-                
-                if team:
-                    player = Player(
-                        name=player_data.get('name'),
-                        position=player_data.get('position'),
-                        height=player_data.get('height'),
-                        weight=player_data.get('weight'),
-                        nationality=player_data.get('nationality'),
-                        nba_debut=player_data.get('nba_debut'),
-                        jersey_number=player_data.get('jersey_number'),
-                        team_id=team.id
-                    )
-                    db.session.add(player)
-                    synced_count += 1
+            if current is None:
+                inserts.append(dict(values, id=player_id, created_at=datetime.utcnow()))
+                existing[player_id] = values
+                changes.append(self._change(
+                    'player', player_id, 'new_player',
+                    f"Nouveau joueur : {name} ({team_names[new_team_id]})",
+                    team_id=new_team_id
+                ))
+                continue
+
+            diff = {k: v for k, v in values.items() if current.get(k) != v}
+            if not diff:
+                continue
+            updates.append(dict(diff, id=player_id))
+
+            if 'team_id' in diff:
+                old_team_id = current['team_id']
+                changes.append(self._change(
+                    'player', player_id, 'trade',
+                    f"Transfert : {name}, {team_names.get(old_team_id, '?')} → {team_names[new_team_id]}",
+                    team_id=new_team_id, other_team_id=old_team_id,
+                    field='team_id', old_value=old_team_id, new_value=new_team_id
+                ))
+            for field, threshold in self.STAT_JUMP_THRESHOLDS.items():
+                old, new = current.get(field) or 0.0, diff.get(field)
+                if new is not None and old > 0 and abs(new - old) >= threshold:
+                    changes.append(self._change(
+                        'player', player_id, 'stat_jump',
+                        f"{name} : {self.STAT_LABELS[field]} {old:.1f} → {new:.1f}",
+                        team_id=new_team_id, field=field, old_value=old, new_value=new
+                    ))
         
-        db.session.commit()
-        return synced_count
-    
-    def sync_games(self, team_id=None):
-        """Synchronise les matchs avec l'API"""
+        return len(inserts), self._apply(Player, inserts, updates)
+
+    # --- Matchs -------------------------------------------------------
+
+    _is_final = staticmethod(is_final)
+
+    def _sync_games(self, changes, team_id=None):
         games_data = self.nba_api.get_games(team_id)
-        synced_count = 0
+        team_names = self._team_names()
+        existing = {
+            row.id: row._asdict() for row in db.session.query(
+                Game.id, Game.status, Game.period, Game.home_team_score, Game.visitor_team_score
+            )
+        }
+        inserts, updates = [], []
         
         for game_data in games_data:
-            game = Game.query.filter_by(id=game_data.get('id')).first()
-            
-            if not game:
-                # Trouver les équipes
-                home_team = Team.query.filter_by(name=game_data.get('home_team', {}).get('name')).first()
-                away_team = Team.query.filter_by(name=game_data.get('visitor_team', {}).get('name')).first()
-                
-                if home_team and away_team:
-                    game = Game(
-                        id=game_data.get('id'),
-                        date=datetime.fromisoformat(game_data.get('date').replace('Z', '+00:00')),
-                        home_team_id=home_team.id,
-                        away_team_id=away_team.id,
-                        home_score=game_data.get('home_team_score', 0),
-                        away_score=game_data.get('visitor_team_score', 0),
-                        status=game_data.get('status'),
-                        season=game_data.get('season')
-                    )
-                    db.session.add(game)
-                    synced_count += 1
+            game_id = game_data.get('id')
+            home_id = (game_data.get('home_team') or {}).get('id')
+            visitor_id = (game_data.get('visitor_team') or {}).get('id')
+            values = {
+                'status': game_data.get('status'),
+                'period': game_data.get('period'),
+                'home_team_score': game_data.get('home_team_score', 0),
+                'visitor_team_score': game_data.get('visitor_team_score', 0),
+            }
+            current = existing.get(game_id)
+
+            if current is None:
+                if home_id not in team_names or visitor_id not in team_names:
+                    continue
+                inserts.append(dict(
+                    values, id=game_id, home_team_id=home_id, visitor_team_id=visitor_id,
+                    season=game_data.get('season'), created_at=datetime.utcnow(),
+                    date=datetime.fromisoformat(game_data.get('date').replace('Z', '+00:00'))
+                ))
+                existing[game_id] = values
+                was_final, score_changed = False, True
+            else:
+                diff = {k: v for k, v in values.items() if current.get(k) != v}
+                if not diff:
+                    continue
+                updates.append(dict(diff, id=game_id))
+                was_final = self._is_final(current['status'])
+                score_changed = 'home_team_score' in diff or 'visitor_team_score' in diff
+
+            # Nouveau score final, ou correction d'un score déjà final
+            if self._is_final(values['status']) and (not was_final or score_changed):
+                changes.append(self._change(
+                    'game', game_id, 'final_score',
+                    f"Score final : {team_names.get(home_id, '?')} {values['home_team_score']} - "
+                    f"{values['visitor_team_score']} {team_names.get(visitor_id, '?')}",
+                    team_id=home_id, other_team_id=visitor_id,
+                    new_value=f"{values['home_team_score']}-{values['visitor_team_score']}"
+                ))
         
-        db.session.commit()
-        return synced_count 
\ No newline at end of file
+        return len(inserts), self._apply(Game, inserts, updates)
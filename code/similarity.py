@@ -0,0 +1,316 @@
+import threading
+
+import numpy as np
+
+from app import db
+from caches import data_version
+from models import Player, PlayerPerformance
+
+
+# Colonnes de la matrice de caractéristiques (une ligne par joueur)
+FEATURES = (
+    'points_per_game', 'assists_per_game', 'rebounds_per_game', 'minutes_per_game',
+    'fg_pct', 'fg3_pct', 'ft_pct', 'fg3a_per_game', 'fta_per_game',
+)
+
+
+def load_raw_features(player_ids=None):
+    """Charge les statistiques brutes : (ids, matrice float64 n x len(FEATURES))"""
+    players = db.session.query(
+        Player.id, Player.points_per_game, Player.assists_per_game,
+        Player.rebounds_per_game, Player.minutes_per_game
+    )
+    shooting = db.session.query(
+        PlayerPerformance.player_id,
+        db.func.count(PlayerPerformance.id),
+        db.func.sum(PlayerPerformance.field_goals_made),
+        db.func.sum(PlayerPerformance.field_goals_attempted),
+        db.func.sum(PlayerPerformance.three_points_made),
+        db.func.sum(PlayerPerformance.three_points_attempted),
+        db.func.sum(PlayerPerformance.free_throws_made),
+        db.func.sum(PlayerPerformance.free_throws_attempted),
+    ).group_by(PlayerPerformance.player_id)
+    if player_ids is not None:
+        players = players.filter(Player.id.in_(player_ids))
+        shooting = shooting.filter(PlayerPerformance.player_id.in_(player_ids))
+
+    rows = players.order_by(Player.id).all()
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    matrix = np.zeros((len(rows), len(FEATURES)), dtype=np.float64)
+    if not rows:
+        return ids, matrix
+    matrix[:, :4] = np.array([r[1:] for r in rows], dtype=np.float64)
+
+    position = {pid: i for i, pid in enumerate(ids.tolist())}
+    shots = np.array([r for r in shooting.all() if r[0] in position], dtype=np.float64).reshape(-1, 8)
+    if len(shots):
+        idx = np.array([position[int(pid)] for pid in shots[:, 0]])
+        games, fgm, fga, fg3m, fg3a, ftm, fta = shots[:, 1:].T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix[idx, 4] = np.where(fga > 0, fgm / fga, 0.0)
+            matrix[idx, 5] = np.where(fg3a > 0, fg3m / fg3a, 0.0)
+            matrix[idx, 6] = np.where(fta > 0, ftm / fta, 0.0)
+            matrix[idx, 7] = np.where(games > 0, fg3a / games, 0.0)
+            matrix[idx, 8] = np.where(games > 0, fta / games, 0.0)
+    return ids, np.nan_to_num(matrix)
+
+
+class _Snapshot:
+    """État immuable de l'index : remplacé en bloc à chaque reconstruction.
+
+    Sans mean/std, la normalisation est recalculée sur toutes les lignes ;
+    avec, seules les lignes fournies dans `matrix` sont réutilisées telles
+    quelles (mise à jour incrémentale, voir PlayerSimilarityIndex.refresh).
+    """
+
+    def __init__(self, ids, raw, mean=None, std=None, matrix=None, version=None, drift=0):
+        self.ids = ids
+        self.raw = raw
+        self.position = {pid: i for i, pid in enumerate(ids.tolist())}
+        if mean is None:
+            self.mean = raw.mean(axis=0) if len(raw) else np.zeros(raw.shape[1])
+            std = raw.std(axis=0) if len(raw) else np.ones(raw.shape[1])
+            self.std = np.where(std > 0, std, 1.0)
+            matrix = None
+        else:
+            self.mean, self.std = mean, std
+        self.matrix = self.normalize(raw) if matrix is None else matrix
+        self.sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        self.centroids = None
+        self.assignments = None
+        self.version = version
+        self.drift = drift  # lignes modifiées depuis la dernière normalisation
+
+    def normalize(self, raw):
+        return ((raw - self.mean) / self.std).astype(np.float32)
+
+
+class PlayerSimilarityIndex:
+    """Recherche des joueurs les plus proches sur leurs statistiques.
+
+    Les statistiques sont centrées-réduites (z-scores) puis comparées par
+    distance euclidienne, calculée en bloc : ||x - q||² = ||x||² - 2 x·q + ||q||².
+    Au-delà de `approx_threshold` joueurs, un index approximatif par
+    partitionnement (k-means, type IVF) limite la recherche aux
+    `nprobe` groupes les plus proches.
+
+    L'index suit la version des données (caches.data_version) : après une
+    synchronisation dans un autre worker, la lecture suivante le met à jour.
+    """
+
+    def __init__(self, approx_threshold=20000, n_clusters=None, nprobe=4, batch_size=1024, seed=0,
+                 renormalize_ratio=0.1):
+        self.approx_threshold = approx_threshold
+        self.renormalize_ratio = renormalize_ratio
+        self.n_clusters = n_clusters
+        self.nprobe = nprobe
+        self.batch_size = batch_size
+        self.seed = seed
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    # --- Construction -------------------------------------------------
+
+    def _kmeans(self, matrix, iterations=10):
+        n_clusters = self.n_clusters or max(1, int(np.sqrt(len(matrix))))
+        rng = np.random.default_rng(self.seed)
+        centroids = matrix[rng.choice(len(matrix), size=min(n_clusters, len(matrix)), replace=False)]
+        for _ in range(iterations):
+            assignments = self._nearest_centroids(matrix, centroids, 1)[:, 0]
+            for c in range(len(centroids)):
+                members = matrix[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+        return centroids, self._nearest_centroids(matrix, centroids, 1)[:, 0]
+
+    @staticmethod
+    def _nearest_centroids(matrix, centroids, count):
+        distances = (
+            np.einsum('ij,ij->i', matrix, matrix)[:, None]
+            - 2 * matrix @ centroids.T
+            + np.einsum('ij,ij->i', centroids, centroids)[None, :]
+        )
+        count = min(count, len(centroids))
+        return np.argpartition(distances, count - 1, axis=1)[:, :count]
+
+    def _build(self, ids, raw, version=None):
+        snapshot = _Snapshot(ids, raw, version=version)
+        if len(ids) >= self.approx_threshold:
+            snapshot.centroids, snapshot.assignments = self._kmeans(snapshot.matrix.copy())
+        return snapshot
+
+    def rebuild(self):
+        """Reconstruit entièrement la matrice depuis la base"""
+        version = data_version.current()
+        ids, raw = load_raw_features()
+        self._snapshot = self._build(ids, raw, version)
+        return len(ids)
+
+    def refresh(self, player_ids=None, version=None):
+        """Mise à jour incrémentale après une synchronisation.
+
+        Sans player_ids, toutes les caractéristiques sont relues (deux
+        requêtes), comparées à la matrice courante et renormalisées. Avec
+        player_ids, seuls ces joueurs sont relus et seules leurs lignes sont
+        recalculées avec la normalisation courante ; elle est refaite à la
+        lecture suivante quand plus de `renormalize_ratio` des lignes ont
+        changé depuis. Les groupes de l'index approximatif sont conservés :
+        seules les lignes changées y sont réaffectées, sans relancer le
+        k-means.
+
+        `version` est la version des données après la synchronisation : si
+        l'index n'était pas à la version précédente, une autre écriture a eu
+        lieu entre-temps et toutes les lignes sont relues. Retourne le
+        nombre de lignes modifiées.
+        """
+        current = self._snapshot
+        if current is None:
+            return self.rebuild()
+        if version is not None and current.version != version - 1:
+            player_ids = None
+        if version is None:
+            version = data_version.current() if player_ids is None else current.version
+
+        if player_ids is None:
+            new_ids, new_raw = load_raw_features()
+            removed = np.setdiff1d(current.ids, new_ids)
+        else:
+            player_ids = sorted(set(int(pid) for pid in player_ids))
+            new_ids, new_raw = load_raw_features(player_ids) if player_ids else (current.ids[:0], current.raw[:0])
+            removed = np.setdiff1d(np.array(player_ids, dtype=np.int64), new_ids)
+
+        ids = current.ids.copy()
+        raw = current.raw.copy()
+        changed = []
+        appended_ids, appended_rows = [], []
+        for pid, row in zip(new_ids.tolist(), new_raw):
+            index = current.position.get(pid)
+            if index is None:
+                appended_ids.append(pid)
+                appended_rows.append(row)
+            elif not np.array_equal(raw[index], row):
+                raw[index] = row
+                changed.append(index)
+        if not changed and not appended_ids and not len(removed):
+            current.version = version
+            return 0
+        modified = len(changed) + len(appended_ids) + len(removed)
+
+        assignments = current.assignments
+        if appended_ids:
+            ids = np.concatenate([ids, np.array(appended_ids, dtype=np.int64)])
+            raw = np.vstack([raw, np.array(appended_rows)])
+            changed.extend(range(len(current.ids), len(ids)))
+            if assignments is not None:
+                assignments = np.concatenate([assignments, np.zeros(len(appended_ids), dtype=assignments.dtype)])
+        if len(removed):
+            keep = ~np.isin(ids, removed)
+            ids, raw = ids[keep], raw[keep]
+            remap = np.cumsum(keep) - 1
+            changed = [int(remap[i]) for i in changed if keep[i]]
+            if assignments is not None:
+                assignments = assignments[keep]
+
+        if player_ids is None:
+            snapshot = _Snapshot(ids, raw, version=version)
+        else:
+            # Normalisation conservée : seules les lignes changées sont recalculées
+            matrix = current.matrix
+            if appended_ids:
+                matrix = np.vstack([matrix, np.zeros((len(appended_ids), matrix.shape[1]), dtype=matrix.dtype)])
+            else:
+                matrix = matrix.copy()
+            if len(removed):
+                matrix = matrix[keep]
+            if changed:
+                matrix[changed] = current.normalize(raw[changed])
+            snapshot = _Snapshot(ids, raw, current.mean, current.std, matrix, version, current.drift + modified)
+        self._attach_partition(snapshot, current, assignments, changed)
+        self._snapshot = snapshot
+        return modified
+
+    def _attach_partition(self, snapshot, current, assignments, changed):
+        if current.centroids is not None:
+            # La normalisation a légèrement bougé : les centroïdes restent
+            # une partition valable, seules les lignes changées sont réaffectées
+            assignments = assignments.copy()
+            if changed:
+                rows = np.array(changed)
+                assignments[rows] = self._nearest_centroids(snapshot.matrix[rows], current.centroids, 1)[:, 0]
+            snapshot.centroids, snapshot.assignments = current.centroids, assignments
+        elif len(snapshot.ids) >= self.approx_threshold:
+            snapshot.centroids, snapshot.assignments = self._kmeans(snapshot.matrix.copy())
+
+    def _renormalize(self, current):
+        snapshot = _Snapshot(current.ids, current.raw, version=current.version)
+        snapshot.centroids, snapshot.assignments = current.centroids, current.assignments
+        self._snapshot = snapshot
+
+    def _ensure_built(self):
+        version = data_version.current()
+        snapshot = self._snapshot
+        if (snapshot is None or snapshot.version != version
+                or snapshot.drift > self.renormalize_ratio * len(snapshot.ids)):
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None:
+                    self.rebuild()
+                elif snapshot.version != version:
+                    self.refresh()
+                elif snapshot.drift > self.renormalize_ratio * len(snapshot.ids):
+                    self._renormalize(snapshot)
+        return self._snapshot
+
+    # --- Requêtes -----------------------------------------------------
+
+    def similar_many(self, player_ids, k=10, approximate=False):
+        """k plus proches voisins pour plusieurs joueurs : {id: [(id, distance), ...]}"""
+        snapshot = self._ensure_built()
+        known = [pid for pid in player_ids if pid in snapshot.position]
+        results = {pid: [] for pid in player_ids}
+        if not known or len(snapshot.ids) < 2:
+            return results
+        k = min(k, len(snapshot.ids) - 1)
+
+        for start in range(0, len(known), self.batch_size):
+            batch = known[start:start + self.batch_size]
+            rows = np.array([snapshot.position[pid] for pid in batch])
+            queries = snapshot.matrix[rows]
+            if approximate and snapshot.centroids is not None:
+                for pid, row, query in zip(batch, rows, queries):
+                    results[pid] = self._approximate(snapshot, row, query, k)
+                continue
+
+            distances = (snapshot.sq_norms[None, :] - 2 * queries @ snapshot.matrix.T
+                         + snapshot.sq_norms[rows][:, None])
+            distances[np.arange(len(rows)), rows] = np.inf  # exclure le joueur lui-même
+            nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            for i, pid in enumerate(batch):
+                order = nearest[i][np.argsort(distances[i, nearest[i]])]
+                results[pid] = [
+                    (int(snapshot.ids[j]), float(np.sqrt(max(distances[i, j], 0.0))))
+                    for j in order
+                ]
+        return results
+
+    def _approximate(self, snapshot, row, query, k):
+        probes = self._nearest_centroids(query[None, :], snapshot.centroids, self.nprobe)[0]
+        candidates = np.flatnonzero(np.isin(snapshot.assignments, probes))
+        candidates = candidates[candidates != row]
+        if not len(candidates):
+            return []
+        diff = snapshot.matrix[candidates] - query
+        distances = np.einsum('ij,ij->i', diff, diff)
+        count = min(k, len(candidates))
+        nearest = np.argpartition(distances, count - 1)[:count]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(int(snapshot.ids[candidates[j]]), float(np.sqrt(distances[j]))) for j in nearest]
+
+    def similar(self, player_id, k=10, approximate=False):
+        return self.similar_many([player_id], k, approximate)[player_id]
+
+    def __len__(self):
+        return 0 if self._snapshot is None else len(self._snapshot.ids)
+
+
+similarity_index = PlayerSimilarityIndex()
@@ -0,0 +1,459 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from flask import current_app
+from sqlalchemy.orm import joinedload
+
+from app import db
+from caches import LeaderRef
+from models import Team, Player, Game, PlayerPerformance
+
+
+# Format du fichier (little-endian) :
+#   en-tête fixe, puis sections alignées sur 8 octets, dans cet ordre :
+#   joueurs (triés par id), équipes (triées par id), saisons, classements
+#   (indices int32 des joueurs, un tableau par catégorie), textes UTF-8.
+MAGIC = b'NBASTATS'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIQdIIII')  # magic, format, version, créé le, joueurs, équipes, saisons, textes
+
+PLAYER_DTYPE = np.dtype([
+    ('id', '<i8'), ('team_id', '<i4'), ('games', '<i4'),
+    ('points', '<f4'), ('assists', '<f4'), ('rebounds', '<f4'), ('minutes', '<f4'),
+    ('fg_pct', '<f4'), ('fg3_pct', '<f4'), ('ft_pct', '<f4'),
+    ('height_feet', '<i2'), ('height_inches', '<i2'), ('weight_pounds', '<i2'),
+    ('text_len', '<u2'), ('text_off', '<u4'),
+])
+TEAM_DTYPE = np.dtype([
+    ('id', '<i4'), ('text_off', '<u4'), ('text_len', '<u2'), ('_pad', '<u2'),
+    ('players', '<i4'), ('wins', '<i4'), ('losses', '<i4'),
+])
+SEASON_DTYPE = np.dtype([
+    ('season', '<i4'), ('games', '<i4'), ('performances', '<i4'), ('_pad', '<i4'),
+    ('avg_total_points', '<f8'), ('avg_home_margin', '<f8'), ('avg_player_points', '<f8'),
+])
+LEADER_CATEGORIES = ('points', 'assists', 'rebounds')
+
+# Vues en lecture : même interface que les objets du modèle utilisés par les templates
+PlayerStat = namedtuple(
+    'PlayerStat',
+    'id first_name last_name position team_id team games points_per_game assists_per_game '
+    'rebounds_per_game minutes_per_game fg_pct fg3_pct ft_pct height_feet height_inches weight_pounds'
+)
+TeamStat = namedtuple('TeamStat', 'id name city conference division players wins losses')
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _layout(n_players, n_teams, n_seasons):
+    """Position de chaque section, déduite des effectifs de l'en-tête"""
+    offsets = {}
+    position = _align(HEADER.size)
+    for name, size in (('players', n_players * PLAYER_DTYPE.itemsize),
+                       ('teams', n_teams * TEAM_DTYPE.itemsize),
+                       ('seasons', n_seasons * SEASON_DTYPE.itemsize),
+                       ('leaders', len(LEADER_CATEGORIES) * n_players * 4)):
+        offsets[name] = position
+        position = _align(position + size)
+    offsets['strings'] = position
+    return offsets
+
+
+def _float(value):
+    # Stockage en float32 : arrondi pour retrouver les valeurs saisies (1 décimale)
+    return round(float(value), 3)
+
+
+def _none_if_negative(value):
+    value = int(value)
+    return None if value < 0 else value
+
+
+class StatsSnapshot:
+    """Instantané en lecture seule, projeté en mémoire (mmap).
+
+    Les tableaux numpy pointent directement dans les pages du fichier :
+    aucune copie, et les pages sont partagées par tous les workers qui
+    projettent la même version du fichier.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.inode = os.fstat(f.fileno()).st_ino
+        magic, fmt, self.version, self.created_at, n_players, n_teams, n_seasons, strings_len = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"Format d'instantané non reconnu: {path}")
+
+        offsets = _layout(n_players, n_teams, n_seasons)
+        buffer = self._mmap
+        self.player_rows = np.frombuffer(buffer, PLAYER_DTYPE, n_players, offsets['players'])
+        self.team_rows = np.frombuffer(buffer, TEAM_DTYPE, n_teams, offsets['teams'])
+        self.season_rows = np.frombuffer(buffer, SEASON_DTYPE, n_seasons, offsets['seasons'])
+        self.leader_orders = {
+            category: np.frombuffer(buffer, '<i4', n_players, offsets['leaders'] + i * n_players * 4)
+            for i, category in enumerate(LEADER_CATEGORIES)
+        }
+        self._strings = memoryview(buffer)[offsets['strings']:offsets['strings'] + strings_len]
+        self._teams = None
+        self._sorted_teams = None
+
+    def _text(self, offset, length):
+        return bytes(self._strings[offset:offset + length]).decode('utf-8').split('\0')
+
+    # --- Équipes ------------------------------------------------------
+
+    def _team_map(self):
+        if self._teams is None:
+            teams = {}
+            for row in self.team_rows:
+                name, city, conference, division = self._text(row['text_off'], row['text_len'])
+                teams[int(row['id'])] = TeamStat(
+                    int(row['id']), name, city, conference or None, division or None,
+                    int(row['players']), int(row['wins']), int(row['losses'])
+                )
+            self._teams = teams
+        return self._teams
+
+    def teams(self):
+        """Toutes les équipes, triées par nom (décodées et triées une fois par version)"""
+        if self._sorted_teams is None:
+            self._sorted_teams = sorted(self._team_map().values(), key=lambda t: t.name)
+        return list(self._sorted_teams)
+
+    def team(self, team_id):
+        return self._team_map().get(team_id)
+
+    # --- Joueurs ------------------------------------------------------
+
+    def _player(self, index):
+        row = self.player_rows[index]
+        first_name, last_name, position = self._text(row['text_off'], row['text_len'])
+        team_id = int(row['team_id'])
+        return PlayerStat(
+            int(row['id']), first_name, last_name, position or None, team_id, self.team(team_id),
+            int(row['games']), _float(row['points']), _float(row['assists']), _float(row['rebounds']),
+            _float(row['minutes']), _float(row['fg_pct']), _float(row['fg3_pct']), _float(row['ft_pct']),
+            _none_if_negative(row['height_feet']), _none_if_negative(row['height_inches']),
+            _none_if_negative(row['weight_pounds'])
+        )
+
+    def _index(self, player_id):
+        ids = self.player_rows['id']
+        index = int(np.searchsorted(ids, player_id))
+        if index < len(ids) and ids[index] == player_id:
+            return index
+        return None
+
+    def player(self, player_id):
+        index = self._index(player_id)
+        return None if index is None else self._player(index)
+
+    def players(self, team_id=None):
+        if team_id:
+            indexes = np.flatnonzero(self.player_rows['team_id'] == team_id)
+        else:
+            indexes = range(len(self.player_rows))
+        return [self._player(i) for i in indexes]
+
+    def compare(self, player_ids):
+        """Joueurs demandés, avec leur rang dans la ligue pour chaque catégorie"""
+        ranks = {}
+        for category, order in self.leader_orders.items():
+            rank = np.empty(len(order), dtype=np.int32)
+            rank[order] = np.arange(1, len(order) + 1, dtype=np.int32)
+            ranks[category] = rank
+        result = []
+        for player_id in player_ids:
+            index = self._index(player_id)
+            if index is not None:
+                result.append((self._player(index), {c: int(r[index]) for c, r in ranks.items()}))
+        return result
+
+    def leaders(self, limit=10):
+        boards = {}
+        for category, order in self.leader_orders.items():
+            rows = self.player_rows[order[:limit]]
+            boards[category] = tuple(
+                LeaderRef(int(row['id']), *self._text(row['text_off'], row['text_len'])[:2],
+                          int(row['team_id']), _float(row[category]))
+                for row in rows
+            )
+        return boards
+
+    # --- Saisons ------------------------------------------------------
+
+    def seasons(self):
+        return {
+            int(row['season']): {
+                'games': int(row['games']),
+                'performances': int(row['performances']),
+                'avg_total_points': round(float(row['avg_total_points']), 2),
+                'avg_home_margin': round(float(row['avg_home_margin']), 2),
+                'avg_player_points': round(float(row['avg_player_points']), 2),
+            }
+            for row in self.season_rows
+        }
+
+
+class StatsSnapshotStore:
+    """Publication et lecture de l'instantané partagé des statistiques.
+
+    publish() (après une synchronisation) reconstruit le fichier depuis la
+    base, l'écrit à côté puis le renomme : le remplacement est atomique et
+    les workers qui projettent l'ancienne version la gardent valide.
+    current() vérifie au plus toutes les `check_interval` secondes si le
+    fichier a changé (un simple stat) et bascule alors sur la nouvelle version.
+    """
+
+    def __init__(self, path=None, check_interval=1.0):
+        self._path = path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._pending = None
+
+    @property
+    def path(self):
+        return self._path or current_app.config.get('STATS_SNAPSHOT_PATH') or \
+            os.path.join(current_app.instance_path, 'stats', 'league_stats.bin')
+
+    # --- Lecture ------------------------------------------------------
+
+    def current(self):
+        """Instantané le plus récent, ou None s'il n'a jamais été publié"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if now - self._checked_at >= self.check_interval:
+                self._reload()
+                self._checked_at = now
+        return self._snapshot
+
+    def _reload(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            self._snapshot = None
+            return
+        if self._snapshot is not None and self._snapshot.inode == inode:
+            return
+        try:
+            self._snapshot = StatsSnapshot(self.path)
+        except (OSError, ValueError) as e:
+            print(f"Instantané de statistiques illisible: {e}")
+
+    # --- Écriture -----------------------------------------------------
+
+    def _read_version(self):
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(HEADER.size)
+            magic, fmt, version = HEADER.unpack(header)[:3]
+            return version if magic == MAGIC else 0
+        except (OSError, struct.error):
+            return 0
+
+    def publish(self):
+        """Reconstruit l'instantané depuis la base et le publie ; retourne sa version"""
+        # Un seul fichier temporaire par processus : publications sérialisées
+        with self._publish_lock:
+            return self._publish()
+
+    def publish_later(self, delay=None):
+        """Publie en arrière-plan, hors de la requête en cours.
+
+        Les demandes rapprochées (ajouts successifs) sont regroupées en une
+        seule publication `delay` secondes après la première (par défaut
+        STATS_SNAPSHOT_PUBLISH_DELAY, 2 s). En attendant, les routes servent
+        l'instantané précédent.
+        """
+        app = current_app._get_current_object()
+        if delay is None:
+            delay = app.config.get('STATS_SNAPSHOT_PUBLISH_DELAY', 2.0)
+        with self._lock:
+            if self._pending is not None:
+                return self._pending
+            self._pending = threading.Timer(delay, self._publish_pending, args=(app,))
+            self._pending.daemon = True
+            self._pending.start()
+            return self._pending
+
+    def _publish_pending(self, app):
+        with self._lock:
+            self._pending = None
+        with app.app_context():
+            try:
+                self.publish()
+            except Exception as e:
+                app.logger.error("Publication différée de l'instantané impossible: %s", e)
+            finally:
+                db.session.remove()
+
+    def _publish(self):
+        strings = bytearray()
+
+        def text(*parts):
+            encoded = '\0'.join(p or '' for p in parts).encode('utf-8')
+            offset = len(strings)
+            strings.extend(encoded)
+            return offset, len(encoded)
+
+        # Joueurs : moyennes par match et adresse agrégée sur les performances
+        shooting = dict(
+            (row[0], row[1:]) for row in db.session.query(
+                PlayerPerformance.player_id,
+                db.func.count(PlayerPerformance.id),
+                db.func.sum(PlayerPerformance.field_goals_made),
+                db.func.sum(PlayerPerformance.field_goals_attempted),
+                db.func.sum(PlayerPerformance.three_points_made),
+                db.func.sum(PlayerPerformance.three_points_attempted),
+                db.func.sum(PlayerPerformance.free_throws_made),
+                db.func.sum(PlayerPerformance.free_throws_attempted),
+            ).group_by(PlayerPerformance.player_id)
+        )
+        player_query = db.session.query(
+            Player.id, Player.team_id, Player.points_per_game, Player.assists_per_game,
+            Player.rebounds_per_game, Player.minutes_per_game, Player.height_feet,
+            Player.height_inches, Player.weight_pounds, Player.first_name, Player.last_name,
+            Player.position
+        ).order_by(Player.id).all()
+        players = np.zeros(len(player_query), dtype=PLAYER_DTYPE)
+        for i, row in enumerate(player_query):
+            games, fgm, fga, fg3m, fg3a, ftm, fta = shooting.get(row[0], (0,) * 7)
+            offset, length = text(row[9], row[10], row[11])
+            players[i] = (
+                row[0], row[1] or -1, games or 0,
+                row[2] or 0.0, row[3] or 0.0, row[4] or 0.0, row[5] or 0.0,
+                fgm / fga if fga else 0.0, fg3m / fg3a if fg3a else 0.0, ftm / fta if fta else 0.0,
+                -1 if row[6] is None else row[6], -1 if row[7] is None else row[7],
+                -1 if row[8] is None else row[8], length, offset
+            )
+
+        # Équipes : effectif et bilan victoires / défaites des matchs terminés
+        roster = dict(db.session.query(Player.team_id, db.func.count(Player.id)).group_by(Player.team_id))
+        played = (Game.home_team_score.isnot(None), Game.visitor_team_score.isnot(None),
+                  Game.home_team_score != Game.visitor_team_score)
+        home_win = Game.home_team_score > Game.visitor_team_score
+        wins, losses = {}, {}
+        for team_column, win_condition in ((Game.home_team_id, home_win), (Game.visitor_team_id, ~home_win)):
+            for team_id, won, count in db.session.query(
+                    team_column, win_condition, db.func.count(Game.id)
+            ).filter(*played).group_by(team_column, win_condition):
+                target = wins if won else losses
+                target[team_id] = target.get(team_id, 0) + count
+        team_query = Team.query.order_by(Team.id).all()
+        teams = np.zeros(len(team_query), dtype=TEAM_DTYPE)
+        for i, team in enumerate(team_query):
+            offset, length = text(team.name, team.city, team.conference, team.division)
+            teams[i] = (team.id, offset, length, 0, roster.get(team.id, 0),
+                        wins.get(team.id, 0), losses.get(team.id, 0))
+
+        # Saisons : moyennes de la ligue
+        performances = dict(
+            (row[0], row[1:]) for row in db.session.query(
+                PlayerPerformance.season, db.func.count(PlayerPerformance.id),
+                db.func.avg(PlayerPerformance.points)
+            ).group_by(PlayerPerformance.season)
+        )
+        season_query = db.session.query(
+            Game.season, db.func.count(Game.id),
+            db.func.avg(Game.home_team_score + Game.visitor_team_score),
+            db.func.avg(Game.home_team_score - Game.visitor_team_score)
+        ).filter(Game.season.isnot(None)).group_by(Game.season).order_by(Game.season).all()
+        seasons = np.zeros(len(season_query), dtype=SEASON_DTYPE)
+        for i, (season, games, avg_total, avg_margin) in enumerate(season_query):
+            perf_count, avg_points = performances.get(season, (0, 0.0))
+            seasons[i] = (season, games, perf_count, 0, avg_total or 0.0, avg_margin or 0.0, avg_points or 0.0)
+
+        # Classements précalculés : ordre décroissant (stable) par catégorie
+        orders = [np.argsort(-players[c], kind='stable').astype('<i4') for c in LEADER_CATEGORIES]
+
+        version = self._read_version() + 1
+        offsets = _layout(len(players), len(teams), len(seasons))
+        path = self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, version, time.time(),
+                                len(players), len(teams), len(seasons), len(strings)))
+            for name, data in (('players', players.tobytes()), ('teams', teams.tobytes()),
+                               ('seasons', seasons.tobytes()),
+                               ('leaders', b''.join(o.tobytes() for o in orders)),
+                               ('strings', bytes(strings))):
+                f.write(b'\0' * (offsets[name] - f.tell()))
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        # Le processus qui publie bascule tout de suite
+        with self._lock:
+            self._reload()
+            self._checked_at = time.monotonic()
+        return version
+
+
+def compare_from_db(player_ids):
+    """Repli de LeagueSnapshot.compare sans instantané publié : mêmes valeurs, calculées en SQL"""
+    ranked = db.session.query(Player.id, *(
+        db.func.row_number().over(
+            order_by=(db.func.coalesce(getattr(Player, f'{category}_per_game'), 0.0).desc(), Player.id)
+        ).label(category)
+        for category in LEADER_CATEGORIES
+    )).subquery()
+    ranks = {
+        row[0]: dict(zip(LEADER_CATEGORIES, row[1:]))
+        for row in db.session.query(ranked).filter(ranked.c.id.in_(player_ids))
+    }
+    shooting = {
+        row[0]: row[1:] for row in db.session.query(
+            PlayerPerformance.player_id,
+            db.func.count(PlayerPerformance.id),
+            db.func.sum(PlayerPerformance.field_goals_made),
+            db.func.sum(PlayerPerformance.field_goals_attempted),
+            db.func.sum(PlayerPerformance.three_points_made),
+            db.func.sum(PlayerPerformance.three_points_attempted),
+            db.func.sum(PlayerPerformance.free_throws_made),
+            db.func.sum(PlayerPerformance.free_throws_attempted),
+        ).filter(PlayerPerformance.player_id.in_(player_ids)).group_by(PlayerPerformance.player_id)
+    }
+    players = {p.id: p for p in Player.query.options(joinedload(Player.team)).filter(Player.id.in_(player_ids))}
+
+    result = []
+    for player_id in player_ids:
+        player = players.get(player_id)
+        if player is None:
+            continue
+        games, fgm, fga, fg3m, fg3a, ftm, fta = shooting.get(player_id, (0,) * 7)
+        result.append((PlayerStat(
+            player.id, player.first_name, player.last_name, player.position, player.team_id, player.team,
+            games or 0, player.points_per_game or 0.0, player.assists_per_game or 0.0,
+            player.rebounds_per_game or 0.0, player.minutes_per_game or 0.0,
+            fgm / fga if fga else 0.0, fg3m / fg3a if fg3a else 0.0, ftm / fta if fta else 0.0,
+            player.height_feet, player.height_inches, player.weight_pounds
+        ), ranks[player_id]))
+    return result
+
+
+stats_snapshot = StatsSnapshotStore()
+
+
+if __name__ == '__main__':
+    # python stats_snapshot.py : publie un instantané depuis la base courante
+    from app import app
+
+    with app.app_context():
+        version = stats_snapshot.publish()
+        print(f"📊 Instantané de statistiques v{version} publié: {stats_snapshot.path}")
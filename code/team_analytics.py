@@ -0,0 +1,234 @@
+import bisect
+import threading
+from collections import namedtuple
+
+from app import db
+from caches import data_version
+from models import Player, Game
+
+
+STAT_FIELDS = ('points_per_game', 'assists_per_game', 'rebounds_per_game', 'minutes_per_game')
+
+# Contribution d'un joueur / d'un match aux agrégats : conservée pour pouvoir
+# la retirer exactement lorsque la ligne change
+RosterEntry = namedtuple('RosterEntry', 'player_id team_id first_name last_name position stats')
+GameEntry = namedtuple('GameEntry', 'game_id date home_team_id visitor_team_id home_score visitor_score')
+
+
+def is_final(status):
+    """Match terminé (statut « Final » de l'API)"""
+    return bool(status) and status.lower().startswith('final')
+
+
+def matchup_key(team_a, team_b):
+    return (team_a, team_b) if team_a <= team_b else (team_b, team_a)
+
+
+class HeadToHead:
+    """Bilan des confrontations entre deux équipes (clé ordonnée (a, b), a < b)"""
+
+    __slots__ = ('games', 'wins_a', 'wins_b', 'margin_a', 'entries')
+
+    def __init__(self):
+        self.games = 0
+        self.wins_a = 0
+        self.wins_b = 0
+        self.margin_a = 0  # somme des écarts du point de vue de l'équipe a
+        self.entries = []  # GameEntry triés par (date, id)
+
+    def _apply(self, key, entry, sign):
+        team_a = key[0]
+        score_a, score_b = (entry.home_score, entry.visitor_score) if entry.home_team_id == team_a \
+            else (entry.visitor_score, entry.home_score)
+        self.games += sign
+        self.margin_a += sign * (score_a - score_b)
+        if score_a > score_b:
+            self.wins_a += sign
+        elif score_b > score_a:
+            self.wins_b += sign
+
+    def add(self, key, entry):
+        self._apply(key, entry, 1)
+        bisect.insort(self.entries, entry, key=lambda e: (e.date, e.game_id))
+
+    def remove(self, key, entry):
+        self._apply(key, entry, -1)
+        self.entries.remove(entry)
+
+
+class TeamAnalytics:
+    """Agrégats d'équipe précalculés : effectif, statistiques par poste et face-à-face.
+
+    Chaque joueur et chaque match terminé laisse une contribution mémorisée ;
+    une mise à jour retire l'ancienne contribution et ajoute la nouvelle,
+    sans relire le reste de l'effectif ni l'historique. Les lectures
+    (team_summary, matchup) sont des accès par clé.
+
+    Le processus qui synchronise applique les lignes modifiées via refresh() ;
+    les autres workers rechargent tout quand la version des données change.
+    """
+
+    def __init__(self, recent_limit=10):
+        self.recent_limit = recent_limit
+        self._lock = threading.RLock()
+        self._version = None
+        self._players = None
+        self._rosters = {}
+        self._positions = {}
+        self._games = {}
+        self._matchups = {}
+
+    # --- Chargement et mises à jour -----------------------------------
+
+    @staticmethod
+    def _player_rows(player_ids=None):
+        query = db.session.query(
+            Player.id, Player.team_id, Player.first_name, Player.last_name, Player.position,
+            *(getattr(Player, field) for field in STAT_FIELDS)
+        )
+        if player_ids is not None:
+            query = query.filter(Player.id.in_(player_ids))
+        return [
+            RosterEntry(row[0], row[1], row[2], row[3], row[4] or '', tuple(float(v or 0) for v in row[5:]))
+            for row in query
+        ]
+
+    @staticmethod
+    def _game_rows(game_ids=None):
+        query = db.session.query(
+            Game.id, Game.date, Game.home_team_id, Game.visitor_team_id,
+            Game.home_team_score, Game.visitor_team_score, Game.status
+        ).filter(Game.home_team_score.isnot(None), Game.visitor_team_score.isnot(None))
+        if game_ids is not None:
+            query = query.filter(Game.id.in_(game_ids))
+        return [GameEntry(*row[:6]) for row in query if is_final(row[6]) and row[2] and row[3]]
+
+    def _set_player(self, player_id, entry):
+        old = self._players.pop(player_id, None)
+        if old is not None:
+            self._rosters[old.team_id].pop(player_id, None)
+            totals = self._positions[old.team_id][old.position]
+            totals[0] -= 1
+            for i, value in enumerate(old.stats, 1):
+                totals[i] -= value
+            if not totals[0]:
+                del self._positions[old.team_id][old.position]
+        if entry is not None:
+            self._players[player_id] = entry
+            self._rosters.setdefault(entry.team_id, {})[player_id] = entry
+            totals = self._positions.setdefault(entry.team_id, {}).setdefault(
+                entry.position, [0] + [0.0] * len(STAT_FIELDS))
+            totals[0] += 1
+            for i, value in enumerate(entry.stats, 1):
+                totals[i] += value
+
+    def _set_game(self, game_id, entry):
+        old = self._games.pop(game_id, None)
+        if old is not None:
+            key = matchup_key(old.home_team_id, old.visitor_team_id)
+            self._matchups[key].remove(key, old)
+        if entry is not None:
+            self._games[game_id] = entry
+            key = matchup_key(entry.home_team_id, entry.visitor_team_id)
+            self._matchups.setdefault(key, HeadToHead()).add(key, entry)
+
+    def load(self):
+        """(Re)construit tous les agrégats depuis la base"""
+        version = data_version.current()
+        players, games = self._player_rows(), self._game_rows()
+        with self._lock:
+            self._players, self._rosters, self._positions = {}, {}, {}
+            self._games, self._matchups = {}, {}
+            for entry in players:
+                self._set_player(entry.player_id, entry)
+            for entry in games:
+                self._set_game(entry.game_id, entry)
+            self._version = version
+
+    def refresh(self, player_ids=(), game_ids=(), version=None):
+        """Applique les joueurs et matchs modifiés par une synchronisation.
+
+        `version` est la version des données après la synchronisation : si
+        l'état chargé n'était pas à la version précédente, une autre écriture
+        a eu lieu entre-temps et l'état sera rechargé entièrement.
+        """
+        if self._players is None:
+            return
+        if version is not None and self._version != version - 1:
+            with self._lock:
+                self._players = None
+            return
+        player_ids, game_ids = list(player_ids), list(game_ids)
+        players = {entry.player_id: entry for entry in self._player_rows(player_ids)} if player_ids else {}
+        games = {entry.game_id: entry for entry in self._game_rows(game_ids)} if game_ids else {}
+        with self._lock:
+            for player_id in player_ids:
+                self._set_player(player_id, players.get(player_id))
+            for game_id in game_ids:
+                self._set_game(game_id, games.get(game_id))
+            if version is not None:
+                self._version = version
+
+    def _ensure_loaded(self):
+        if self._players is None or self._version != data_version.current():
+            self.load()
+
+    # --- Lecture ------------------------------------------------------
+
+    def roster(self, team_id):
+        self._ensure_loaded()
+        with self._lock:
+            entries = self._rosters.get(team_id, {}).values()
+            return sorted(entries, key=lambda e: (e.last_name, e.first_name))
+
+    def team_summary(self, team_id):
+        """Effectif et statistiques par match cumulées / moyennes, par poste"""
+        self._ensure_loaded()
+        with self._lock:
+            positions = {position: list(totals) for position, totals in self._positions.get(team_id, {}).items()}
+        roster_size = sum(totals[0] for totals in positions.values())
+        team_totals = [sum(totals[i] for totals in positions.values()) for i in range(1, len(STAT_FIELDS) + 1)]
+        return {
+            'team_id': team_id,
+            'roster_size': roster_size,
+            'totals': {field: round(value, 1) for field, value in zip(STAT_FIELDS, team_totals)},
+            'averages': {
+                field: round(value / roster_size, 2) if roster_size else 0.0
+                for field, value in zip(STAT_FIELDS, team_totals)
+            },
+            'positions': {
+                position or 'N/A': {
+                    'players': totals[0],
+                    'totals': {field: round(value, 1) for field, value in zip(STAT_FIELDS, totals[1:])},
+                    'averages': {field: round(value / totals[0], 2) for field, value in zip(STAT_FIELDS, totals[1:])},
+                }
+                for position, totals in sorted(positions.items())
+            },
+        }
+
+    def matchup(self, team_a, team_b):
+        """Bilan des confrontations, du point de vue de team_a"""
+        self._ensure_loaded()
+        key = matchup_key(team_a, team_b)
+        with self._lock:
+            record = self._matchups.get(key)
+            if record is None or not record.games:
+                games = wins_a = wins_b = margin = 0
+                recent = []
+            else:
+                games, margin = record.games, record.margin_a
+                wins_a, wins_b = record.wins_a, record.wins_b
+                recent = record.entries[-self.recent_limit:][::-1]
+        if team_a != key[0]:
+            wins_a, wins_b, margin = wins_b, wins_a, -margin
+        return {
+            'team_a': team_a,
+            'team_b': team_b,
+            'games': games,
+            'wins': {str(team_a): wins_a, str(team_b): wins_b},
+            'average_margin': round(margin / games, 2) if games else None,
+            'recent': [dict(entry._asdict(), date=entry.date.isoformat()) for entry in recent],
+        }
+
+
+team_analytics = TeamAnalytics()
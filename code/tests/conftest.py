@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+from flask import g
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.smtp_standin import start_smtp_server  # noqa: E402
+
+
+@pytest.fixture
+def smtp():
+    server, state, port = start_smtp_server()
+    yield state, port
+    server.shutdown()
+    server.server_close()
+
+
+def mail_config(port, tmp_path, **extra):
+    """Configuration Flask-Mail pointant vers le serveur SMTP local"""
+    config = {
+        'MAIL_SERVER': '127.0.0.1',
+        'MAIL_PORT': port,
+        'MAIL_USE_TLS': False,
+        'MAIL_USERNAME': None,
+        'MAIL_PASSWORD': None,
+        'MAIL_DEFAULT_SENDER': 'noreply@nba-analytics.test',
+        'MAIL_SUPPRESS_SEND': False,
+        'MAIL_QUEUE_RETRY_DELAY': 0.05,
+        'MAIL_DEAD_LETTER_PATH': str(tmp_path / 'dead_letters.jsonl'),
+    }
+    config.update(extra)
+    return config
+
+
+def make_app(tmp_path, **config):
+    """Application sur une base SQLite temporaire, fichiers partagés sous tmp_path"""
+    import app as app_module
+    from caches import data_version, performance_version
+    from identity import identity_cache, user_version
+    from stats_snapshot import stats_snapshot
+    identity_cache.clear()
+    # Versions et instantané lus par un test précédent (autre répertoire temporaire)
+    for version in (data_version, performance_version, user_version):
+        version._value = None
+    stats_snapshot._snapshot, stats_snapshot._checked_at = None, 0.0
+    if stats_snapshot._pending is not None:
+        stats_snapshot._pending.cancel()
+        stats_snapshot._pending = None
+    return app_module.create_app(dict({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'DATA_VERSION_PATH': str(tmp_path / 'data_version'),
+        'USER_VERSION_PATH': str(tmp_path / 'user_version'),
+        'PERFORMANCE_VERSION_PATH': str(tmp_path / 'performance_version'),
+        'STATS_SNAPSHOT_PATH': str(tmp_path / 'stats' / 'league_stats.bin'),
+        'PROFILE_DIR': str(tmp_path / 'profiles'),
+        'MAIL_DEAD_LETTER_PATH': str(tmp_path / 'dead_letters.jsonl'),
+    }, **config))
+
+
+@pytest.fixture
+def app(tmp_path):
+    from app import db
+    application = make_app(tmp_path)
+    with application.app_context():
+        db.create_all()
+        yield application
+        db.session.remove()
+
+
+def login(client, user):
+    # Le contexte d'application du test est partagé par les requêtes : oublier
+    # l'utilisateur chargé par Flask-Login lors de la requête précédente
+    g.pop('_login_user', None)
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
@@ -0,0 +1,94 @@
+"""Serveur SMTP local minimal pour les tests de la file d'envoi"""
+
+import socketserver
+import threading
+import time
+
+
+class SmtpState:
+    """Compteurs et pannes injectables partagés avec les connexions"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+        self.attempts = {}          # destinataire -> [instants des tentatives]
+        self.fail_recipients = {}   # destinataire -> nombre d'échecs 451 restants (-1 : toujours)
+
+    def record_attempt(self, recipient):
+        """Enregistre une tentative ; vrai si elle doit échouer (erreur temporaire)"""
+        with self.lock:
+            self.attempts.setdefault(recipient, []).append(time.monotonic())
+            remaining = self.fail_recipients.get(recipient, 0)
+            if remaining:
+                self.fail_recipients[recipient] = remaining - 1 if remaining > 0 else -1
+                return True
+            return False
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        state = self.server.state
+        with state.lock:
+            state.connections += 1
+        self.reply('220 localhost SMTP standin')
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 8BITMIME')
+            elif verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipient = command.split(':', 1)[1].strip().strip('<>')
+                if state.record_attempt(recipient):
+                    self.reply('451 Temporary failure')
+                else:
+                    recipients.append(recipient)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                body = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b'.\r\n', b'.\n'):
+                        break
+                    body.append(data)
+                with state.lock:
+                    state.messages.append((recipients, b''.join(body)))
+                self.reply('250 OK')
+            elif verb == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SmtpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_smtp_server():
+    """Démarre le serveur dans un thread ; retourne (serveur, état, port)"""
+    server = SmtpServer(('127.0.0.1', 0), SmtpHandler)
+    server.state = SmtpState()
+    threading.Thread(target=server.serve_forever, name='smtp-standin', daemon=True).start()
+    return server, server.state, server.server_address[1]
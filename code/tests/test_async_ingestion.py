@@ -0,0 +1,127 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from app import db
+from async_ingestion import AsyncIngestionEngine, StatsWriter
+from caches import performance_version
+from form_tracker import form_tracker
+from models import Team, Player, Game, PlayerPerformance
+from stats_snapshot import stats_snapshot
+
+
+class FakeService:
+    """Une page de 10 enregistrements par couple joueur/saison ; `fail_on` lève une erreur inattendue"""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+
+    async def get_player_stats(self, player_id, season=None, page=1, per_page=100):
+        await asyncio.sleep(0)
+        if player_id == self.fail_on:
+            raise KeyError('meta')
+        return {'data': [{'player_id': player_id, 'season': season}] * 10, 'meta': {'total_pages': 1}}
+
+
+class GameService:
+    """Une feuille de match (match 1, saison 2024) par joueur"""
+
+    async def get_player_stats(self, player_id, season=None, page=1, per_page=100):
+        game = {'id': 1, 'date': '2024-11-01', 'season': season, 'home_team_id': 1, 'visitor_team_id': 2}
+        return {'data': [{'game': game, 'player': {'id': player_id}, 'pts': 10}], 'meta': {'total_pages': 1}}
+
+    def close(self):
+        pass
+
+
+class Writer:
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.records = []
+
+    def write(self, batch):
+        if self.fail:
+            raise RuntimeError('disque plein')
+        self.records.extend(batch)
+
+
+def ingest(engine, service, writer, players=50):
+    coroutine = engine.ingest_stats(range(players), [2024], writer=writer, service=service)
+    return asyncio.run(asyncio.wait_for(coroutine, timeout=10))
+
+
+def test_ingest_writes_every_page():
+    writer = Writer()
+    stats = ingest(AsyncIngestionEngine(concurrency=8, queue_size=2, batch_size=25), FakeService(), writer)
+
+    assert stats['pages'] == 50
+    assert len(writer.records) == 500
+
+
+def test_writer_failure_is_raised_instead_of_hanging():
+    # File de pages minuscule : les récupérateurs s'y bloqueraient sans le rédacteur
+    engine = AsyncIngestionEngine(concurrency=8, queue_size=1, batch_size=5)
+
+    with pytest.raises(RuntimeError, match='disque plein'):
+        ingest(engine, FakeService(), Writer(fail=True))
+
+
+def test_fetcher_failure_is_raised():
+    engine = AsyncIngestionEngine(concurrency=1, queue_size=4)
+
+    with pytest.raises(KeyError):
+        ingest(engine, FakeService(fail_on=3), Writer())
+
+
+def test_stats_writer_applies_batches_to_form(app):
+    db.session.add_all([Team(id=1, name='A', city='A'), Team(id=2, name='B', city='B'),
+                        Player(id=1, first_name='a', last_name='b', team_id=1),
+                        Game(id=1, date=datetime(2024, 11, 1), season=2024, home_team_id=1, visitor_team_id=2)])
+    db.session.commit()
+    form_tracker.load()
+    writer = StatsWriter()
+    records = [
+        {'game': {'id': 1}, 'player': {'id': 1}, 'pts': 12},
+        {'game': {'id': 2, 'date': '2024-11-03', 'season': 2024, 'home_team_id': 2, 'visitor_team_id': 1},
+         'player': {'id': 1}, 'pts': 20},
+    ]
+
+    # Comme dans l'ingestion : écriture depuis le thread du rédacteur
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(writer.write, records).result()
+
+    assert PlayerPerformance.query.count() == 2
+    assert form_tracker._version == performance_version.current()
+    assert form_tracker.form(1)['windows']['last_5']['points'] == 16.0
+
+
+def test_stats_writer_skips_performances_already_loaded(app):
+    db.session.add_all([Team(id=1, name='A', city='A'), Team(id=2, name='B', city='B'),
+                        Player(id=1, first_name='a', last_name='b', team_id=1),
+                        Game(id=1, date=datetime(2024, 11, 1), season=2024, home_team_id=1, visitor_team_id=2)])
+    db.session.commit()
+    record = {'game': {'id': 1}, 'player': {'id': 1}, 'pts': 12}
+    StatsWriter().write([record])
+
+    # Relance : nouvel état, la feuille est déjà en base (index unique)
+    writer = StatsWriter()
+    writer.write([record, record])
+
+    assert PlayerPerformance.query.count() == 1
+    assert (writer.stats['inserted'], writer.stats['skipped']) == (0, 2)
+
+
+def test_run_republishes_snapshot_after_inserting(app, monkeypatch):
+    db.session.add_all([Team(id=1, name='A', city='A'), Team(id=2, name='B', city='B'),
+                        Player(id=1, first_name='a', last_name='b', team_id=1)])
+    db.session.commit()
+    engine = AsyncIngestionEngine(concurrency=2)
+    monkeypatch.setattr(engine, 'services', lambda: (GameService(), None))
+
+    stats = engine.run([2024])
+
+    assert stats['inserted'] == 1
+    assert stats_snapshot.current().seasons()[2024]['performances'] == 1
@@ -0,0 +1,126 @@
+import csv
+import gzip
+import json
+
+import pytest
+
+import bulk_loader
+from app import db
+from bulk_loader import BulkLoader, iter_records
+from stats_snapshot import stats_snapshot
+from models import Team, Player, Game, PlayerPerformance, BulkLoadCheckpoint
+
+
+CSV_FIELDS = ('game_id', 'date', 'season', 'home_team', 'visitor_team', 'home_team_score',
+              'visitor_team_score', 'player_id', 'team', 'pts', 'ast', 'reb', 'min', 'fgm', 'fga')
+
+
+@pytest.fixture
+def league(app):
+    db.session.add_all([Team(id=1, name='Boston Celtics', city='Boston'),
+                        Team(id=2, name='Miami Heat', city='Miami')])
+    db.session.add_all([Player(id=pid, first_name=f'P{pid}', last_name='Test', team_id=1 + pid % 2)
+                        for pid in range(1, 5)])
+    db.session.commit()
+
+
+def write_csv(path, games=3):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, CSV_FIELDS)
+        writer.writeheader()
+        for game_id in range(1, games + 1):
+            for player_id in range(1, 5):
+                writer.writerow({
+                    'game_id': game_id, 'date': f'2024-11-0{game_id}', 'season': '',
+                    'home_team': 'Celtics', 'visitor_team': '2', 'home_team_score': 100,
+                    'visitor_team_score': 90 + game_id, 'player_id': player_id, 'team': 1 + player_id % 2,
+                    'pts': 10 + player_id, 'ast': 2, 'reb': 5, 'min': '31:30', 'fgm': 4, 'fga': 9,
+                })
+    return str(path)
+
+
+def test_csv_records_are_parsed(league, tmp_path):
+    path = write_csv(tmp_path / 'games.csv', games=1)
+
+    stats = BulkLoader(chunk_size=3).run([path])
+
+    assert (stats['inserted'], stats['games'], stats['skipped']) == (4, 1, 0)
+    game = db.session.get(Game, 1)
+    # Saison déduite de la date, équipe résolue par son nom court
+    assert (game.season, game.home_team_id, game.visitor_team_id) == (2024, 1, 2)
+    performance = PlayerPerformance.query.filter_by(player_id=3).one()
+    assert (performance.points, performance.minutes, performance.field_goals_attempted) == (13, 31, 9)
+    assert performance.season == 2024
+
+
+def test_nested_ndjson_gz_records_are_flattened(league, tmp_path):
+    path = tmp_path / 'stats.ndjson.gz'
+    record = {
+        'game': {'id': 7, 'date': '2024-03-01T00:00:00.000Z', 'season': 2023, 'home_team_id': 2,
+                 'visitor_team_id': 1, 'home_team_score': 99, 'visitor_team_score': 101},
+        'player': {'id': 2, 'first_name': 'P2', 'last_name': 'Test'},
+        'team': {'id': 1}, 'pts': 21, 'ast': 3, 'reb': 4, 'min': '28',
+    }
+    with gzip.open(path, 'wt') as f:
+        f.write(json.dumps(record) + '\n\n')
+
+    records = list(iter_records(str(path)))
+    assert records[0]['game_id'] == 7 and records[0]['player_id'] == 2 and records[0]['team'] == 1
+
+    BulkLoader().run([str(path)])
+    performance = PlayerPerformance.query.one()
+    assert (performance.game_id, performance.points, performance.season) == (7, 21, 2023)
+    assert db.session.get(Game, 7).home_team_id == 2
+
+
+def test_resume_after_interrupted_load(league, tmp_path, monkeypatch):
+    path = write_csv(tmp_path / 'games.csv')
+    flush = BulkLoader._flush
+    calls = []
+
+    def crash_on_second_chunk(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return flush(self, *args, **kwargs)
+
+    monkeypatch.setattr(BulkLoader, '_flush', crash_on_second_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        BulkLoader(chunk_size=5).run([path])
+    db.session.remove()
+    checkpoint = db.session.get(BulkLoadCheckpoint, path)
+    assert (checkpoint.records, checkpoint.inserted, checkpoint.completed) == (5, 5, False)
+
+    monkeypatch.setattr(BulkLoader, '_flush', flush)
+    stats = BulkLoader(chunk_size=5).run([path])
+
+    assert stats['records'] == 7
+    assert PlayerPerformance.query.count() == 12
+    assert db.session.get(BulkLoadCheckpoint, path).completed
+
+
+def test_reloading_or_overlapping_dumps_does_not_duplicate(league, tmp_path):
+    first = write_csv(tmp_path / 'a.csv', games=2)
+    overlapping = write_csv(tmp_path / 'b.csv', games=3)
+    BulkLoader().run([first])
+
+    # Autre fichier qui recouvre le premier, puis relance après --restart
+    stats = BulkLoader().run([overlapping])
+    BulkLoadCheckpoint.query.delete()
+    db.session.commit()
+    again = BulkLoader().run([first, overlapping])
+
+    assert stats['inserted'] == 4
+    assert stats['skipped'] == 8
+    assert again['inserted'] == 0
+    assert PlayerPerformance.query.count() == 12
+
+
+def test_main_republishes_snapshot_after_load(league, app, tmp_path, monkeypatch):
+    path = write_csv(tmp_path / 'games.csv', games=2)
+    monkeypatch.setattr(bulk_loader, 'app', app)
+    monkeypatch.setattr('sys.argv', ['bulk_loader.py', path])
+
+    assert bulk_loader.main() == 0
+
+    assert stats_snapshot.current().seasons()[2024]['performances'] == 8
@@ -0,0 +1,22 @@
+import multiprocessing
+
+from caches import DataVersion
+
+
+def _bump_many(path, count):
+    version = DataVersion(path=path)
+    for _ in range(count):
+        version.bump()
+
+
+def test_concurrent_bumps_across_processes_are_not_lost(tmp_path):
+    path = str(tmp_path / 'data_version')
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_bump_many, args=(path, 50)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    assert DataVersion(path=path, check_interval=0).current() == 200
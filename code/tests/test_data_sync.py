@@ -0,0 +1,155 @@
+import copy
+
+import pytest
+from sqlalchemy import event, inspect
+
+from app import db
+from models import Team, Player, Game, Notification, SyncChange, User
+from season_store import ensure_season_schema
+from services import DataSyncService, NotificationService
+
+
+TEAMS = [
+    {'id': 1, 'full_name': 'Boston Celtics', 'city': 'Boston', 'conference': 'East', 'division': 'Atlantic'},
+    {'id': 2, 'full_name': 'Los Angeles Lakers', 'city': 'Los Angeles', 'conference': 'West',
+     'division': 'Pacific'},
+    {'id': 3, 'full_name': 'Miami Heat', 'city': 'Miami', 'conference': 'East', 'division': 'Southeast'},
+]
+PLAYERS = [
+    {'id': 10, 'first_name': 'Jayson', 'last_name': 'Tatum', 'position': 'F', 'team': {'id': 1},
+     'pts': 26.0, 'ast': 4.0, 'reb': 8.0, 'min': '36:00'},
+    {'id': 20, 'first_name': 'Anthony', 'last_name': 'Davis', 'position': 'C', 'team': {'id': 2},
+     'pts': 24.0, 'ast': 3.0, 'reb': 12.0, 'min': '35:00'},
+    {'id': 30, 'first_name': 'Bam', 'last_name': 'Adebayo', 'position': 'C', 'team': {'id': 3},
+     'pts': 19.0, 'ast': 4.0, 'reb': 10.0, 'min': '34:00'},
+]
+GAMES = [
+    {'id': 100, 'date': '2024-11-01T00:00:00Z', 'season': 2024, 'status': '2nd Qtr', 'period': 2,
+     'home_team': {'id': 1}, 'visitor_team': {'id': 2}, 'home_team_score': 50, 'visitor_team_score': 48},
+]
+
+
+class FakeNBAApi:
+    """Données de l'API modifiables entre deux synchronisations"""
+
+    def __init__(self):
+        self.teams, self.players, self.games = copy.deepcopy((TEAMS, PLAYERS, GAMES))
+
+    def get_teams(self):
+        return self.teams
+
+    def get_players(self, team_id=None):
+        return [p for p in self.players if team_id in (None, p['team']['id'])]
+
+    def get_games(self, team_id=None, date=None):
+        return self.games
+
+    def player(self, player_id):
+        return next(p for p in self.players if p['id'] == player_id)
+
+
+@pytest.fixture
+def sync(app):
+    service = DataSyncService()
+    service.nba_api = FakeNBAApi()
+    return service
+
+
+def add_manager(email, team_ids):
+    user = User(email=email, name=email)
+    user.managed_teams = [db.session.get(Team, team_id) for team_id in team_ids]
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def write_statements(callback):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        result = callback()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return result, [s for s in statements if s.lstrip().split()[0].upper() in ('INSERT', 'UPDATE', 'DELETE')]
+
+
+def test_initial_sync_inserts_everything(sync):
+    result = sync.sync_all()
+
+    assert (result['teams'], result['players'], result['games']) == (3, 3, 1)
+    assert sorted(result['written_ids']['players']) == [10, 20, 30]
+    assert Player.query.count() == 3
+    assert db.session.get(Player, 10).minutes_per_game == 36.0
+    assert {c.change_type for c in SyncChange.query} == {'new_player'}
+
+
+def test_noop_sync_writes_nothing(sync):
+    sync.sync_all()
+    add_manager('manager@example.com', [1])
+
+    result, writes = write_statements(sync.sync_all)
+
+    assert result['written'] == 0
+    assert result['changes'] == 0
+    assert writes == []
+
+
+def test_detects_trade_stat_jump_and_final_score(sync):
+    sync.sync_all()
+    api = sync.nba_api
+    api.player(20)['team'] = {'id': 3}
+    api.player(10)['pts'] = 33.0
+    api.player(30)['pts'] = 20.0  # sous le seuil : mise à jour sans changement signalé
+    api.games[0].update(status='Final', period=4, home_team_score=110, visitor_team_score=104)
+
+    result = sync.sync_all()
+
+    changes = {(c.change_type, c.entity_id) for c in SyncChange.query.filter_by(sync_id=result['sync_id'])}
+    assert changes == {('trade', 20), ('stat_jump', 10), ('final_score', 100)}
+    trade = SyncChange.query.filter_by(change_type='trade').one()
+    assert (trade.team_id, trade.other_team_id) == (3, 2)
+    assert sorted(result['written_ids']['players']) == [10, 20, 30]
+    assert db.session.get(Game, 100).home_team_score == 110
+
+    # Score déjà final, inchangé : pas de nouveau changement
+    assert sync.sync_all()['changes'] == 0
+
+
+def test_one_notification_per_manager_across_teams(sync):
+    sync.sync_all()
+    multi = add_manager('multi@example.com', [1, 2])
+    single = add_manager('single@example.com', [3])
+    sync.nba_api.player(10)['pts'] = 33.0
+    sync.nba_api.player(20)['ast'] = 7.0
+
+    result = sync.sync_all()
+
+    assert result['notified'] == 1
+    notifications = Notification.query.filter_by(user_id=multi.id).all()
+    assert len(notifications) == 1
+    assert 'Tatum' in notifications[0].message and 'Davis' in notifications[0].message
+    assert Notification.query.filter_by(user_id=single.id).count() == 0
+
+
+def test_failed_journal_rolls_back_writes(sync, monkeypatch):
+    sync.sync_all()
+    sync.nba_api.player(20)['team'] = {'id': 3}
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('journal indisponible')
+    monkeypatch.setattr(NotificationService, 'notify_team_changes', fail)
+
+    with pytest.raises(RuntimeError):
+        sync.sync_all()
+    db.session.rollback()
+
+    assert db.session.get(Player, 20).team_id == 2
+    assert SyncChange.query.filter_by(change_type='trade').count() == 0
+
+
+def test_startup_migration_creates_sync_change_table(app):
+    SyncChange.__table__.drop(db.engine)
+    ensure_season_schema()
+
+    assert 'sync_change' in inspect(db.engine).get_table_names()
@@ -0,0 +1,90 @@
+import pytest
+from flask import Flask
+from flask_mail import Mail
+
+from email_queue import EmailDeliveryQueue
+from tests.conftest import mail_config, make_app
+
+
+@pytest.fixture
+def delivery(smtp, tmp_path):
+    state, port = smtp
+    app = Flask(__name__)
+    app.config.update(mail_config(port, tmp_path))
+    mail = Mail(app)
+    email_queue = EmailDeliveryQueue(app, mail=mail)
+    yield email_queue, state
+    email_queue.stop()
+
+
+def test_batch_reuses_single_connection(delivery):
+    email_queue, state = delivery
+    count = email_queue.enqueue_many([f'user{i}@example.com' for i in range(12)], 'Sujet', 'Corps')
+
+    assert count == 12
+    assert email_queue.join(timeout=10)
+    assert email_queue.sent_count == 12
+    assert len(state.messages) == 12
+    assert state.connections == 1
+    assert not email_queue.dead_letters
+
+
+def test_transient_failure_retried_with_backoff(delivery):
+    email_queue, state = delivery
+    state.fail_recipients['flaky@example.com'] = 2
+    email_queue.enqueue('flaky@example.com', 'Sujet', 'Corps')
+    email_queue.enqueue('ok@example.com', 'Sujet', 'Corps')
+
+    assert email_queue.join(timeout=10)
+    attempts = state.attempts['flaky@example.com']
+    assert len(attempts) == 3
+    # Délai croissant : retry_delay puis 2 * retry_delay
+    assert attempts[1] - attempts[0] >= email_queue.retry_delay
+    assert attempts[2] - attempts[1] >= 2 * email_queue.retry_delay
+    assert email_queue.sent_count == 2
+    assert not email_queue.dead_letters
+
+
+def test_dead_letter_after_max_attempts(delivery):
+    email_queue, state = delivery
+    state.fail_recipients['broken@example.com'] = -1
+    email_queue.enqueue('broken@example.com', 'Sujet', 'Corps')
+    email_queue.enqueue('ok@example.com', 'Sujet', 'Corps')
+
+    assert email_queue.join(timeout=10)
+    assert len(state.attempts['broken@example.com']) == email_queue.max_retries
+    assert [job.recipient for job in email_queue.dead_letters] == ['broken@example.com']
+    assert email_queue.sent_count == 1
+
+    # Persistées pour l'exploitation
+    persisted = email_queue.load_dead_letters()
+    assert len(persisted) == 1
+    assert persisted[0]['recipient'] == 'broken@example.com'
+    assert persisted[0]['attempts'] == email_queue.max_retries
+    assert persisted[0]['last_error']
+
+
+def test_notify_users_bulk_and_email(smtp, tmp_path):
+    state, port = smtp
+    import app as app_module
+    from models import User, Notification
+    from services import NotificationService
+
+    app = make_app(tmp_path, **mail_config(port, tmp_path))
+    try:
+        with app.app_context():
+            app_module.db.create_all()
+            users = [User(email=f'user{i}@example.com', name=f'U{i}') for i in range(5)]
+            app_module.db.session.add_all(users)
+            app_module.db.session.commit()
+            recipients = [(user.id, user.email) for user in users]
+
+            count = NotificationService.notify_users(recipients, 'Titre', 'Message', send_email=True)
+
+            assert count == 5
+            assert Notification.query.count() == 5
+            assert app_module.email_queue.join(timeout=10)
+            assert sorted(r for rcpts, _ in state.messages for r in rcpts) == sorted(e for _, e in recipients)
+            assert state.connections == 1
+    finally:
+        app_module.email_queue.stop()
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app import db
+from bulk_loader import BulkLoader
+from caches import data_version, performance_version
+from form_tracker import form_tracker
+from models import Team, Player, Game, PlayerPerformance
+
+
+def make_league(games=(1, 2)):
+    db.session.add_all([Team(id=1, name='A', city='A'), Team(id=2, name='B', city='B')])
+    db.session.add_all([Player(id=i, first_name=f'P{i}', last_name='T', team_id=1) for i in (1, 2, 3)])
+    db.session.add_all([
+        Game(id=g, date=datetime(2024, 11, g), season=2024, home_team_id=1, visitor_team_id=2)
+        for g in games
+    ])
+    db.session.commit()
+
+
+class Statements:
+    """Requêtes SQL exécutées dans le bloc"""
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.listener)
+        return self.statements
+
+    def listener(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self.listener)
+
+
+def test_inserted_performances_resolve_game_dates_once_per_flush(app):
+    make_league()
+    form_tracker.load()
+
+    with Statements() as statements:
+        db.session.add_all([
+            PlayerPerformance(player_id=pid, game_id=gid, points=10 * pid + gid, season=2024)
+            for pid in (1, 2, 3) for gid in (1, 2)
+        ])
+        db.session.commit()
+
+    game_selects = [s for s in statements if s.lstrip().upper().startswith('SELECT') and 'FROM game' in s]
+    assert len(game_selects) == 1
+    form = form_tracker.form(2)
+    assert form is not None
+    assert form['games'] == 2
+    # Appliqué en place, estampillé à la nouvelle version : pas de rechargement
+    assert form_tracker._version == performance_version.current()
+
+
+def test_version_bump_without_performances_keeps_state(app):
+    make_league()
+    form_tracker.load()
+
+    # Ajout de joueur ou synchronisation : seule data_version change
+    data_version.bump()
+    with Statements() as statements:
+        assert form_tracker.form(1) is None
+
+    assert statements == []
+
+
+def test_other_process_load_reloads_form(app):
+    make_league()
+    form_tracker.load()
+
+    # Chargement fait par un autre processus : insertion directe puis version
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('INSERT INTO player_performance (player_id, game_id, points, season) '
+                             'VALUES (1, 1, 30, 2024)')
+    performance_version.bump()
+
+    assert form_tracker.form(1)['windows']['last_5']['points'] == 30
+
+
+def test_bulk_loaded_rows_are_applied_in_place(app):
+    make_league(games=(1, 2, 3))
+    form_tracker.load()
+    records = [{'game_id': gid, 'player_id': pid, 'pts': 10 * gid} for gid in (1, 2, 3) for pid in (1, 2)]
+    loader = BulkLoader(chunk_size=2)
+
+    for start in range(0, len(records), 2):
+        chunk = [loader.performance_row(r['player_id'], r['game_id'], r) for r in records[start:start + 2]]
+        loader._flush('test', start + 2, 0, [], chunk, [])
+
+    assert form_tracker._version == performance_version.current()
+    with Statements() as statements:
+        form = form_tracker.form(2)
+    assert statements == []
+    assert (form['games'], form['windows']['last_5']['points']) == (3, 20.0)
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+import identity
+from app import db
+from caches import DataVersion
+from identity import IdentityCache, PasswordVerifier, identity_cache, user_version
+from models import User
+
+
+def make_user(role='user'):
+    user = User(email=f'{role}@example.com', name=role, role=role)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_update_invalidates_after_commit(app):
+    user = make_user('admin')
+    assert identity_cache.get(user.id).is_admin
+
+    user.role = 'user'
+    db.session.flush()
+    # Flush sans commit : l'ancienne version reste valable pour les autres requêtes
+    assert 'identity_changed' in db.session.info
+    db.session.commit()
+    assert not identity_cache.get(user.id).is_admin
+
+
+def test_other_worker_sees_change_through_shared_version(app):
+    user = make_user('admin')
+    # Second worker : son propre cache, même fichier de version
+    other = IdentityCache(version=DataVersion(path=user_version.path, check_interval=0))
+    assert other.get(user.id).is_admin
+
+    model = db.session.get(User, user.id)
+    model.is_active = False
+    db.session.commit()
+    assert not other.get(user.id).is_active
+
+
+def test_snapshot_read_during_transaction_is_not_kept(app):
+    user = make_user('admin')
+    other = IdentityCache(version=DataVersion(path=user_version.path, check_interval=0))
+    other.get(user.id)
+    other.invalidate(user.id)
+    other.get(user.id)          # relu avant le commit : ancienne version
+    user.role = 'user'
+    db.session.commit()
+    assert not other.get(user.id).is_admin
+
+
+def test_password_slot_held_until_hash_finishes(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(identity, 'check_password_hash', lambda h, p: release.wait(5))
+    verifier = PasswordVerifier(max_workers=1, max_pending=1, timeout=0.05)
+
+    with pytest.raises(PasswordVerifier.Busy):
+        verifier.verify('hash', 'pw')
+    # Le hachage précédent est toujours en cours : le créneau n'est pas rendu
+    with pytest.raises(PasswordVerifier.Busy):
+        verifier.verify('hash', 'pw')
+
+    release.set()
+    verifier._executor.shutdown(wait=True)
+    assert verifier._slots.acquire(blocking=False)
@@ -0,0 +1,32 @@
+import logging
+
+from app import db
+from models import User
+from tests.conftest import login
+
+
+def test_slow_requests_logged_with_sql_and_admin_only(app, caplog):
+    app.config['SLOW_REQUEST_MS'] = 0
+    admin = User(email='admin@example.com', name='A', role='admin')
+    user = User(email='user@example.com', name='U')
+    db.session.add_all([admin, user])
+    db.session.commit()
+
+    client = app.test_client()
+    login(client, admin)
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        assert client.get('/api/seasons').status_code == 200
+    assert any('Requête lente /api/seasons' in r.getMessage() and 'SELECT' in r.getMessage()
+               for r in caplog.records)
+
+    slow = client.get('/admin/slow_requests').get_json()
+    assert slow[0]['queries']
+
+    other = app.test_client()
+    login(other, user)
+    assert other.get('/admin/slow_requests').status_code == 403
+
+
+def test_metrics_identifies_worker(app):
+    body = app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'nba_metrics_process{pid="' in body
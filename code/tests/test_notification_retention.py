@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect
+
+from app import db
+from models import User, Notification
+from notification_retention import NotificationRetentionJob, NotificationRetentionService
+from season_store import ensure_season_schema
+
+POLICIES = {'info': {'read_max_age_days': 30, 'unread_max_age_days': None,
+                     'digest_titles': ['Synchronisation terminée'], 'digest_after_days': 1}}
+
+
+def add_notifications(user, count, created_at):
+    db.session.add_all(Notification(user_id=user.id, title='Synchronisation terminée', message='ok',
+                                    type='info', created_at=created_at) for _ in range(count))
+    db.session.commit()
+
+
+def test_repeated_compaction_merges_into_existing_digest(app, tmp_path):
+    user = User(email='u@example.com', name='U')
+    db.session.add(user)
+    db.session.commit()
+    service = NotificationRetentionService(policies=POLICIES, archive_dir=str(tmp_path / 'archive'))
+    now = datetime.utcnow()
+
+    add_notifications(user, 3, now - timedelta(days=5))
+    assert service.compact_digests(now) == 1
+    add_notifications(user, 2, now - timedelta(days=2))
+    assert service.compact_digests(now) == 0
+    assert service.compact_digests(now) == 0
+
+    rows = Notification.query.filter_by(user_id=user.id).all()
+    assert len(rows) == 1
+    assert rows[0].title == 'Synchronisation terminée (résumé)'
+    assert rows[0].message.startswith('5 notifications regroupées')
+
+
+def test_retention_job_runs_in_a_single_process(app, tmp_path):
+    lock_path = str(tmp_path / 'retention.lock')
+    first = NotificationRetentionJob(app, lock_path=lock_path)
+    second = NotificationRetentionJob(app, lock_path=lock_path)
+    try:
+        assert first._acquire_lock()
+        assert not second._acquire_lock()
+        first.stop()
+        assert second._acquire_lock()
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_startup_migration_adds_notification_indexes(app):
+    with db.engine.begin() as conn:
+        for index in Notification.__table__.indexes:
+            index.drop(conn)
+    ensure_season_schema()
+
+    names = {index['name'] for index in inspect(db.engine).get_indexes('notification')}
+    assert {'ix_notification_user_created', 'ix_notification_type_created'} <= names
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from app import db
+from models import User
+from profiler import profiler
+from tests.conftest import login
+
+
+@pytest.fixture
+def users(app):
+    admin = User(email='admin@example.com', name='A', role='admin')
+    user = User(email='user@example.com', name='U')
+    db.session.add_all([admin, user])
+    db.session.commit()
+    return admin, user
+
+
+def profile_files(app):
+    directory = app.config['PROFILE_DIR']
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+def test_profile_request_ignored_for_non_admin(app, users):
+    client = app.test_client()
+    login(client, users[1])
+
+    by_header = client.get('/api/seasons', headers={'X-Profile': '1'})
+    by_param = client.get('/api/seasons?_profile=1')
+
+    assert by_header.status_code == by_param.status_code == 200
+    assert 'X-Profile-Id' not in by_header.headers and 'X-Profile-Id' not in by_param.headers
+    assert profile_files(app) == []
+
+
+def test_admin_profiles_written_and_pruned(app, users, monkeypatch):
+    monkeypatch.setattr(profiler, 'keep', 2)
+    client = app.test_client()
+    login(client, users[0])
+
+    ids = [client.get('/api/seasons', headers={'X-Profile': '1'}).headers['X-Profile-Id'] for _ in range(3)]
+    ids.append(client.get('/api/seasons?_profile=1').headers['X-Profile-Id'])
+
+    files = profile_files(app)
+    assert len(files) == 4
+    assert {name.rsplit('.', 1)[1] for name in files} == {'folded', 'json'}
+    # Chaque profil conservé a ses deux fichiers
+    assert len({name.rsplit('.', 1)[0] for name in files} & set(ids)) == 2
+
+    listed = client.get('/admin/profiles')
+    assert listed.status_code == 200
+    kept = files[0].rsplit('.', 1)[0]
+    meta = client.get(f'/admin/profiles/{kept}').get_json()
+    assert meta['id'] == kept and meta['name'] == 'GET /api/seasons'
+    assert 'queries' in meta
+
+
+def test_admin_profile_pages_forbidden_for_non_admin(app, users):
+    admin, user = users
+    client = app.test_client()
+    login(client, admin)
+    profile_id = client.get('/api/seasons?_profile=1').headers['X-Profile-Id']
+
+    other = app.test_client()
+    login(other, user)
+    assert other.get('/admin/profiles').status_code == 403
+    assert other.get(f'/admin/profiles/{profile_id}').status_code == 403
+    assert other.get(f'/admin/profiles/{profile_id}?format=folded').status_code == 403
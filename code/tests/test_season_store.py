@@ -0,0 +1,120 @@
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import inspect
+
+from app import db
+from models import Team, Player, Game, PlayerPerformance
+import season_store
+from caches import data_version
+from season_store import SeasonStore, ensure_season_schema
+from stats_snapshot import stats_snapshot
+from tests.conftest import make_app
+
+
+def test_ensure_schema_on_fresh_database(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        ensure_season_schema()
+        inspector = inspect(db.engine)
+        assert 'season' in {c['name'] for c in inspector.get_columns('player_performance')}
+        assert 'notification' in inspector.get_table_names()
+        db.session.remove()
+
+
+def test_migration_removes_duplicate_performances_and_makes_index_unique(app):
+    db.session.add_all([Team(id=1, name='A', city='A'), Team(id=2, name='B', city='B'),
+                        Player(id=1, first_name='a', last_name='b', team_id=1),
+                        Game(id=1, date=datetime(2024, 11, 1), season=2024, home_team_id=1, visitor_team_id=2)])
+    db.session.commit()
+    # Base antérieure : index non unique et feuilles de match en double
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('DROP INDEX ix_performance_player_game')
+        conn.exec_driver_sql('CREATE INDEX ix_performance_player_game ON player_performance (player_id, game_id)')
+        for points in (10, 10, 10):
+            conn.exec_driver_sql(
+                'INSERT INTO player_performance (player_id, game_id, points, season) VALUES (1, 1, ?, 2024)',
+                (points,))
+
+    ensure_season_schema()
+
+    assert PlayerPerformance.query.count() == 1
+    index = next(ix for ix in inspect(db.engine).get_indexes('player_performance')
+                 if ix['name'] == 'ix_performance_player_game')
+    assert index['unique']
+
+
+def make_seasons():
+    db.session.add_all([Team(id=1, name='A', city='A'), Team(id=2, name='B', city='B'),
+                        Player(id=1, first_name='a', last_name='b', team_id=1)])
+    for game_id, season in ((1, 2019), (2, 2019), (3, 2024)):
+        db.session.add(Game(id=game_id, date=datetime(season, 11, game_id), season=season,
+                            home_team_id=1, visitor_team_id=2, home_team_score=100, visitor_team_score=90))
+        db.session.add(PlayerPerformance(player_id=1, game_id=game_id, points=10 * game_id, season=season))
+    db.session.commit()
+
+
+@pytest.fixture
+def store(app, tmp_path):
+    make_seasons()
+    stats_snapshot.publish()
+    return SeasonStore(archive_dir=str(tmp_path / 'archive'))
+
+
+def test_archive_copies_verifies_then_purges(store):
+    version = data_version.current()
+
+    assert store.archive_season(2019) == {'games': 2, 'performances': 2}
+
+    assert os.path.exists(store.archive_path(2019))
+    assert not os.path.exists(store.archive_path(2019) + '.tmp')
+    assert Game.query.filter_by(season=2019).count() == 0
+    assert PlayerPerformance.query.count() == 1
+    # Lecture routée vers l'archive
+    assert sorted(game.id for game in store.games(2019)) == [1, 2]
+    assert [p.points for p in store.performances(1, 2019)] == [20, 10]
+    # Workers prévenus, instantané republié sans la saison
+    assert data_version.current() == version + 1
+    assert 2019 not in stats_snapshot.current().seasons()
+    with pytest.raises(ValueError):
+        store.archive_season(2019)
+
+
+def test_interrupted_purge_is_resumed(store, monkeypatch):
+    purge = SeasonStore._purge
+
+    def crash(*args):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(SeasonStore, '_purge', staticmethod(crash))
+    with pytest.raises(KeyboardInterrupt):
+        store.archive_season(2019)
+    # Archive en place, base principale intacte
+    assert os.path.exists(store.archive_path(2019))
+    assert Game.query.filter_by(season=2019).count() == 2
+
+    monkeypatch.setattr(SeasonStore, '_purge', staticmethod(purge))
+    assert store.archive_season(2019) == {'games': 2, 'performances': 2}
+    assert Game.query.filter_by(season=2019).count() == 0
+
+
+def test_season_modified_during_archive_keeps_main_database(store, monkeypatch):
+    fsync = season_store._fsync
+
+    def write_during_archive(path):
+        fsync(path)
+        if path != store.archive_dir:
+            return
+        # Écriture concurrente entre la copie et la purge
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO game (id, date, season, home_team_id, visitor_team_id) "
+                                 "VALUES (9, '2019-12-01', 2019, 1, 2)")
+            conn.exec_driver_sql('INSERT INTO player_performance (player_id, game_id, points, season) '
+                                 'VALUES (1, 9, 5, 2019)')
+    monkeypatch.setattr(season_store, '_fsync', write_during_archive)
+
+    with pytest.raises(RuntimeError):
+        store.archive_season(2019)
+
+    assert not os.path.exists(store.archive_path(2019))
+    assert Game.query.filter_by(season=2019).count() == 3
@@ -0,0 +1,85 @@
+import numpy as np
+
+from app import db
+from caches import data_version
+import routes
+import similarity
+from models import Team, Player, User
+from similarity import PlayerSimilarityIndex
+from tests.conftest import login
+from tests.test_data_sync import FakeNBAApi
+
+
+def make_players(count=20):
+    db.session.add(Team(id=1, name='Team', city='City'))
+    for i in range(1, count + 1):
+        db.session.add(Player(id=i, first_name=f'P{i}', last_name='Test', team_id=1,
+                              points_per_game=float(i), assists_per_game=float(i % 5),
+                              rebounds_per_game=float(i % 7), minutes_per_game=20.0 + i))
+    db.session.commit()
+
+
+def test_refresh_player_ids_keeps_normalization_until_drift(app):
+    make_players()
+    index = PlayerSimilarityIndex(renormalize_ratio=0.1)
+    index.rebuild()
+    before = index._snapshot
+
+    db.session.get(Player, 3).points_per_game = 40.0
+    db.session.commit()
+    assert index.refresh([3]) == 1
+
+    after = index._snapshot
+    row = after.position[3]
+    np.testing.assert_array_equal(after.mean, before.mean)
+    np.testing.assert_allclose(after.matrix[row], after.normalize(after.raw[row]))
+    unchanged = [after.position[pid] for pid in (1, 2, 4)]
+    np.testing.assert_array_equal(after.matrix[unchanged], before.matrix[unchanged])
+
+    # Plus de 10 % des lignes modifiées : renormalisation à la lecture suivante
+    for pid in (5, 6):
+        db.session.get(Player, pid).points_per_game = 35.0
+    db.session.commit()
+    index.refresh([5, 6])
+    assert index._snapshot.drift == 3
+    index.similar(1)
+    assert index._snapshot.drift == 0
+    assert not np.array_equal(index._snapshot.mean, before.mean)
+
+
+def test_read_follows_data_version(app):
+    make_players()
+    index = PlayerSimilarityIndex()
+    assert len(index.similar(1, k=3)) == 3
+
+    # Écriture faite par un autre worker : seule la version partagée change
+    db.session.add(Player(id=99, first_name='New', last_name='Test', team_id=1, points_per_game=1.0,
+                          assists_per_game=1.0, rebounds_per_game=1.0, minutes_per_game=21.0))
+    db.session.commit()
+    data_version.bump()
+
+    assert 99 in [pid for pid, _ in index.similar(1, k=3)]
+    assert index._snapshot.version == data_version.current()
+
+
+def test_sync_refreshes_only_written_players(app, monkeypatch):
+    api = FakeNBAApi()
+    monkeypatch.setattr(routes.data_sync, 'nba_api', api)
+    admin = User(email='admin@example.com', name='admin', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+    login(client, admin)
+    client.get('/sync_data')
+    routes.similarity_index.rebuild()
+
+    loaded = []
+    load = similarity.load_raw_features
+    monkeypatch.setattr(similarity, 'load_raw_features', lambda ids=None: loaded.append(ids) or load(ids))
+    api.player(20)['pts'] = 30.0
+    client.get('/sync_data')
+
+    assert loaded == [[20]]
+    snapshot = routes.similarity_index._snapshot
+    assert snapshot.version == data_version.current()
+    assert snapshot.raw[snapshot.position[20], 0] == 30.0
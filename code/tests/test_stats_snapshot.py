@@ -0,0 +1,84 @@
+from datetime import datetime
+
+from app import db
+from caches import data_version
+from models import Team, Player, Game, PlayerPerformance, User
+from stats_snapshot import stats_snapshot, compare_from_db
+from tests.conftest import login
+
+
+def make_league():
+    db.session.add_all([Team(id=1, name='Zebras', city='A'), Team(id=2, name='Ants', city='B')])
+    for i in range(1, 7):
+        db.session.add(Player(id=i, first_name=f'P{i}', last_name='Test', team_id=1 + i % 2,
+                              points_per_game=float(10 + i % 3), assists_per_game=float(i),
+                              rebounds_per_game=float(7 - i), minutes_per_game=30.0))
+    db.session.add(Game(id=1, date=datetime(2024, 11, 1), season=2024, home_team_id=1, visitor_team_id=2,
+                        home_team_score=100, visitor_team_score=90, status='Final'))
+    db.session.add(PlayerPerformance(player_id=1, game_id=1, points=20, field_goals_made=8,
+                                     field_goals_attempted=16, three_points_made=1,
+                                     three_points_attempted=4, free_throws_made=3,
+                                     free_throws_attempted=4, season=2024))
+    db.session.commit()
+
+
+def test_teams_sorted_once_and_team_lookup(app):
+    make_league()
+    stats_snapshot.publish()
+    snapshot = stats_snapshot.current()
+
+    assert [team.name for team in snapshot.teams()] == ['Ants', 'Zebras']
+    assert snapshot._sorted_teams is not None
+    assert snapshot.team(1).name == 'Zebras'
+    assert snapshot.team(99) is None
+
+
+def test_compare_from_db_matches_snapshot(app):
+    make_league()
+    stats_snapshot.publish()
+    ids = [1, 4, 6, 42]
+
+    expected = stats_snapshot.current().compare(ids)
+    actual = compare_from_db(ids)
+
+    assert [(p.id, ranks) for p, ranks in actual] == [(p.id, ranks) for p, ranks in expected]
+    player, _ = actual[0]
+    assert player.games == 1
+    assert player.fg_pct == 0.5
+    assert player.team.name == 'Ants'
+
+
+def test_compare_route_without_snapshot(app):
+    make_league()
+    user = User(email='fan@example.com', name='fan')
+    db.session.add(user)
+    db.session.commit()
+    assert stats_snapshot.current() is None
+
+    client = app.test_client()
+    login(client, user)
+    response = client.get('/api/players/compare?ids=1,2')
+
+    assert response.status_code == 200
+    assert [row['id'] for row in response.get_json()] == [1, 2]
+
+
+def test_add_player_bumps_version_and_publishes_in_background(app):
+    make_league()
+    admin = User(email='admin@example.com', name='admin', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    stats_snapshot.publish()
+    app.config['STATS_SNAPSHOT_PUBLISH_DELAY'] = 0.05
+    version = data_version.current()
+
+    client = app.test_client()
+    login(client, admin)
+    response = client.post('/add_player', data={'name': 'New Player', 'position': 'G', 'team_id': 1})
+
+    assert response.status_code == 302
+    assert data_version.current() == version + 1
+    pending = stats_snapshot._pending
+    assert pending is not None
+    pending.join(timeout=5)
+    assert any(p.last_name == 'Player' for p in stats_snapshot.current().players(1))
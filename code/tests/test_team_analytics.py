@@ -0,0 +1,27 @@
+from app import db
+from caches import data_version
+from models import Team, User
+from team_analytics import TeamAnalytics, team_analytics
+from tests.conftest import login
+
+
+def test_add_player_reaches_every_worker(app):
+    db.session.add(Team(id=1, name='A', city='A'))
+    admin = User(email='admin@example.com', name='admin', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    team_analytics.load()
+    # Second worker : même fichier de version, son propre état
+    other = TeamAnalytics()
+    assert other.roster(1) == []
+
+    client = app.test_client()
+    login(client, admin)
+    response = client.post('/add_player', data={'name': 'New Player', 'position': 'G', 'team_id': 1})
+
+    assert response.status_code == 302
+    # Worker de la requête : mise à jour incrémentale, estampillée à la nouvelle version
+    assert team_analytics._version == data_version.current()
+    assert [entry.last_name for entry in team_analytics.roster(1)] == ['Player']
+    # Autre worker : rechargé au changement de version
+    assert [entry.last_name for entry in other.roster(1)] == ['Player']
@@ -0,0 +1,34 @@
+"""
+Point d'entrée WSGI (gunicorn)
+==============================
+
+    gunicorn -c gunicorn.conf.py
+
+Avec preload_app, ce module est importé une seule fois dans le processus
+maître : l'application est construite et les caches de référence chargés
+avant le fork des workers (voir gunicorn.conf.py).
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from caches import warm_caches
+from season_store import ensure_season_schema
+from stats_snapshot import stats_snapshot
+
+app = create_app()
+
+with app.app_context():
+    ensure_season_schema()
+    # Premier démarrage : publier l'instantané que les workers projetteront
+    if not os.path.exists(stats_snapshot.path):
+        try:
+            stats_snapshot.publish()
+        except Exception as e:
+            print(f"Publication de l'instantané de statistiques impossible: {e}")
+
+if os.getenv('WARM_CACHES', '1') == '1':
+    warm_caches(app)